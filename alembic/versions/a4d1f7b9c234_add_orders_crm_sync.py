@@ -0,0 +1,36 @@
+"""add keyCRM sync columns to orders
+
+Revision ID: a4d1f7b9c234
+Revises: f3c9e5a7b123
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'a4d1f7b9c234'
+down_revision = 'f3c9e5a7b123'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Состояние фоновой синхронизации с keyCRM
+    op.add_column('orders', sa.Column('crm_synced_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('orders', sa.Column('crm_sync_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('orders', sa.Column('crm_sync_error', sa.Text(), nullable=True))
+    op.create_index('ix_orders_crm_sync', 'orders', ['status', 'crm_synced_at', 'id'])
+
+    # Заказы, уже созданные в CRM вручную, считаются синхронизированными
+    op.execute("""
+        UPDATE orders SET crm_synced_at = updated_at
+         WHERE raw_json->>'_crm_order_id' IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_crm_sync', table_name='orders')
+    op.drop_column('orders', 'crm_sync_error')
+    op.drop_column('orders', 'crm_sync_attempts')
+    op.drop_column('orders', 'crm_synced_at')
@@ -0,0 +1,37 @@
+"""add order_documents table
+
+Revision ID: d1a7c3e5f901
+Revises: c123456789ab
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'd1a7c3e5f901'
+down_revision = 'c123456789ab'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Кэш предрендеренных PDF/VCF документов заказа
+    op.create_table('order_documents',
+                    sa.Column('id', sa.Integer(), primary_key=True),
+                    sa.Column('order_id', sa.BigInteger(), nullable=False),
+                    sa.Column('doc_type', sa.String(8), nullable=False),
+                    sa.Column('content_hash', sa.String(64), nullable=False),
+                    sa.Column('filename', sa.String(255), nullable=False),
+                    sa.Column('data', sa.LargeBinary(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'),
+                              nullable=False),
+                    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'),
+                              nullable=False),
+                    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+                    sa.UniqueConstraint('order_id', 'doc_type', name='uq_order_documents_order_doc_type'),
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_documents')
@@ -0,0 +1,24 @@
+"""add telegram_file_id to order_documents
+
+Revision ID: e2b8d4f6a012
+Revises: d1a7c3e5f901
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'e2b8d4f6a012'
+down_revision = 'd1a7c3e5f901'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # file_id Telegram для повторной отправки документа без загрузки
+    op.add_column('order_documents', sa.Column('telegram_file_id', sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('order_documents', 'telegram_file_id')
@@ -0,0 +1,73 @@
+"""add customers table and orders.customer_id
+
+Revision ID: f3c9e5a7b123
+Revises: e2b8d4f6a012
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = 'f3c9e5a7b123'
+down_revision = 'e2b8d4f6a012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Покупатели - одна запись на нормализованный телефон
+    op.create_table(
+        'customers',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('phone_e164', sa.String(32), nullable=False),
+        sa.Column('first_name', sa.String(100), nullable=True),
+        sa.Column('last_name', sa.String(100), nullable=True),
+        sa.Column('email', sa.String(255), nullable=True),
+        sa.Column('crm_buyer_id', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.UniqueConstraint('phone_e164', name='customers_phone_e164_key'),
+    )
+
+    op.add_column('orders', sa.Column('customer_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'orders_customer_id_fkey', 'orders', 'customers',
+        ['customer_id'], ['id'], ondelete='SET NULL',
+    )
+    op.create_index(
+        'ix_orders_customer_id_created_at', 'orders',
+        ['customer_id', sa.text('created_at DESC')],
+    )
+
+    # Бэкфилл: имя/email - из последнего заказа с этим телефоном,
+    # crm_buyer_id - из уже созданных в keyCRM покупателей (raw_json._crm_buyer_id)
+    op.execute("""
+        INSERT INTO customers (phone_e164, first_name, last_name, email, crm_buyer_id, created_at)
+        SELECT DISTINCT ON (o.customer_phone_e164)
+               o.customer_phone_e164,
+               NULLIF(o.customer_first_name, ''),
+               NULLIF(o.customer_last_name, ''),
+               NULLIF(o.raw_json->>'email', ''),
+               (SELECT MAX((b.raw_json->>'_crm_buyer_id')::bigint)
+                  FROM orders b
+                 WHERE b.customer_phone_e164 = o.customer_phone_e164
+                   AND b.raw_json->>'_crm_buyer_id' IS NOT NULL),
+               (SELECT MIN(f.created_at) FROM orders f
+                 WHERE f.customer_phone_e164 = o.customer_phone_e164)
+          FROM orders o
+         WHERE o.customer_phone_e164 IS NOT NULL AND o.customer_phone_e164 <> ''
+         ORDER BY o.customer_phone_e164, o.created_at DESC
+    """)
+    op.execute("""
+        UPDATE orders SET customer_id = c.id
+          FROM customers c
+         WHERE c.phone_e164 = orders.customer_phone_e164
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_customer_id_created_at', table_name='orders')
+    op.drop_constraint('orders_customer_id_fkey', 'orders', type_='foreignkey')
+    op.drop_column('orders', 'customer_id')
+    op.drop_table('customers')
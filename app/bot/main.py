@@ -1,11 +1,14 @@
 # app/bot/main.py - С РЕГИСТРАЦИЕЙ WEBHOOK РОУТЕРА
 import asyncio
 import os
+import threading
 from datetime import datetime, timedelta
 from typing import Optional
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import InlineKeyboardMarkup
@@ -14,6 +17,8 @@ from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 import pytz
 
+from app.config import get_telegram_api_base_url
+from app.services.metrics import job_timer
 from app.db import get_session
 from app.models import Order, OrderStatus
 
@@ -40,13 +45,26 @@ class TelegramBot:
         if not token:
             raise RuntimeError("TELEGRAM_BOT_TOKEN not set")
 
+        # TELEGRAM_API_BASE_URL - свой Bot API сервер (локальный telegram-bot-api или заглушка)
+        session = None
+        api_base_url = get_telegram_api_base_url()
+        if api_base_url:
+            session = AiohttpSession(api=TelegramAPIServer.from_base(api_base_url))
+            logger.info(f"Using Telegram Bot API server: {api_base_url}")
+
         # Простая конфигурация с увеличенными таймаутами
         self.bot = Bot(
             token=token,
+            session=session,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML),
             request_timeout=120  # 2 минуты таймаут для запросов
         )
 
+        # Спаны вызовов Bot API внутри трассы (TRACING_EXPORTER)
+        from app.services.tracing import aiogram_request_middleware, get_tracer
+        if get_tracer():
+            self.bot.session.middleware(aiogram_request_middleware())
+
         # ИСПОЛЬЗУЕМ MemoryStorage для FSM
         storage = MemoryStorage()
         self.dp = Dispatcher(storage=storage)
@@ -105,6 +123,16 @@ class TelegramBot:
             self.dp.include_router(webhook.router)
             logger.info("✅ Webhook router registered (close button only)")
 
+            # Латентность callback-обработчиков для /metrics
+            from app.bot.middlewares import CallbackMetricsMiddleware
+            for router in (management.router, orders.router, navigation.router, commands.router,
+                           test_commands.router, webhook.router):
+                router.callback_query.middleware(CallbackMetricsMiddleware())
+
+            # Число SQL-запросов на апдейт (бюджет DB_QUERY_BUDGET)
+            from app.bot.middlewares import UpdateQueryScopeMiddleware
+            self.dp.update.outer_middleware(UpdateQueryScopeMiddleware())
+
             logger.info("All handlers registered successfully!")
 
         except Exception as e:
@@ -115,7 +143,7 @@ class TelegramBot:
         """Настройка планировщика задач"""
         # 1. Проверка НОВЫХ заказов КАЖДЫЙ ЧАС (10:00-22:00)
         self.scheduler.add_job(
-            self._check_new_orders,
+            job_timer("check_new_orders", self._check_new_orders),
             trigger=IntervalTrigger(hours=1),
             id="check_new_orders",
             replace_existing=True
@@ -123,7 +151,7 @@ class TelegramBot:
 
         # 2. Проверка индивидуальных напоминаний каждые 5 минут
         self.scheduler.add_job(
-            self._check_reminders,
+            job_timer("check_reminders", self._check_reminders),
             trigger=IntervalTrigger(minutes=5),
             id="check_reminders",
             replace_existing=True
@@ -131,12 +159,26 @@ class TelegramBot:
 
         # 3. Ежедневное напоминание об оплате в 10:30
         self.scheduler.add_job(
-            self._check_payment_reminders,
+            job_timer("payment_reminders", self._check_payment_reminders),
             trigger=CronTrigger(hour=10, minute=30, timezone="Europe/Kyiv"),
             id="payment_reminders",
             replace_existing=True
         )
 
+        # 4. Фоновая синхронизация заказов с keyCRM (опционально)
+        from app.services.crm_sync import is_crm_sync_enabled, get_sync_interval
+        if is_crm_sync_enabled():
+            self.scheduler.add_job(
+                job_timer("crm_sync", self._sync_crm),
+                trigger=IntervalTrigger(minutes=get_sync_interval()),
+                id="crm_sync",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+                next_run_time=datetime.now(pytz.timezone("Europe/Kyiv")),  # продолжить сразу после рестарта
+            )
+            logger.info(f"CRM sync enabled, every {get_sync_interval()} min")
+
         logger.info("Scheduler configured with 3 reminder types")
 
     def _is_working_hours(self) -> bool:
@@ -353,6 +395,14 @@ class TelegramBot:
         except Exception as e:
             logger.error(f"Error checking reminders: {e}", exc_info=True)
 
+    async def _sync_crm(self):
+        """Фоновая синхронизация заказов с keyCRM"""
+        try:
+            from app.services.crm_sync import run_crm_sync
+            await run_crm_sync()
+        except Exception as e:
+            logger.error(f"Error syncing orders to CRM: {e}", exc_info=True)
+
     async def start_polling(self):
         """Запуск polling в фоновой задаче"""
         try:
@@ -362,7 +412,11 @@ class TelegramBot:
                 self.scheduler.start()
                 logger.info("Scheduler started")
 
-            await self.dp.start_polling(self.bot, allowed_updates=['message', 'callback_query'])
+            # Сигналы ставятся только из главного потока (приложение в фоновом потоке - бенчмарки)
+            await self.dp.start_polling(
+                self.bot, allowed_updates=['message', 'callback_query'],
+                handle_signals=threading.current_thread() is threading.main_thread(),
+            )
 
         except Exception as e:
             logger.error(f"Error in bot polling: {e}", exc_info=True)
@@ -0,0 +1,61 @@
+# app/bot/middlewares.py
+"""
+Middleware aiogram: латентность обработчиков callback'ов для /metrics и корневой спан трассы,
+подсчёт SQL-запросов на апдейт.
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.services.metrics import CALLBACK_HANDLER_SECONDS
+from app.services.query_stats import query_scope
+from app.services.tracing import start_span
+
+
+def _handler_name(data: Dict[str, Any]) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    if callback is None:
+        return "unknown"
+    module = getattr(callback, "__module__", "").rsplit(".", 1)[-1]
+    return f"{module}.{getattr(callback, '__name__', 'handler')}"
+
+
+class CallbackMetricsMiddleware(BaseMiddleware):
+    """
+    Inner-middleware роутера: вызывается уже после фильтров, в data["handler"] -
+    выбранный обработчик. Метка - модуль.функция (ограниченное множество),
+    а не callback_data с id заказов.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = _handler_name(data)
+        started = time.perf_counter()
+        result = "error"
+        try:
+            with start_span(f"callback {name}", **{"telegram.callback_data": getattr(event, "data", "")}):
+                value = await handler(event, data)
+            result = "ok"
+            return value
+        finally:
+            CALLBACK_HANDLER_SECONDS.labels(name, result).observe(time.perf_counter() - started)
+
+
+class UpdateQueryScopeMiddleware(BaseMiddleware):
+    """Outer-middleware диспетчера: область подсчёта SQL на апдейт, метка - тип апдейта."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with query_scope(f"telegram {getattr(event, 'event_type', 'update')}"):
+            return await handler(event, data)
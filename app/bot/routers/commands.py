@@ -1,10 +1,14 @@
 # app/bot/routers/commands.py - ИСПРАВЛЕННЫЕ КОМАНДЫ БЕЗ ЦИКЛИЧЕСКИХ ИМПОРТОВ
 from aiogram import Router, F
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.types import Message, FSInputFile
+
+import os
 
 from app.db import get_session
 from app.models import Order, OrderStatus
+from app.services.export_service import parse_export_filter, export_pdf, export_vcf
+from app.services.pdf_renderer import PdfRenderQueueFull, PdfRenderTimeout
 from datetime import datetime
 
 from .shared import (
@@ -270,6 +274,106 @@ async def on_pending_command(msg: Message):
         debug_print(f"Error switching to pending: {e}", "ERROR")
 
 
+@router.message(Command(commands=["export_pdf"]))
+async def on_export_pdf_command(msg: Message, command: CommandObject):
+    """Команда /export_pdf [статус] [період] - один PDF з усіма замовленнями для складу"""
+    if not check_permission(msg.from_user.id):
+        return
+
+    debug_print(f"/export_pdf command from authorized user {msg.from_user.id}: {command.args}")
+
+    try:
+        flt = parse_export_filter(command.args or "")
+    except ValueError as e:
+        await msg.answer(
+            f"❌ {e}\n\n"
+            "Приклад: <code>/export_pdf paid today</code>\n"
+            "Статус: new, waiting, paid, cancelled, all\n"
+            "Період: today, yesterday, week, 2025-01-31, 2025-01-01..2025-01-31"
+        )
+        return
+
+    progress = await msg.answer(f"⏳ Формую PDF ({flt.describe()})...")
+    try:
+        export = await export_pdf(flt)
+    except (PdfRenderQueueFull, PdfRenderTimeout) as e:
+        debug_print(f"PDF export failed: {e}", "ERROR")
+        await progress.edit_text("❌ Сервіс PDF перевантажений, спробуйте пізніше")
+        return
+    except Exception as e:
+        debug_print(f"PDF export failed: {e}", "ERROR")
+        await progress.edit_text("❌ Не вдалося сформувати PDF")
+        return
+
+    if export is None:
+        await progress.edit_text(f"📭 Немає замовлень ({flt.describe()})")
+        return
+
+    caption = f"📦 Замовлень: {export.count} ({flt.describe()})"
+    if export.truncated:
+        caption += f"\n⚠️ Показано перші {export.count}, звузьте період"
+    try:
+        await msg.answer_document(
+            FSInputFile(export.path, filename=export.filename),
+            caption=caption,
+            request_timeout=120,
+        )
+    except Exception as e:
+        debug_print(f"PDF export send failed: {e}", "ERROR")
+        await progress.edit_text("❌ Не вдалося надіслати PDF, спробуйте пізніше")
+        return
+    finally:
+        os.unlink(export.path)
+
+    try:
+        await progress.delete()
+    except Exception:
+        pass
+
+
+@router.message(Command(commands=["export_vcf"]))
+async def on_export_vcf_command(msg: Message, command: CommandObject):
+    """Команда /export_vcf [статус] [період] - один .vcf з контактами для імпорту в телефон"""
+    if not check_permission(msg.from_user.id):
+        return
+
+    debug_print(f"/export_vcf command from authorized user {msg.from_user.id}: {command.args}")
+
+    try:
+        flt = parse_export_filter(command.args or "", default_status=None)
+    except ValueError as e:
+        await msg.answer(
+            f"❌ {e}\n\n"
+            "Приклад: <code>/export_vcf new week</code>\n"
+            "Статус: new, waiting, paid, cancelled, all\n"
+            "Період: today, yesterday, week, 2025-01-31, 2025-01-01..2025-01-31"
+        )
+        return
+
+    try:
+        export = await export_vcf(flt)
+    except Exception as e:
+        debug_print(f"VCF export failed: {e}", "ERROR")
+        await msg.answer("❌ Не вдалося сформувати файл контактів")
+        return
+
+    if export is None:
+        await msg.answer(f"📭 Немає контактів ({flt.describe()})")
+        return
+
+    try:
+        await msg.answer_document(
+            FSInputFile(export.path, filename=export.filename),
+            caption=f"📇 Контактів: {export.count} ({flt.describe()})",
+            request_timeout=120,
+        )
+    except Exception as e:
+        debug_print(f"VCF export send failed: {e}", "ERROR")
+        await msg.answer("❌ Не вдалося надіслати файл контактів, спробуйте пізніше")
+    finally:
+        os.unlink(export.path)
+
+
 @router.message(Command(commands=["help"]))
 async def on_help_command(msg: Message):
     """Команда /help - ПОЛНОЕ ИГНОРИРОВАНИЕ неавторизованных"""
@@ -291,6 +395,8 @@ async def on_help_command(msg: Message):
 /menu - Головне меню
 /stats - Статистика замовлень
 /pending - Необроблені замовлення
+/export_pdf paid today - Один PDF з замовленнями для складу
+/export_vcf new week - Контакти клієнтів одним файлом
 /help - Ця довідка
 
 <b>Функції:</b>
@@ -1,7 +1,6 @@
 # app/bot/routers/management.py - ПОЛНОЕ ИГНОРИРОВАНИЕ НЕАВТОРИЗОВАННЫХ
 """Роутер для управления заказами: комментарии, напоминания"""
 
-import asyncio
 from datetime import datetime, timedelta
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
@@ -10,6 +9,7 @@ from aiogram.fsm.state import State, StatesGroup
 
 from app.db import get_session
 from app.models import Order, OrderStatus, OrderStatusHistory
+from app.services.tracing import run_in_executor
 
 from .shared import (
     debug_print,
@@ -200,6 +200,13 @@ async def handle_reminder_time(callback: CallbackQuery):
         await callback.answer(f"✅ Нагадування встановлено через {time_text}")
 
 
+def _crm_progress_text(text: str) -> str:
+    """Підказка про чергу: запити до keyCRM обмежені 60/хв і чекають своєї черги."""
+    from app.services.keycrm_client import get_keycrm_client
+    pending = get_keycrm_client().pending
+    return f"{text} (у черзі: {pending})" if pending else text
+
+
 @router.callback_query(F.data.contains(":create_buyer"))
 async def on_create_buyer(callback: CallbackQuery):
     """Кнопка 'Створити покупця' — створює покупця в keyCRM."""
@@ -219,36 +226,48 @@ async def on_create_buyer(callback: CallbackQuery):
         order_display = order.order_number or order_id
         session.expunge(order)
 
-    await callback.answer("⏳ Створюю покупця в CRM...")
+    await callback.answer(_crm_progress_text("⏳ Створюю покупця в CRM..."))
 
     try:
-        from app.services.keycrm_service import create_crm_buyer, find_buyer_by_phone
-        loop = asyncio.get_event_loop()
-
-        try:
-            result = await loop.run_in_executor(None, create_crm_buyer, order)
-            already_existed = False
-        except Exception as create_err:
-            phone = order.customer_phone_e164 or ""
-            result = None
-            if phone:
-                try:
-                    result = await loop.run_in_executor(None, find_buyer_by_phone, phone)
-                except Exception:
-                    pass
-
-            if result:
-                already_existed = True
-            else:
-                await callback.bot.send_message(
-                    callback.message.chat.id,
-                    f"❌ Помилка створення покупця: {create_err}"
-                )
-                return
+        from app.services.keycrm_service import KEYCRM_BUYER_URL, create_crm_buyer, find_buyer_by_phone
+        from app.services.customer_service import get_cached_buyer_id, remember_crm_buyer_id
+
+        # Повторный покупатель - id уже известен, в CRM не ходим
+        cached_buyer_id = await run_in_executor(None, get_cached_buyer_id, order)
+        if cached_buyer_id:
+            result = {"id": cached_buyer_id, "url": f"{KEYCRM_BUYER_URL}/{cached_buyer_id}"}
+            already_existed = True
+        else:
+            try:
+                result = await create_crm_buyer(order)
+                already_existed = False
+            except Exception as create_err:
+                phone = order.customer_phone_e164 or ""
+                result = None
+                if phone:
+                    try:
+                        result = await find_buyer_by_phone(phone)
+                    except Exception:
+                        pass
+
+                if result:
+                    already_existed = True
+                else:
+                    await callback.bot.send_message(
+                        callback.message.chat.id,
+                        f"❌ Помилка створення покупця: {create_err}"
+                    )
+                    return
 
         buyer_id = result["id"]
         buyer_url = result["url"]
 
+        if not cached_buyer_id:
+            try:
+                await run_in_executor(None, remember_crm_buyer_id, order, buyer_id)
+            except Exception as e:
+                debug_print(f"Failed to cache buyer id for order {order_id}: {e}", "WARN")
+
         new_keyboard = None
         with get_session() as session:
             fresh_order = session.get(Order, order_id)
@@ -314,14 +333,14 @@ async def on_create_crm(callback: CallbackQuery):
         # але об'єкт більше не прив'язаний до сесії — безпечно передавати в потік
         session.expunge(order)
 
-    await callback.answer("⏳ Створюю замовлення в CRM...")
+    await callback.answer(_crm_progress_text("⏳ Створюю замовлення в CRM..."))
 
     try:
         from app.services.keycrm_service import create_crm_order
-        loop = asyncio.get_event_loop()
 
-        # order — detached ORM-об'єкт, всі потрібні атрибути вже завантажені
-        result = await loop.run_in_executor(None, create_crm_order, order)
+        # order — detached ORM-об'єкт, всі потрібні атрибути вже завантажені;
+        # запит іде через чергу з лімітом keyCRM (60/хв)
+        result = await create_crm_order(order)
         crm_id = result["id"]
         crm_url = result["url"]
 
@@ -331,6 +350,7 @@ async def on_create_crm(callback: CallbackQuery):
             fresh_order = session.get(Order, order_id)
             if fresh_order:
                 fresh_order.raw_json = {**(fresh_order.raw_json or {}), "_crm_order_id": crm_id}
+                fresh_order.crm_synced_at = datetime.utcnow()
                 session.commit()
                 try:
                     from .orders import get_correct_keyboard
@@ -2,8 +2,10 @@
 """Роутер для работы с заказами: просмотр, изменение статусов, отправка файлов"""
 
 import asyncio
+import time
 from datetime import datetime
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import CallbackQuery, BufferedInputFile
 from sqlalchemy import and_
 from sqlalchemy.orm import Session
@@ -11,8 +13,9 @@ from sqlalchemy.orm import Session
 from app.db import get_session
 from app.models import Order, OrderStatus, OrderStatusHistory
 from app.bot.services.message_builder import get_status_emoji, get_status_text, DIVIDER
-from app.services.pdf_service import build_order_pdf
-from app.services.vcf_service import build_contact_vcf
+from app.services.document_service import get_order_document, remember_file_id, DOC_PDF, DOC_VCF
+from app.bot.services.payment_sender import build_payment_messages, send_ordered
+from app.services.metrics import DOCUMENT_UPLOAD_SECONDS
 
 from .shared import (
     debug_print,
@@ -27,8 +30,6 @@ from .shared import (
     get_webhook_messages
 )
 
-PAYMENT_MESSAGE_DELAY = 1  # seconds to wait between payment messages
-
 router = Router()
 
 
@@ -246,6 +247,55 @@ async def notify_other_managers_about_status_change(
     debug_print(f"📢 NOTIFICATION COMPLETE: Updated {updated_count}/{total_messages} messages")
 
 
+async def send_order_document(bot, chat_id: int, order_id: int, doc_type: str, caption: str):
+    """
+    Отправка документа заказа. Если для текущего содержимого уже есть file_id -
+    отправляем по нему (без загрузки байтов), иначе загружаем с ретраями
+    и запоминаем полученный file_id.
+    """
+    doc = await get_order_document(order_id, doc_type, need_data=False)
+    if doc is None:
+        raise ValueError("Дані замовлення не знайдено")
+
+    if doc.file_id:
+        try:
+            with DOCUMENT_UPLOAD_SECONDS.labels(doc_type, "file_id").time():
+                msg = await bot.send_document(chat_id=chat_id, document=doc.file_id, caption=caption)
+            debug_print(f"📤 {doc_type.upper()} sent by file_id for order {order_id}")
+            return msg
+        except TelegramBadRequest as e:
+            # file_id больше не принимается - загружаем документ заново
+            debug_print(f"⚠️ file_id rejected for order {order_id}: {e}", "WARN")
+            doc = await get_order_document(order_id, doc_type)
+            if doc is None:  # заказ удалили, пока отправляли
+                raise ValueError("Дані замовлення не знайдено")
+
+    send_start = time.monotonic()
+    # Retry логика для отправки через медленное соединение
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            msg = await bot.send_document(
+                chat_id=chat_id,
+                document=BufferedInputFile(doc.data, doc.filename),
+                caption=caption,
+                request_timeout=60  # 60 секунд таймаут для отправки
+            )
+            send_time = time.monotonic() - send_start
+            DOCUMENT_UPLOAD_SECONDS.labels(doc_type, "upload").observe(send_time)
+            debug_print(f"📤 {doc_type.upper()} uploaded in {send_time:.2f}s for order {order_id} (attempt {attempt + 1})")
+            break
+        except Exception as send_error:
+            debug_print(f"⚠️ {doc_type.upper()} send attempt {attempt + 1} failed: {send_error}")
+            if attempt == max_retries - 1:
+                raise  # Последняя попытка - пробрасываем ошибку
+            await asyncio.sleep(2)  # Пауза перед повтором
+
+    if msg.document:
+        await remember_file_id(order_id, doc_type, doc.content_hash, msg.document.file_id)
+    return msg
+
+
 @router.callback_query(F.data.regexp(r"^order:\d+:view$"))
 async def on_order_view(callback: CallbackQuery):
     """Показать карточку заказа - ПОЛНОЕ ИГНОРИРОВАНИЕ неавторизованных"""
@@ -353,112 +403,37 @@ async def on_resend_file(callback: CallbackQuery):
             return
 
         try:
-            if file_type == "pdf":
-                import time
-                start_time = time.time()
-
-                debug_print(f"⏳ Starting PDF generation for order {order_id}")
-                # Запускаем CPU-bound операцию в отдельном потоке чтобы не блокировать event loop
-                loop = asyncio.get_event_loop()
-                pdf_bytes, pdf_filename = await loop.run_in_executor(
-                    None, build_order_pdf, order.raw_json
-                )
-                pdf_generation_time = time.time() - start_time
-                debug_print(f"📄 PDF generated in {pdf_generation_time:.2f}s for order {order_id}")
-                
-                pdf_file = BufferedInputFile(pdf_bytes, pdf_filename)
+            start_time = time.time()
 
+            if file_type == "pdf":
                 from app.services.message_templates import render_simple_confirm_with_contact
                 from app.services.address_utils import get_delivery_and_contact_info, get_contact_name
 
-                template_start = time.time()
                 _, contact_info = get_delivery_and_contact_info(order.raw_json)
                 contact_first_name, contact_last_name = get_contact_name(contact_info)
 
-                client_message = render_simple_confirm_with_contact(
+                caption = render_simple_confirm_with_contact(
                     order.raw_json,
                     contact_first_name,
                     contact_last_name
                 )
-                template_time = time.time() - template_start
-                debug_print(f"📝 Template rendered in {template_time:.2f}s for order {order_id}")
-
-                send_start = time.time()
-                # Retry логика для отправки PDF через медленное соединение
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        pdf_msg = await callback.bot.send_document(
-                            chat_id=callback.message.chat.id,
-                            document=pdf_file,
-                            caption=client_message,
-                            request_timeout=60  # 60 секунд таймаут для отправки
-                        )
-                        send_time = time.time() - send_start
-                        debug_print(f"📤 PDF sent in {send_time:.2f}s for order {order_id} (attempt {attempt + 1})")
-                        break
-                    except Exception as send_error:
-                        debug_print(f"⚠️ PDF send attempt {attempt + 1} failed: {send_error}")
-                        if attempt == max_retries - 1:
-                            raise  # Последняя попытка - пробрасываем ошибку
-                        await asyncio.sleep(2)  # Пауза перед повтором
-                        # Пересоздаем файл для повторной отправки
-                        pdf_file = BufferedInputFile(pdf_bytes, pdf_filename)
-
-                track_order_file_message(callback.from_user.id, order_id, pdf_msg.message_id)
-                total_time = time.time() - start_time
-                debug_print(f"✅ PDF completed in {total_time:.2f}s total for order {order_id}")
+                doc_type = DOC_PDF
 
             elif file_type == "vcf":
-                import time
-                from functools import partial
-                start_time = time.time()
-
-                debug_print(f"⏳ Starting VCF generation for order {order_id}")
-                # Запускаем в отдельном потоке чтобы не блокировать event loop
-                loop = asyncio.get_event_loop()
-                vcf_func = partial(
-                    build_contact_vcf,
-                    first_name=order.customer_first_name or "",
-                    last_name=order.customer_last_name or "",
-                    order_id=str(order.order_number or order.id),
-                    phone_e164=order.customer_phone_e164
-                )
-                vcf_bytes, vcf_filename = await loop.run_in_executor(None, vcf_func)
-                vcf_generation_time = time.time() - start_time
-                debug_print(f"📱 VCF generated in {vcf_generation_time:.2f}s for order {order_id}")
-                
-                vcf_file = BufferedInputFile(vcf_bytes, vcf_filename)
-
                 caption = f"📱 Контакт клієнта • #{order.order_number or order.id}"
                 if order.customer_phone_e164:
                     caption += f" • {format_phone_compact(order.customer_phone_e164)}"
+                doc_type = DOC_VCF
 
-                send_start = time.time()
-                # Retry логика для отправки VCF через медленное соединение  
-                max_retries = 3
-                for attempt in range(max_retries):
-                    try:
-                        vcf_msg = await callback.bot.send_document(
-                            chat_id=callback.message.chat.id,
-                            document=vcf_file,
-                            caption=caption,
-                            request_timeout=60  # 60 секунд таймаут для отправки
-                        )
-                        send_time = time.time() - send_start
-                        debug_print(f"📤 VCF sent in {send_time:.2f}s for order {order_id} (attempt {attempt + 1})")
-                        break
-                    except Exception as send_error:
-                        debug_print(f"⚠️ VCF send attempt {attempt + 1} failed: {send_error}")
-                        if attempt == max_retries - 1:
-                            raise  # Последняя попытка - пробрасываем ошибку
-                        await asyncio.sleep(2)  # Пауза перед повтором
-                        # Пересоздаем файл для повторной отправки
-                        vcf_file = BufferedInputFile(vcf_bytes, vcf_filename)
-
-                track_order_file_message(callback.from_user.id, order_id, vcf_msg.message_id)
-                total_time = time.time() - start_time
-                debug_print(f"✅ VCF completed in {total_time:.2f}s total for order {order_id}")
+            else:
+                return
+
+            doc_msg = await send_order_document(
+                callback.bot, callback.message.chat.id, order_id, doc_type, caption
+            )
+            track_order_file_message(callback.from_user.id, order_id, doc_msg.message_id)
+            total_time = time.time() - start_time
+            debug_print(f"✅ {file_type.upper()} completed in {total_time:.2f}s total for order {order_id}")
 
         except Exception as e:
             debug_print(f"Error sending {file_type}: {e}", "ERROR")
@@ -475,7 +450,7 @@ async def on_resend_file(callback: CallbackQuery):
 @router.callback_query(F.data.contains(":payment"))
 async def on_payment_info(callback: CallbackQuery):
     """
-    ОПТИМИЗИРОВАННАЯ кнопка 'Реквізити' с полупараллельной отправкой
+    Кнопка 'Реквізити' - упорядоченная отправка без фиксированных пауз
     Гарантирует правильный порядок сообщений и надежный трекинг
     """
     if not check_permission(callback.from_user.id):
@@ -485,7 +460,7 @@ async def on_payment_info(callback: CallbackQuery):
     await callback.answer("💳 Підготовка реквізитів...")
 
     order_id = int(callback.data.split(":")[1])
-    debug_print(f"💳 PAYMENT: for order {order_id} - SEMI-PARALLEL VERSION")
+    debug_print(f"💳 PAYMENT: for order {order_id}")
 
     # Получаем данные заказа
     order_total = "800"
@@ -508,70 +483,30 @@ async def on_payment_info(callback: CallbackQuery):
                 except:
                     pass
 
-    # Формируем все сообщения заранее
-    payment_message = f"""💳 <b>Реквізити для оплати</b>
-
-Передаємо замовлення в роботу після предплати, так як виготовлення повністю індивідуально 
-
-Максимальний термін виготовлення складає 7 робочих днів, одразу по готовності відправляємо замовлення Вам 🚀
-
-🛍 <b>Сума замовлення складає - {order_total} {currency}</b>
-
-Оплату можна здійснити на:
-<b>ФОП Комарницька Катерина Сергіївна</b>
-<code>UA613220010000026004340089782</code>
-<b>ЕДРПОУ:</b> 3577508940
-<b>Призначення:</b> Оплата за товар 
-
-Надсилаю всю інформацію окремо, щоб вам було зручно копіювати ☺️👇"""
-
-    # Копируемые сообщения в строгом порядке
-    copy_messages = [
-        "ФОП Комарницька Катерина Сергіївна",
-        "UA613220010000026004340089782",
-        "3577508940",
-        "Оплата за товар",
-    ]
+    # Формируем все сообщения заранее (реквизиты берутся из конфигурации)
+    messages = build_payment_messages(order_total, currency)
 
     # Очищаем старые файлы
     await cleanup_order_files(callback.bot, callback.message.chat.id, callback.from_user.id, order_id)
 
     try:
-        debug_print(f"💳 Sending payment info SEMI-PARALLEL for order {order_id}")
+        debug_print(f"💳 Sending {len(messages)} payment messages for order {order_id}")
         start_time = asyncio.get_event_loop().time()
 
-        # ШАГ 1: Отправляем ОСНОВНОЕ сообщение первым (гарантированно)
-        main_msg = await callback.bot.send_message(
-            callback.message.chat.id,
-            payment_message
-        )
-        track_order_file_message(callback.from_user.id, order_id, main_msg.message_id)
-        debug_print(f"✅ Main message sent and tracked: ID {main_msg.message_id}")
-
-        # ШАГ 2: отправляем 4 копируемых сообщения последовательно
-        async def send_and_track(text: str):
-            msg = await callback.bot.send_message(
-                callback.message.chat.id,
-                f"<code>{text}</code>",
-            )
-            track_order_file_message(callback.from_user.id, order_id, msg.message_id)
-
-        for msg_text in copy_messages:
-            await send_and_track(msg_text)
-            await asyncio.sleep(PAYMENT_MESSAGE_DELAY)
-
-        # Отправляем новое сообщение о выборе предоплаты
-        payment_choice_msg = await callback.bot.send_message(
+        # Каждое сообщение ждёт подтверждения предыдущего - порядок гарантирован без пауз
+        await send_ordered(
+            callback.bot,
             callback.message.chat.id,
-            "Вам буде зручніше передоплата 200 грн чи повна оплата?"
+            messages,
+            on_sent=lambda message_id: track_order_file_message(
+                callback.from_user.id, order_id, message_id
+            ),
         )
-        track_order_file_message(callback.from_user.id, order_id, payment_choice_msg.message_id)
 
         elapsed_time = (asyncio.get_event_loop().time() - start_time) * 1000
         debug_print(f"💳 Payment info sent successfully in {elapsed_time:.0f}ms")
 
         tracked = get_order_file_messages(callback.from_user.id, order_id)
-        assert len(tracked) == 6
         debug_print(f"📌 Tracking all {len(tracked)} messages for order {order_id}")
 
     except Exception as e:
@@ -1,6 +1,7 @@
 # app/bot/routers/shared/utils.py - ИСПРАВЛЕННЫЙ ФАЙЛ
 """Общие утилиты для работы с ботом - БЕЗ ЦИКЛИЧЕСКИХ ИМПОРТОВ"""
 
+import logging
 import os
 from typing import TYPE_CHECKING
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
@@ -31,9 +32,20 @@ from .state import (
 )
 
 
+_debug_logger = logging.getLogger("app.bot.debug")
+_DEBUG_LEVELS = {"INFO": logging.DEBUG, "DEBUG": logging.DEBUG, "WARN": logging.WARNING,
+                 "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+
+
 def debug_print(message: str, level: str = "INFO") -> None:
-    """Отладочные сообщения"""
-    print(f"🤖 BOT {level}: {message}")
+    """
+    Отладочные сообщения: INFO - уровень DEBUG логгера app.bot.debug (по умолчанию
+    выключен - только проверка уровня), WARN/ERROR - всегда.
+    Включить: LOG_LEVELS=app.bot.debug=DEBUG или POST /debug/logging.
+    """
+    log_level = _DEBUG_LEVELS.get(level, logging.INFO)
+    if _debug_logger.isEnabledFor(log_level):
+        _debug_logger.log(log_level, message, stacklevel=2)
 
 
 def check_permission(user_id: int) -> bool:
@@ -0,0 +1,79 @@
+# app/bot/services/payment_sender.py
+"""Формирование и упорядоченная отправка сообщений с реквизитами"""
+
+from html import escape
+from typing import Callable, Optional
+
+from app.config import get_payment_requisites, get_payment_collapse_copy
+
+PAYMENT_CHOICE_TEXT = "Вам буде зручніше передоплата 200 грн чи повна оплата?"
+
+
+def build_payment_messages(
+        order_total: str,
+        currency: str,
+        requisites: Optional[dict] = None,
+        collapse_copy: Optional[bool] = None,
+) -> list[str]:
+    """
+    Строит список сообщений "Реквізити" в порядке отправки:
+    основное сообщение, копируемые строки, вопрос о предоплате.
+
+    collapse_copy=True объединяет копируемые строки в одно сообщение
+    с несколькими <code> блоками (каждый копируется отдельно по тапу).
+    """
+    # Реквизиты приходят из env, сумма - из Shopify: в HTML-разметку только экранированными
+    req = {key: escape(str(value), quote=False)
+           for key, value in (requisites or get_payment_requisites()).items()}
+    order_total, currency = escape(str(order_total), quote=False), escape(str(currency), quote=False)
+    if collapse_copy is None:
+        collapse_copy = get_payment_collapse_copy()
+
+    main_message = f"""💳 <b>Реквізити для оплати</b>
+
+Передаємо замовлення в роботу після предплати, так як виготовлення повністю індивідуально
+
+Максимальний термін виготовлення складає 7 робочих днів, одразу по готовності відправляємо замовлення Вам 🚀
+
+🛍 <b>Сума замовлення складає - {order_total} {currency}</b>
+
+Оплату можна здійснити на:
+<b>{req['recipient']}</b>
+<code>{req['iban']}</code>
+<b>ЕДРПОУ:</b> {req['edrpou']}
+<b>Призначення:</b> {req['purpose']}
+
+Надсилаю всю інформацію окремо, щоб вам було зручно копіювати ☺️👇"""
+
+    # Копируемые строки в строгом порядке
+    copy_lines = [req["recipient"], req["iban"], req["edrpou"], req["purpose"]]
+
+    if collapse_copy:
+        copy_messages = ["\n".join(f"<code>{line}</code>" for line in copy_lines)]
+    else:
+        copy_messages = [f"<code>{line}</code>" for line in copy_lines]
+
+    return [main_message, *copy_messages, PAYMENT_CHOICE_TEXT]
+
+
+async def send_ordered(
+        bot,
+        chat_id: int,
+        texts: list[str],
+        on_sent: Optional[Callable[[int], None]] = None,
+) -> list[int]:
+    """
+    Упорядоченная отправка: каждое сообщение отправляется только после
+    подтверждения (ответа Bot API) на предыдущее. Порядок гарантирован
+    самим ожиданием ответа, поэтому искусственные паузы не нужны.
+
+    on_sent(message_id) вызывается сразу после каждой успешной отправки,
+    чтобы трекинг не терял сообщения при ошибке посередине.
+    """
+    message_ids: list[int] = []
+    for text in texts:
+        msg = await bot.send_message(chat_id, text)
+        message_ids.append(msg.message_id)
+        if on_sent:
+            on_sent(msg.message_id)
+    return message_ids
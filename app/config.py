@@ -11,4 +11,37 @@ def get_shopify_webhook_secret() -> str:
 
 def get_telegram_secret_token() -> str | None:
     # не обязателен; если задан — проверяем заголовок X-Telegram-Bot-Api-Secret-Token
-    return os.getenv("TELEGRAM_WEBHOOK_SECRET_TOKEN") or None
\ No newline at end of file
+    return os.getenv("TELEGRAM_WEBHOOK_SECRET_TOKEN") or None
+
+def get_telegram_api_base_url() -> str | None:
+    # не обязателен; локальный Bot API сервер или заглушка (python -m tools.fake_telegram)
+    return (os.getenv("TELEGRAM_API_BASE_URL") or "").strip().rstrip("/") or None
+
+def get_metrics_token() -> str | None:
+    # не обязателен; если задан — GET /metrics требует Authorization: Bearer <METRICS_TOKEN>
+    return os.getenv("METRICS_TOKEN") or None
+
+def get_debug_token() -> str | None:
+    # не задан — /debug/profile и /debug/memory выключены (404); иначе Authorization: Bearer <DEBUG_API_TOKEN>
+    return os.getenv("DEBUG_API_TOKEN") or None
+
+# Реквізити для кнопки "Реквізити" (значення за замовчуванням — поточні реквізити ФОП)
+_DEFAULT_PAYMENT_RECIPIENT = "ФОП Комарницька Катерина Сергіївна"
+_DEFAULT_PAYMENT_IBAN = "UA613220010000026004340089782"
+_DEFAULT_PAYMENT_EDRPOU = "3577508940"
+_DEFAULT_PAYMENT_PURPOSE = "Оплата за товар"
+
+
+def get_payment_requisites() -> dict[str, str]:
+    """Реквізити для оплати з .env (PAYMENT_RECIPIENT, PAYMENT_IBAN, PAYMENT_EDRPOU, PAYMENT_PURPOSE)."""
+    return {
+        "recipient": os.getenv("PAYMENT_RECIPIENT") or _DEFAULT_PAYMENT_RECIPIENT,
+        "iban": os.getenv("PAYMENT_IBAN") or _DEFAULT_PAYMENT_IBAN,
+        "edrpou": os.getenv("PAYMENT_EDRPOU") or _DEFAULT_PAYMENT_EDRPOU,
+        "purpose": os.getenv("PAYMENT_PURPOSE") or _DEFAULT_PAYMENT_PURPOSE,
+    }
+
+
+def get_payment_collapse_copy() -> bool:
+    """Якщо PAYMENT_COLLAPSE_COPY=1 — копійовані рядки йдуть одним повідомленням з кількома <code> блоками."""
+    return os.getenv("PAYMENT_COLLAPSE_COPY", "").strip().lower() in ("1", "true", "yes")
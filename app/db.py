@@ -6,6 +6,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from dotenv import load_dotenv
 
+from app.services.query_stats import install as install_query_stats
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -15,6 +17,8 @@ if not DATABASE_URL:
 
 # sync engine, pool_pre_ping чтобы отлавливать отвалившиеся коннекты
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Подсчёт запросов по областям и лог медленных (app/services/query_stats.py)
+install_query_stats()
 
 SessionLocal = sessionmaker(
     bind=engine, autoflush=False, autocommit=False, expire_on_commit=False
@@ -4,35 +4,41 @@ import asyncio
 from contextlib import asynccontextmanager
 from app.state import is_processed, mark_processed, update_telegram_info
 from fastapi import FastAPI, Request, HTTPException
-import hmac, hashlib, base64
-from app.config import get_shopify_webhook_secret
+import hmac
+from app.config import get_debug_token, get_metrics_token, get_shopify_webhook_secret
 
 from app.services.phone_utils import normalize_ua_phone
 from app.services.address_utils import get_delivery_and_contact_info, get_contact_name, get_contact_phone_e164, \
     addresses_are_same
 
-from app.db import get_session
+from app.db import engine, get_session
 from app.models import Order, OrderStatus
 
 # Expose UI helpers and Telegram helpers for tests
 from app.services.menu_ui import orders_list_buttons, order_card_buttons
 from app.services.tg_service import send_text_with_buttons, answer_callback_query
-
-import logging, json as _json, time
+from app.services.log_pipeline import EventMessage, setup_logging
+from app.services.metrics import HttpMetricsMiddleware, WEBHOOK_STAGE_SECONDS
+from app.services.query_stats import QueryScopeMiddleware
+from app.services.shopify_hmac import sign_webhook
+from app.services.tracing import TracingMiddleware, get_tracer, instrument_sqlalchemy, set_attribute
+from app.services.webhook_capture import WebhookCapture, WebhookCaptureMiddleware
+
+import logging, time
 import os
 
-# Настройка детального логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Логирование через очередь: формат и запись - в фоновом потоке (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE)
+setup_logging()
 logger = logging.getLogger("app.main")
 
 
 def log_event(event: str, **kwargs):
+    # JSON собирается в потоке записи; тип события - ключ сэмплирования LOG_SAMPLE
+    if not logger.isEnabledFor(logging.INFO):
+        return
     payload = {"event": event, "timestamp": int(time.time())}
     payload.update(kwargs)
-    logger.info(_json.dumps(payload, ensure_ascii=False))
+    logger.info(EventMessage(payload), extra={"event": event})
 
 
 @asynccontextmanager
@@ -40,6 +46,20 @@ async def lifespan(app_instance: FastAPI):
     """Управление жизненным циклом приложения"""
     logger.info("Starting application lifespan...")
 
+    # Поднимаем и прогреваем пул рендера PDF до первого запроса; шрифты и бренд -
+    # и в основном процессе (thread-бэкенд и экспорт рендерят здесь)
+    try:
+        from app.services.pdf_renderer import get_pdf_renderer
+        from app.services.pdf_service import warmup_assets
+        await asyncio.get_running_loop().run_in_executor(None, warmup_assets)
+        await get_pdf_renderer().start()
+    except Exception as e:
+        logger.error(f"Failed to start PDF renderer: {e}", exc_info=True)
+
+    # Лаг event loop в /metrics и стек при блокировке синхронным кодом
+    from app.services.loop_watchdog import start_loop_watchdog, stop_loop_watchdog
+    await start_loop_watchdog()
+
     try:
         # Импортируем и запускаем бота при старте
         from app.bot.main import start_bot
@@ -66,6 +86,20 @@ async def lifespan(app_instance: FastAPI):
         except Exception as e:
             logger.error(f"Error stopping bot: {e}", exc_info=True)
 
+        from app.services.pdf_renderer import shutdown_pdf_renderer
+        shutdown_pdf_renderer()
+
+        from app.services.keycrm_client import close_keycrm_client
+        await close_keycrm_client()
+
+        if webhook_capture:
+            webhook_capture.close()
+
+        from app.services.tracing import shutdown_tracer
+        shutdown_tracer()
+
+        await stop_loop_watchdog()
+
 
 # СОЗДАЕМ ОБЪЕКТ ПРИЛОЖЕНИЯ
 app = FastAPI(
@@ -75,6 +109,22 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Middleware и хуки наблюдаемости. Последний добавленный middleware - внешний:
+#   HttpMetricsMiddleware      латентность HTTP по маршрутам для /metrics
+#   QueryScopeMiddleware       число SQL-запросов и время БД на запрос (бюджет DB_QUERY_BUDGET)
+#   TracingMiddleware          корневой спан на запрос + спаны SQL-запросов (TRACING_EXPORTER)
+#   WebhookCaptureMiddleware   запись webhook для воспроизведения (WEBHOOK_CAPTURE_PATH, по умолчанию выкл.)
+# Хуки подсчёта SQL-запросов ставит app.db при создании engine.
+app.add_middleware(HttpMetricsMiddleware)
+app.add_middleware(QueryScopeMiddleware)
+if get_tracer():
+    instrument_sqlalchemy(engine)
+    app.add_middleware(TracingMiddleware)
+webhook_capture = WebhookCapture.from_env()
+if webhook_capture:
+    app.add_middleware(WebhookCaptureMiddleware, capture=webhook_capture)
+    logger.info(f"Capturing Shopify webhooks to {webhook_capture.path}")
+
 
 def _extract_customer_data_new_logic(order: dict) -> tuple[str, str, str]:
     """
@@ -131,6 +181,28 @@ def health():
     return {"status": "ok", "timestamp": int(time.time())}
 
 
+def _require_bearer(request: Request, token: str | None) -> None:
+    """Authorization: Bearer <token>; токен не задан - эндпойнт выключен (404)."""
+    if not token:
+        raise HTTPException(status_code=404, detail="Not found")
+    auth = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(auth.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+@app.get("/metrics")
+def metrics(request: Request):
+    """Метрики Prometheus: стадии webhook, документы, callback'и, задачи, пул БД, очереди"""
+    from fastapi.responses import Response
+    from app.services.metrics import CONTENT_TYPE, render_metrics
+
+    # METRICS_TOKEN не задан - /metrics открыт (доступ ограничивают сетью)
+    token = get_metrics_token()
+    if token:
+        _require_bearer(request, token)
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 def root():
     """Корневой путь"""
@@ -139,6 +211,7 @@ def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "webhook": "/webhooks/shopify/orders",
             "telegram": "/telegram/webhook"
         }
@@ -196,6 +269,7 @@ async def shopify_webhook(request: Request):
     logger.info(f"Body size: {len(raw_body)} bytes")
 
     # HMAC валидация
+    stage_started = time.perf_counter()
     hmac_header = request.headers.get("X-Shopify-Hmac-Sha256")
     secret = get_shopify_webhook_secret()
 
@@ -207,15 +281,13 @@ async def shopify_webhook(request: Request):
         logger.error("Missing SHOPIFY_WEBHOOK_SECRET")
         raise HTTPException(status_code=500, detail="Missing webhook secret")
 
-    # Shopify использует secret как UTF-8 строку
-    secret_bytes = secret.encode('utf-8')
-    digest = hmac.new(secret_bytes, raw_body, hashlib.sha256).digest()
-    computed_hmac = base64.b64encode(digest).decode('utf-8')
+    computed_hmac = sign_webhook(raw_body, secret)
 
     if not hmac.compare_digest(computed_hmac, hmac_header):
         logger.error(f"HMAC mismatch: computed={computed_hmac}, expected={hmac_header}")
         raise HTTPException(status_code=403, detail="Invalid HMAC signature")
 
+    WEBHOOK_STAGE_SECONDS.labels("hmac").observe(time.perf_counter() - stage_started)
     logger.info("✅ HMAC validation passed")
 
     # Парсим JSON
@@ -232,9 +304,12 @@ async def shopify_webhook(request: Request):
         raise HTTPException(status_code=400, detail="order_id is missing")
 
     logger.info(f"Processing order_id: {order_id}")
+    set_attribute("order.id", str(order_id))
 
     # 2) Проверяем идемпотентность
-    if await is_processed(order_id):
+    with WEBHOOK_STAGE_SECONDS.labels("db_check").time():
+        duplicate = await is_processed(order_id)
+    if duplicate:
         log_event("webhook_duplicate", order_id=str(order_id))
         return {"status": "duplicate", "order_id": str(order_id)}
 
@@ -249,7 +324,8 @@ async def shopify_webhook(request: Request):
         else:
             # Если только ID - получаем полные данные
             logger.info(f"Fetching full order {order_id} from Shopify...")
-            order_full = get_order(order_id)
+            with WEBHOOK_STAGE_SECONDS.labels("shopify_fetch").time():
+                order_full = get_order(order_id)
 
         pretty_order_no = _display_order_number(order_full, order_id)
         log_event("order_data_ok", order_id=str(order_id), order_no=pretty_order_no)
@@ -294,12 +370,14 @@ async def shopify_webhook(request: Request):
     order_data_with_contact['customer']['first_name'] = first_name
     order_data_with_contact['customer']['last_name'] = last_name
 
-    marked = await mark_processed(order_id, order_data_with_contact)
+    with WEBHOOK_STAGE_SECONDS.labels("db_upsert").time():
+        marked = await mark_processed(order_id, order_data_with_contact)
     if not marked:
         log_event("webhook_race_condition", order_id=str(order_id))
         return {"status": "duplicate", "order_id": str(order_id)}
 
     # 6) ДОПОЛНИТЕЛЬНОЕ ИСПРАВЛЕНИЕ: Обновляем поля контактных данных в БД
+    stage_started = time.perf_counter()
     try:
         with get_session() as session:
             order_obj = session.get(Order, order_id)
@@ -309,10 +387,20 @@ async def shopify_webhook(request: Request):
                 order_obj.customer_last_name = last_name[:100] if last_name else ""
                 if phone_e164:
                     order_obj.customer_phone_e164 = phone_e164[:32]
+                from app.services.customer_service import attach_customer
+                attach_customer(session, order_obj)
                 session.commit()
                 logger.info(f"✅ Updated contact data in DB: {first_name} {last_name}, {phone_e164}")
     except Exception as e:
         logger.error(f"Failed to update contact data in DB: {e}")
+    WEBHOOK_STAGE_SECONDS.labels("db_contact").observe(time.perf_counter() - stage_started)
+
+    # 6.1) Предрендер PDF/VCF в пуле воркеров - к нажатию кнопки документы уже готовы
+    try:
+        from app.services.document_service import schedule_prerender
+        schedule_prerender(order_id)
+    except Exception as e:
+        logger.error(f"Failed to schedule documents prerender: {e}")
 
     # 7) Отправляем ОТДЕЛЬНОЕ сообщение с кнопкой "Закрити"
     try:
@@ -336,6 +424,7 @@ async def shopify_webhook(request: Request):
                 raise HTTPException(status_code=500, detail="Database error")
 
             # WEBHOOK заказ: отправляется ОТДЕЛЬНО (не как navigation!)
+            stage_started = time.perf_counter()
             from app.bot.services.message_builder import get_status_emoji, DIVIDER
 
             # Строим сообщение
@@ -375,15 +464,18 @@ async def shopify_webhook(request: Request):
             from app.bot.routers.shared import get_webhook_order_keyboard
             webhook_keyboard = get_webhook_order_keyboard(order_obj)
 
+            WEBHOOK_STAGE_SECONDS.labels("card_render").observe(time.perf_counter() - stage_started)
+
             # Отправляем сообщение каждому менеджеру
             from app.bot.routers.shared import add_webhook_message
-            for manager_id in manager_ids:
-                msg = await bot.send_message(
-                    manager_id,
-                    main_message,
-                    reply_markup=webhook_keyboard
-                )
-                add_webhook_message(order_id, manager_id, msg.message_id)
+            with WEBHOOK_STAGE_SECONDS.labels("telegram_send").time():
+                for manager_id in manager_ids:
+                    msg = await bot.send_message(
+                        manager_id,
+                        main_message,
+                        reply_markup=webhook_keyboard
+                    )
+                    add_webhook_message(order_id, manager_id, msg.message_id)
 
             logger.info(f"Webhook order card sent to managers: {manager_ids}")
             logger.info(f"Contact identified: {first_name} {last_name}")
@@ -402,8 +494,9 @@ async def shopify_webhook(request: Request):
 
 # Добавляем дополнительные эндпойнты для отладки
 @app.get("/debug/orders")
-async def debug_orders():
+async def debug_orders(request: Request):
     """Отладочный эндпойнт для просмотра заказов"""
+    _require_bearer(request, get_debug_token())
     try:
         with get_session() as session:
             orders = session.query(Order).order_by(Order.created_at.desc()).limit(10).all()
@@ -427,6 +520,106 @@ async def debug_orders():
         return {"error": str(e)}
 
 
+@app.get("/debug/logging")
+def debug_logging_state(request: Request):
+    """Текущие уровни логгеров, доли сэмплирования и глубина очереди логов."""
+    from app.services.log_pipeline import logging_state
+
+    _require_bearer(request, get_debug_token())
+    return logging_state()
+
+
+@app.post("/debug/logging")
+def debug_logging_update(request: Request, logger_name: str | None = None, level: str | None = None,
+                         event: str | None = None, rate: float | None = None):
+    """
+    Уровень и сэмплирование на лету, без перезапуска:
+    ?logger_name=app.bot.debug&level=DEBUG, ?event=webhook_duplicate&rate=0.1 (rate=1 - снять).
+    """
+    from app.services.log_pipeline import logging_state, set_level, set_sample_rate
+
+    _require_bearer(request, get_debug_token())
+    try:
+        if level is not None:
+            set_level(logger_name or "", level)
+        if event is not None:
+            set_sample_rate(event, rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log_event("debug_logging_update", logger=logger_name, level=level, sample_event=event, rate=rate)
+    return logging_state()
+
+
+@app.get("/debug/profile")
+async def debug_profile(request: Request, seconds: float = 10.0, interval_ms: float = 5.0, idle: bool = False):
+    """
+    Сэмплирующий профиль живого процесса (event loop + потоки executor'ов) за seconds секунд.
+    Ответ - collapsed stacks: flamegraph.pl profile.txt > profile.svg или speedscope.app.
+    """
+    from fastapi.responses import PlainTextResponse
+    from app.services.profiler import MAX_PROFILE_SECONDS, ProfilerBusy, collapsed, sample_stacks
+
+    _require_bearer(request, get_debug_token())
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}], "
+                                                    f"interval_ms in [1, 1000]")
+    log_event("debug_profile", seconds=seconds, interval_ms=interval_ms)
+    try:
+        # Сэмплер - в отдельном потоке: event loop продолжает работать и попадает в профиль
+        stacks = await asyncio.get_running_loop().run_in_executor(
+            None, sample_stacks, seconds, interval_ms / 1000, idle
+        )
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Profile already running")
+    return PlainTextResponse(
+        collapsed(stacks),
+        headers={"Content-Disposition": f'attachment; filename="profile-{int(time.time())}.txt"'},
+    )
+
+
+@app.get("/debug/memory")
+def debug_memory(request: Request, limit: int = 25, group_by: str = "lineno", reset: bool = False,
+                 stop: bool = False):
+    """
+    Рост памяти через tracemalloc: первый вызов включает трассировку и берёт базовый снимок,
+    следующие - top мест роста относительно него и размеры in-memory состояния бота.
+    """
+    from app.services.profiler import memory_report
+
+    _require_bearer(request, get_debug_token())
+    try:
+        return memory_report(limit=max(1, min(limit, 200)), group_by=group_by, reset=reset, stop=stop)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/export/contacts.vcf")
+def export_contacts_vcf(request: Request, status: str = "all", period: str = "today"):
+    """
+    Multi-vCard по фильтру, стримингом с серверного курсора.
+    Авторизация: заголовок Authorization: Bearer <EXPORT_API_TOKEN>.
+    """
+    from fastapi.responses import StreamingResponse
+    from app.services.export_service import (
+        get_export_api_token, parse_export_filter, iter_contacts_vcf, export_filename
+    )
+
+    _require_bearer(request, get_export_api_token())
+
+    try:
+        flt = parse_export_filter(f"{status} {period}", default_status=None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = export_filename(flt, "contacts", "vcf")
+    log_event("export_contacts_vcf", filter=flt.describe())
+    return StreamingResponse(
+        iter_contacts_vcf(flt),
+        media_type="text/vcard; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -2,7 +2,8 @@
 from enum import Enum as PyEnum
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import BigInteger, String, Enum, Boolean, DateTime, func, Index, Text, Integer, ForeignKey
+from sqlalchemy import BigInteger, String, Enum, Boolean, DateTime, func, Index, Text, Integer, ForeignKey, \
+    LargeBinary, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db import Base
@@ -15,6 +16,30 @@ class OrderStatus(PyEnum):
     CANCELLED = "CANCELLED"
 
 
+class Customer(Base):
+    """Покупатель: один на нормализованный телефон, на него ссылаются заказы"""
+    __tablename__ = "customers"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    phone_e164: Mapped[str] = mapped_column(String(32), unique=True, nullable=False)
+
+    first_name: Mapped[Optional[str]] = mapped_column(String(100))
+    last_name: Mapped[Optional[str]] = mapped_column(String(100))
+    email: Mapped[Optional[str]] = mapped_column(String(255))
+
+    # id покупателя в keyCRM - повторным покупателям поиск в CRM не нужен
+    crm_buyer_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    orders: Mapped[list["Order"]] = relationship(back_populates="customer")
+
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -44,6 +69,15 @@ class Order(Base):
 
     raw_json: Mapped[Optional[dict]] = mapped_column(JSONB)
 
+    customer_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("customers.id", ondelete="SET NULL")
+    )
+
+    # Синхронизация с keyCRM (id заказа в CRM - raw_json._crm_order_id)
+    crm_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    crm_sync_attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    crm_sync_error: Mapped[Optional[str]] = mapped_column(Text)
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -55,9 +89,14 @@ class Order(Base):
     status_history: Mapped[list["OrderStatusHistory"]] = relationship(
         back_populates="order", cascade="all, delete-orphan"
     )
+    customer: Mapped[Optional["Customer"]] = relationship(back_populates="orders")
 
 
 Index("ix_orders_status_created_at", Order.status, Order.created_at.desc())
+# "Заказы покупателя" - одна выборка по индексу
+Index("ix_orders_customer_id_created_at", Order.customer_id, Order.created_at.desc())
+# Очередь фоновой синхронизации с keyCRM
+Index("ix_orders_crm_sync", Order.status, Order.crm_synced_at, Order.id)
 
 
 class OrderStatusHistory(Base):
@@ -77,4 +116,31 @@ class OrderStatusHistory(Base):
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
-    order: Mapped["Order"] = relationship(back_populates="status_history")
\ No newline at end of file
+    order: Mapped["Order"] = relationship(back_populates="status_history")
+
+
+class OrderDocument(Base):
+    """Предрендеренные документы заказа (PDF/VCF), сгенерированные при приёме заказа"""
+    __tablename__ = "order_documents"
+    __table_args__ = (
+        UniqueConstraint("order_id", "doc_type", name="uq_order_documents_order_doc_type"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    doc_type: Mapped[str] = mapped_column(String(8), nullable=False)  # "pdf" | "vcf"
+
+    # sha256 от raw_json + контактных полей заказа; при изменении — перерендер
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False, deferred=True)
+
+    # file_id из первого send_document - повторные отправки идут без загрузки байтов
+    telegram_file_id: Mapped[Optional[str]] = mapped_column(String(255))
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
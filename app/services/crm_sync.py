@@ -0,0 +1,179 @@
+# app/services/crm_sync.py
+"""
+Фоновая синхронизация заказов с keyCRM (CRM_SYNC_ENABLED=1).
+
+Задача планировщика бота раз в CRM_SYNC_INTERVAL минут проходит по
+подходящим заказам (статус из CRM_SYNC_STATUSES, ещё не синхронизированы,
+попыток меньше CRM_SYNC_MAX_ATTEMPTS) порциями по CRM_SYNC_BATCH и для
+каждого:
+    1. ищет заказ в keyCRM по source_uuid (номер заказа) - ключ идемпотентности;
+    2. если не найден - создаёт его.
+id из CRM пишется в raw_json._crm_order_id (как и при ручном создании),
+отметка времени - в orders.crm_synced_at, ошибка и число попыток - в
+crm_sync_error / crm_sync_attempts.
+
+Всё состояние - в БД, поэтому после рестарта синхронизация продолжается
+с того же места; первый проход запускается сразу при старте.
+Запросы порции уходят через очередь keyCRM-клиента (app.services.keycrm_client),
+он держит поток на уровне лимита API. Синхронизация ставит запросы в фоновую
+очередь (уходят после интерактивных) и держит в работе не больше
+CRM_SYNC_CONCURRENCY заказов: очередь не забивается всей порцией сразу.
+Заказ, не дождавшийся очереди (KeyCrmQueueTimeout), попыткой не считается -
+он уйдёт в следующий проход.
+
+Настройки (.env):
+    CRM_SYNC_ENABLED        1 - включить фоновую синхронизацию (по умолчанию 0)
+    CRM_SYNC_INTERVAL       период запуска, минуты (по умолчанию 5)
+    CRM_SYNC_BATCH          заказов в одной порции (по умолчанию 50)
+    CRM_SYNC_STATUSES       статусы через запятую (по умолчанию PAID)
+    CRM_SYNC_MAX_ATTEMPTS   после стольких ошибок заказ пропускается (по умолчанию 5)
+    CRM_SYNC_CONCURRENCY    заказов в работе одновременно (по умолчанию 4)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import select, update
+
+from app.db import get_session
+from app.models import Order, OrderStatus
+from app.services.keycrm_client import KeyCrmQueueTimeout, background_requests
+from app.services.tracing import run_in_executor
+
+logger = logging.getLogger(__name__)
+
+# Не больше одного прохода одновременно (планировщик + ручной запуск)
+_sync_lock = asyncio.Lock()
+
+
+class CrmSyncResult(NamedTuple):
+    created: int
+    existing: int  # уже были в keyCRM - только привязаны
+    failed: int
+    deferred: int = 0  # не дождались очереди keyCRM - без попытки, в следующий проход
+
+
+def is_crm_sync_enabled() -> bool:
+    return os.getenv("CRM_SYNC_ENABLED", "0").strip().lower() in ("1", "true", "yes")
+
+
+def get_sync_interval() -> int:
+    return int(os.getenv("CRM_SYNC_INTERVAL", "5"))
+
+
+def get_sync_batch_size() -> int:
+    return int(os.getenv("CRM_SYNC_BATCH", "50"))
+
+
+def get_sync_max_attempts() -> int:
+    return int(os.getenv("CRM_SYNC_MAX_ATTEMPTS", "5"))
+
+
+def get_sync_concurrency() -> int:
+    return max(1, int(os.getenv("CRM_SYNC_CONCURRENCY", "4")))
+
+
+def get_sync_statuses() -> List[OrderStatus]:
+    raw = os.getenv("CRM_SYNC_STATUSES", OrderStatus.PAID.value)
+    return [OrderStatus(s.strip().upper()) for s in raw.split(",") if s.strip()]
+
+
+def select_sync_batch(after_id: int, limit: int) -> List[Order]:
+    """Следующая порция заказов для синхронизации (по возрастанию id, после after_id)."""
+    with get_session() as session:
+        orders = list(session.execute(
+            select(Order)
+            .where(
+                Order.id > after_id,
+                Order.status.in_(get_sync_statuses()),
+                Order.crm_synced_at.is_(None),
+                Order.crm_sync_attempts < get_sync_max_attempts(),
+                Order.raw_json.isnot(None),
+            )
+            .order_by(Order.id)
+            .limit(limit)
+        ).scalars())
+        # Отвязываем от сессии - дальше нужны только загруженные скалярные поля
+        session.expunge_all()
+    return orders
+
+
+def mark_synced(order_id: int, crm_id: int) -> None:
+    """Сохраняет id заказа keyCRM и отметку синхронизации."""
+    with get_session() as session:
+        order = session.get(Order, order_id)
+        if not order:
+            return
+        order.raw_json = {**(order.raw_json or {}), "_crm_order_id": crm_id}
+        order.crm_synced_at = datetime.now(timezone.utc)
+        order.crm_sync_error = None
+        session.commit()
+
+
+def mark_failed(order_id: int, error: str) -> None:
+    with get_session() as session:
+        session.execute(
+            update(Order)
+            .where(Order.id == order_id)
+            .values(crm_sync_attempts=Order.crm_sync_attempts + 1, crm_sync_error=error[:1000])
+        )
+        session.commit()
+
+
+async def sync_order(order: Order) -> tuple[int, bool]:
+    """
+    Один заказ: поиск по source_uuid, при отсутствии - создание.
+    Возвращает (crm_id, created).
+    """
+    from app.services.keycrm_service import create_crm_order, find_crm_order_by_source_uuid, order_source_uuid
+
+    existing = await find_crm_order_by_source_uuid(order_source_uuid(order))
+    if existing:
+        return existing["id"], False
+    result = await create_crm_order(order)
+    return result["id"], True
+
+
+async def _sync_one(order: Order, slots: asyncio.Semaphore) -> str:
+    """Исход для CrmSyncResult: created / existing / failed (ошибка записана в заказ) / deferred."""
+    try:
+        async with slots:
+            crm_id, created = await sync_order(order)
+    except KeyCrmQueueTimeout as e:
+        logger.info(f"CRM sync deferred for order {order.id}: {e}")
+        return "deferred"
+    except Exception as e:
+        logger.warning(f"CRM sync failed for order {order.id}: {e}")
+        await run_in_executor(None, mark_failed, order.id, str(e))
+        return "failed"
+    await run_in_executor(None, mark_synced, order.id, crm_id)
+    return "created" if created else "existing"
+
+
+async def run_crm_sync(batch_size: Optional[int] = None) -> CrmSyncResult:
+    """Один проход по всем подходящим заказам."""
+    batch_size = batch_size or get_sync_batch_size()
+    outcomes: Counter = Counter()
+
+    async with _sync_lock:
+        slots = asyncio.Semaphore(get_sync_concurrency())
+        after_id = 0
+        while True:
+            batch = await run_in_executor(None, select_sync_batch, after_id, batch_size)
+            if not batch:
+                break
+            after_id = batch[-1].id
+
+            with background_requests():
+                outcomes.update(await asyncio.gather(*(_sync_one(order, slots) for order in batch)))
+
+    result = CrmSyncResult(*(outcomes[field] for field in CrmSyncResult._fields))
+    if any(result):
+        logger.info(f"CRM sync: created={result.created}, existing={result.existing}, "
+                    f"failed={result.failed}, deferred={result.deferred}")
+    return result
@@ -0,0 +1,131 @@
+# app/services/customer_service.py
+"""
+Покупатели: одна запись customers на нормализованный телефон (E.164).
+
+Запись создаётся или обновляется upsert'ом при приёме заказа
+(INSERT ... ON CONFLICT (phone_e164) DO UPDATE), заказ получает customer_id.
+Пустые имя/email не затирают уже известные.
+
+В customers.crm_buyer_id кэшируется id покупателя в keyCRM: для
+повторного покупателя кнопка "Створити покупця" не ходит в CRM вовсе.
+"""
+from __future__ import annotations
+
+import logging
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.db import get_session
+from app.models import Customer, Order
+
+logger = logging.getLogger(__name__)
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _clean(value: Optional[str], limit: int) -> Optional[str]:
+    value = (value or "").strip()[:limit]
+    return value or None
+
+
+def upsert_customer(session, phone_e164: str, first_name: Optional[str] = None,
+                    last_name: Optional[str] = None, email: Optional[str] = None) -> int:
+    """Создаёт или обновляет покупателя по телефону. Возвращает customers.id."""
+    values = {
+        "phone_e164": phone_e164[:32],
+        "first_name": _clean(first_name, 100),
+        "last_name": _clean(last_name, 100),
+        "email": _clean(email, 255),
+    }
+
+    insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if insert is None:
+        # Прочие диалекты (не используются в проде) - select + insert
+        customer = session.execute(
+            select(Customer).where(Customer.phone_e164 == values["phone_e164"])
+        ).scalar_one_or_none()
+        if customer is None:
+            customer = Customer(**values)
+            session.add(customer)
+        else:
+            for key in ("first_name", "last_name", "email"):
+                if values[key]:
+                    setattr(customer, key, values[key])
+        session.flush()
+        return customer.id
+
+    stmt = insert(Customer).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Customer.phone_e164],
+        set_={
+            "first_name": func.coalesce(stmt.excluded.first_name, Customer.first_name),
+            "last_name": func.coalesce(stmt.excluded.last_name, Customer.last_name),
+            "email": func.coalesce(stmt.excluded.email, Customer.email),
+            "updated_at": func.now(),
+        },
+    ).returning(Customer.id)
+    return session.execute(stmt).scalar_one()
+
+
+def attach_customer(session, order: Order) -> Optional[int]:
+    """Привязывает заказ к покупателю по его телефону. Без телефона - ничего не делает."""
+    if not order.customer_phone_e164:
+        return None
+    customer_id = upsert_customer(
+        session,
+        order.customer_phone_e164,
+        order.customer_first_name,
+        order.customer_last_name,
+        (order.raw_json or {}).get("email"),
+    )
+    order.customer_id = customer_id
+    return customer_id
+
+
+def get_customer_orders(session, customer_id: int, limit: int = 50) -> List[Order]:
+    """Заказы покупателя, новые первыми (индекс ix_orders_customer_id_created_at)."""
+    return list(session.execute(
+        select(Order)
+        .where(Order.customer_id == customer_id)
+        .order_by(Order.created_at.desc())
+        .limit(limit)
+    ).scalars())
+
+
+def get_cached_buyer_id(order: Order) -> Optional[int]:
+    """id покупателя keyCRM из customers для заказа, если уже известен."""
+    if not order.customer_id and not order.customer_phone_e164:
+        return None
+    query = select(Customer.crm_buyer_id)
+    if order.customer_id:
+        query = query.where(Customer.id == order.customer_id)
+    else:
+        query = query.where(Customer.phone_e164 == order.customer_phone_e164)
+    with get_session() as session:
+        return session.execute(query).scalar_one_or_none()
+
+
+def remember_crm_buyer_id(order: Order, buyer_id: int) -> None:
+    """Сохраняет id покупателя keyCRM у покупателя заказа."""
+    if not order.customer_phone_e164:
+        return
+    with get_session() as session:
+        if order.customer_id:
+            customer_id = order.customer_id
+        else:
+            customer_id = upsert_customer(
+                session, order.customer_phone_e164,
+                order.customer_first_name, order.customer_last_name,
+            )
+            session.execute(
+                update(Order).where(Order.id == order.id).values(customer_id=customer_id)
+            )
+        session.execute(
+            update(Customer).where(Customer.id == customer_id).values(crm_buyer_id=int(buyer_id))
+        )
+        session.commit()
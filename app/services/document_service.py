@@ -0,0 +1,199 @@
+# app/services/document_service.py
+"""
+Предрендер документов заказа (PDF + VCF) на этапе приёма заказа.
+
+Документы рендерятся сразу после сохранения заказа (PDF - через сервис
+рендера app.services.pdf_renderer) и хранятся в таблице order_documents
+с хэшем содержимого заказа.
+Кнопки "PDF"/"VCF" отдают готовые байты; перерендер происходит только
+если изменились raw_json или контактные поля заказа, шаблон PDF или
+RENDERER_VERSION в pdf_service.
+
+После первой отправки сохраняется telegram_file_id, и дальнейшие
+отправки того же содержимого идут по file_id без повторной загрузки.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app.db import get_session
+from app.models import Order, OrderDocument
+from app.services.metrics import DOCUMENT_RENDER_SECONDS
+from app.services.pdf_renderer import get_pdf_renderer
+from app.services.pdf_service import build_order_pdf, render_fingerprint
+from app.services.tracing import run_in_executor
+from app.services.vcf_service import build_contact_vcf
+
+logger = logging.getLogger(__name__)
+
+DOC_PDF = "pdf"
+DOC_VCF = "vcf"
+DOC_TYPES = (DOC_PDF, DOC_VCF)
+
+
+class CachedDocument(NamedTuple):
+    """Документ заказа, готовый к отправке."""
+    data: Optional[bytes]  # None, если есть file_id и байты не запрашивались
+    filename: str
+    content_hash: str
+    file_id: Optional[str]
+
+
+# Отдельный пул для синхронной работы с БД, чтобы не занимать дефолтный executor
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="doc-store")
+
+
+def order_content_hash(order: Order) -> str:
+    """
+    sha256 от raw_json, контактных полей и версии рендера с шаблоном - всего,
+    что влияет на PDF/VCF.
+    """
+    payload = {
+        "renderer": render_fingerprint(),
+        "raw_json": order.raw_json or {},
+        "order_number": order.order_number,
+        "id": order.id,
+        "first_name": order.customer_first_name or "",
+        "last_name": order.customer_last_name or "",
+        "phone": order.customer_phone_e164 or "",
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def render_document(order: Order, doc_type: str) -> Tuple[bytes, str]:
+    """Рендерит документ заказа. Возвращает (bytes, filename)."""
+    if doc_type == DOC_PDF:
+        return build_order_pdf(order.raw_json or {})
+    if doc_type == DOC_VCF:
+        return build_contact_vcf(
+            first_name=order.customer_first_name or "",
+            last_name=order.customer_last_name or "",
+            order_id=str(order.order_number or order.id),
+            phone_e164=order.customer_phone_e164,
+        )
+    raise ValueError(f"Unknown document type: {doc_type}")
+
+
+def _store_document(session, order_id: int, doc_type: str, content_hash: str,
+                    data: bytes, filename: str) -> None:
+    """Вставляет или обновляет запись документа (одна запись на order_id + doc_type)."""
+    doc = session.query(OrderDocument).filter_by(order_id=order_id, doc_type=doc_type).first()
+    if doc:
+        doc.content_hash = content_hash
+        doc.data = data
+        doc.filename = filename
+        doc.telegram_file_id = None  # новое содержимое - старый file_id недействителен
+    else:
+        session.add(OrderDocument(
+            order_id=order_id,
+            doc_type=doc_type,
+            content_hash=content_hash,
+            data=data,
+            filename=filename,
+        ))
+
+
+def _lookup_document(order_id: int, doc_type: str,
+                     need_data: bool) -> Tuple[Optional[CachedDocument], Optional[Order], Optional[str]]:
+    """
+    Синхронно: ищет актуальный документ в кэше.
+    Возвращает (cached, None, hash) при попадании, (None, detached_order, hash)
+    если нужен рендер, и (None, None, None) если заказа нет.
+
+    need_data=False не читает байты из БД, если для документа уже есть file_id.
+    """
+    with get_session() as session:
+        order = session.get(Order, order_id)
+        if not order or (doc_type == DOC_PDF and not order.raw_json):
+            return None, None, None
+
+        content_hash = order_content_hash(order)
+        doc = session.query(OrderDocument).filter_by(order_id=order_id, doc_type=doc_type).first()
+        if doc and doc.content_hash == content_hash:
+            if doc.telegram_file_id and not need_data:
+                return CachedDocument(None, doc.filename, content_hash, doc.telegram_file_id), None, content_hash
+            return CachedDocument(doc.data, doc.filename, content_hash, doc.telegram_file_id), None, content_hash
+
+        # Отвязываем от сессии - скалярные атрибуты уже загружены, рендер идёт вне сессии
+        session.expunge(order)
+        return None, order, content_hash
+
+
+def _save_rendered(order_id: int, doc_type: str, content_hash: str, data: bytes, filename: str) -> None:
+    """Синхронно сохраняет свежеотрендеренный документ."""
+    with get_session() as session:
+        _store_document(session, order_id, doc_type, content_hash, data, filename)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Параллельный предрендер уже вставил запись
+            session.rollback()
+
+
+def save_document_file_id(order_id: int, doc_type: str, content_hash: str, file_id: str) -> bool:
+    """
+    Запоминает file_id после загрузки документа в Telegram.
+    Сохраняется только если содержимое не изменилось за время отправки.
+    """
+    with get_session() as session:
+        updated = session.query(OrderDocument).filter_by(
+            order_id=order_id, doc_type=doc_type, content_hash=content_hash
+        ).update({"telegram_file_id": file_id}, synchronize_session=False)
+        return bool(updated)
+
+
+async def _render(order: Order, doc_type: str) -> Tuple[bytes, str]:
+    """PDF - через сервис рендера (thread/process пул), VCF - на месте (дешёвый)."""
+    with DOCUMENT_RENDER_SECONDS.labels(doc_type).time():
+        if doc_type == DOC_PDF:
+            return await get_pdf_renderer().render_order(order.raw_json or {})
+        return render_document(order, doc_type)
+
+
+async def get_order_document(order_id: int, doc_type: str,
+                             need_data: bool = True) -> Optional[CachedDocument]:
+    """Получить документ заказа из кэша или отрендерить и сохранить новый."""
+    cached, order, content_hash = await run_in_executor(
+        _executor, _lookup_document, int(order_id), doc_type, need_data
+    )
+    if cached is not None or order is None:
+        return cached
+
+    data, filename = await _render(order, doc_type)
+    await run_in_executor(_executor, _save_rendered, int(order_id), doc_type, content_hash, data, filename)
+    return CachedDocument(data, filename, content_hash, None)
+
+
+async def remember_file_id(order_id: int, doc_type: str, content_hash: str, file_id: str) -> None:
+    """Асинхронно сохранить file_id отправленного документа."""
+    await run_in_executor(_executor, save_document_file_id, int(order_id), doc_type, content_hash, file_id)
+
+
+async def prerender_order_documents(order_id: int) -> None:
+    """Рендерит все документы заказа, которые отсутствуют или устарели."""
+    for doc_type in DOC_TYPES:
+        try:
+            await get_order_document(order_id, doc_type, need_data=False)
+        except Exception as e:
+            logger.error(f"Prerender {doc_type} failed for order {order_id}: {e}", exc_info=True)
+    logger.info(f"Documents prerendered for order {order_id}")
+
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_prerender_tasks: set[asyncio.Task] = set()
+
+
+def schedule_prerender(order_id: int) -> asyncio.Task:
+    """Запускает предрендер в фоне, не дожидаясь результата."""
+    task = asyncio.get_running_loop().create_task(prerender_order_documents(int(order_id)))
+    _prerender_tasks.add(task)
+    task.add_done_callback(_prerender_tasks.discard)
+    return task
@@ -0,0 +1,308 @@
+# app/services/export_service.py
+"""
+Пакетный экспорт заказов: PDF для склада и контакты (multi-vCard) для менеджеров.
+
+Фильтр задаётся строкой вида "paid today": статус и период в любом порядке.
+    статус: new | waiting | paid | cancelled | all (по умолчанию paid для PDF, all для контактов)
+    период: today | yesterday | week | YYYY-MM-DD | YYYY-MM-DD..YYYY-MM-DD (по умолчанию today)
+Период считается по дате создания заказа в часовом поясе Europe/Kyiv.
+
+vCard-экспорт - генератор поверх серверного курсора БД (stream_results +
+yield_per): карточки уходят порциями, память не растёт с числом контактов.
+
+PDF рендерится одной задачей в пуле app.services.pdf_renderer: воркер сам
+читает заказы из БД порциями и рисует их в один canvas - все заказы сразу в
+памяти не держатся. Сжатые потоки страниц ReportLab копит в памяти до save(),
+который пишет документ во временный файл, поэтому память растёт с числом
+страниц и экспорт ограничен EXPORT_PDF_MAX_ORDERS.
+
+Настройки (.env):
+    EXPORT_PDF_MAX_ORDERS   максимум заказов в одном экспорте (по умолчанию 500)
+    EXPORT_PDF_TIMEOUT      таймаут пакетного рендера, секунды (по умолчанию 600)
+    EXPORT_API_TOKEN        токен HTTP-экспорта контактов (не задан - эндпойнт выключен)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, NamedTuple, Optional
+
+import pytz
+from sqlalchemy import select
+
+from app.db import get_session
+from app.models import Order, OrderStatus
+from app.services.phone_utils import normalize_ua_phone_many
+from app.services.tracing import run_in_executor
+from app.services.vcf_service import build_contact_vcf
+
+logger = logging.getLogger(__name__)
+
+KYIV_TZ = pytz.timezone("Europe/Kyiv")
+
+STATUS_ALIASES = {
+    "new": OrderStatus.NEW,
+    "waiting": OrderStatus.WAITING_PAYMENT,
+    "paid": OrderStatus.PAID,
+    "cancelled": OrderStatus.CANCELLED,
+    "all": None,
+}
+
+# Сколько заказов воркер читает из БД за один запрос
+EXPORT_CHUNK_SIZE = 50
+
+# vCard: строк за одну выборку с серверного курсора и размер отдаваемой порции
+VCF_FETCH_SIZE = 1000
+VCF_CHUNK_BYTES = 64 * 1024
+
+
+class ExportFilter(NamedTuple):
+    status: Optional[OrderStatus]  # None - все статусы
+    date_from: date
+    date_to: date  # включительно
+
+    def describe(self) -> str:
+        status = self.status.value if self.status else "ALL"
+        if self.date_from == self.date_to:
+            return f"{status}, {self.date_from:%d.%m.%Y}"
+        return f"{status}, {self.date_from:%d.%m.%Y}–{self.date_to:%d.%m.%Y}"
+
+
+def get_export_max_orders() -> int:
+    return int(os.getenv("EXPORT_PDF_MAX_ORDERS", "500"))
+
+
+def get_export_timeout() -> float:
+    return float(os.getenv("EXPORT_PDF_TIMEOUT", "600"))
+
+
+def get_export_api_token() -> str:
+    return os.getenv("EXPORT_API_TOKEN", "").strip()
+
+
+def _parse_period(token: str, today: date) -> Optional[tuple[date, date]]:
+    if token == "today":
+        return today, today
+    if token == "yesterday":
+        day = today - timedelta(days=1)
+        return day, day
+    if token == "week":
+        return today - timedelta(days=6), today
+    try:
+        if ".." in token:
+            start, end = token.split("..", 1)
+            return date.fromisoformat(start), date.fromisoformat(end)
+        day = date.fromisoformat(token)
+        return day, day
+    except ValueError:
+        return None
+
+
+def parse_export_filter(args: str, today: Optional[date] = None,
+                        default_status: Optional[OrderStatus] = OrderStatus.PAID) -> ExportFilter:
+    """
+    Разбирает аргументы команды экспорта. ValueError с текстом для пользователя,
+    если аргумент не распознан.
+    """
+    today = today or datetime.now(KYIV_TZ).date()
+    status: Optional[OrderStatus] = default_status
+    period = (today, today)
+
+    for token in (args or "").lower().split():
+        if token in STATUS_ALIASES:
+            status = STATUS_ALIASES[token]
+            continue
+        parsed = _parse_period(token, today)
+        if parsed is None:
+            raise ValueError(f"Невідомий параметр: {token}")
+        period = parsed
+
+    date_from, date_to = period
+    if date_from > date_to:
+        raise ValueError("Початкова дата пізніше кінцевої")
+    return ExportFilter(status, date_from, date_to)
+
+
+def _day_bounds_utc(flt: ExportFilter) -> tuple[datetime, datetime]:
+    """[начало date_from, начало дня после date_to) по Киеву, в UTC."""
+    start = KYIV_TZ.localize(datetime.combine(flt.date_from, time.min))
+    end = KYIV_TZ.localize(datetime.combine(flt.date_to + timedelta(days=1), time.min))
+    return start.astimezone(pytz.UTC), end.astimezone(pytz.UTC)
+
+
+def export_filename(flt: ExportFilter, prefix: str, ext: str) -> str:
+    """orders_paid_20250131.pdf, contacts_all_20250101-20250131.vcf и т.п."""
+    suffix = flt.date_from.strftime("%Y%m%d")
+    if flt.date_to != flt.date_from:
+        suffix += "-" + flt.date_to.strftime("%Y%m%d")
+    status = flt.status.value.lower() if flt.status else "all"
+    return f"{prefix}_{status}_{suffix}.{ext}"
+
+
+def select_order_ids(flt: ExportFilter, limit: int) -> List[int]:
+    """id заказов под фильтр (по возрастанию даты создания), не больше limit + 1."""
+    start, end = _day_bounds_utc(flt)
+    with get_session() as session:
+        query = session.query(Order.id).filter(
+            Order.created_at >= start,
+            Order.created_at < end,
+            Order.raw_json.isnot(None),
+        )
+        if flt.status is not None:
+            query = query.filter(Order.status == flt.status)
+        # limit + 1 - чтобы отличить "ровно limit" от "больше лимита"
+        rows = query.order_by(Order.created_at, Order.id).limit(limit + 1).all()
+    return [row[0] for row in rows]
+
+
+def iter_order_payloads(order_ids: List[int], chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+    """raw_json заказов в заданном порядке, читается из БД порциями."""
+    for i in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[i:i + chunk_size]
+        with get_session() as session:
+            rows = dict(session.query(Order.id, Order.raw_json).filter(Order.id.in_(chunk)).all())
+        for order_id in chunk:
+            payload = rows.get(order_id)
+            if payload:
+                yield payload
+
+
+def export_orders_pdf(order_ids: List[int], path: str, title: str) -> int:
+    """Задача для пула рендера: пишет пакетный PDF в path. Возвращает число заказов."""
+    from app.services.pdf_service import build_orders_pdf
+    return build_orders_pdf(iter_order_payloads(order_ids), path, title=title)
+
+
+class PdfExport(NamedTuple):
+    path: str
+    filename: str
+    count: int
+    truncated: bool  # под фильтр попало больше EXPORT_PDF_MAX_ORDERS
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def export_pdf(flt: ExportFilter) -> Optional[PdfExport]:
+    """
+    Пакетный PDF по фильтру во временный файл. None - если заказов нет.
+    Файл удаляет вызывающий после отправки.
+    """
+    from app.services.pdf_renderer import PdfRenderTimeout, get_pdf_renderer
+
+    limit = get_export_max_orders()
+    order_ids = await run_in_executor(None, select_order_ids, flt, limit)
+    if not order_ids:
+        return None
+
+    truncated = len(order_ids) > limit
+    order_ids = order_ids[:limit]
+
+    filename = export_filename(flt, "orders", "pdf")
+
+    fd, path = tempfile.mkstemp(prefix="orders_export_", suffix=".pdf")
+    os.close(fd)
+    try:
+        count = await get_pdf_renderer().submit(
+            export_orders_pdf, order_ids, path, f"Замовлення: {flt.describe()}",
+            timeout=get_export_timeout(), on_abandoned=lambda: _remove_file(path),
+        )
+    except (PdfRenderTimeout, asyncio.CancelledError):
+        # Воркер может ещё писать файл - его удалит on_abandoned после завершения рендера
+        raise
+    except BaseException:
+        _remove_file(path)
+        raise
+
+    logger.info(f"PDF export {flt.describe()}: {count} orders -> {path}")
+    return PdfExport(path, filename, count, truncated)
+
+
+# ---------- vCard ----------
+def iter_contacts_vcf(flt: ExportFilter, chunk_bytes: int = VCF_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Один multi-vCard файл по фильтру, порциями по ~chunk_bytes.
+    Строки читаются с серверного курсора; заказы без телефона пропускаются.
+    """
+    start, end = _day_bounds_utc(flt)
+    query = (
+        select(
+            Order.id,
+            Order.order_number,
+            Order.customer_first_name,
+            Order.customer_last_name,
+            Order.customer_phone_e164,
+        )
+        .where(
+            Order.created_at >= start,
+            Order.created_at < end,
+            Order.customer_phone_e164.isnot(None),
+        )
+        .order_by(Order.created_at, Order.id)
+        .execution_options(stream_results=True, yield_per=VCF_FETCH_SIZE)
+    )
+    if flt.status is not None:
+        query = query.where(Order.status == flt.status)
+
+    buf = bytearray()
+    with get_session() as session:
+        for rows in session.execute(query).partitions():
+            # Старые заказы могут хранить номер не в E.164; повторы покупателя - из пакета
+            phones = normalize_ua_phone_many(row.customer_phone_e164 for row in rows)
+            for row, phone in zip(rows, phones):
+                card, _ = build_contact_vcf(
+                    first_name=row.customer_first_name or "",
+                    last_name=row.customer_last_name or "",
+                    order_id=str(row.order_number or row.id),
+                    phone_e164=phone or row.customer_phone_e164,
+                )
+                buf += card
+                if len(buf) >= chunk_bytes:
+                    yield bytes(buf)
+                    buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def write_contacts_vcf(flt: ExportFilter, path: str) -> int:
+    """Пишет multi-vCard в файл. Возвращает число карточек."""
+    count = 0
+    with open(path, "wb") as f:
+        for chunk in iter_contacts_vcf(flt):
+            count += chunk.count(b"BEGIN:VCARD")
+            f.write(chunk)
+    return count
+
+
+class VcfExport(NamedTuple):
+    path: str
+    filename: str
+    count: int
+
+
+async def export_vcf(flt: ExportFilter) -> Optional[VcfExport]:
+    """
+    Контакты по фильтру во временный файл. None - если контактов нет.
+    Файл удаляет вызывающий после отправки.
+    """
+    fd, path = tempfile.mkstemp(prefix="contacts_export_", suffix=".vcf")
+    os.close(fd)
+    try:
+        count = await run_in_executor(None, write_contacts_vcf, flt, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    if not count:
+        os.unlink(path)
+        return None
+
+    logger.info(f"VCF export {flt.describe()}: {count} contacts -> {path}")
+    return VcfExport(path, export_filename(flt, "contacts", "vcf"), count)
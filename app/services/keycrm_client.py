@@ -0,0 +1,344 @@
+# app/services/keycrm_client.py
+"""
+Асинхронный клиент keyCRM OpenAPI с ограничением частоты запросов.
+
+keyCRM допускает не больше 60 запросов в минуту на ключ. Все запросы
+проходят через одну FIFO-очередь: диспетчер выдаёт их по token bucket,
+поэтому всплеск нажатий "Створити в CRM" встаёт в очередь, а не падает
+с 429. Ёмкость bucket - KEYCRM_BURST, пополнение - (лимит - burst) за
+минуту: даже с начальным всплеском за любую минуту уходит не больше
+KEYCRM_RATE_LIMIT запросов (keyCRM считает лимит фиксированным окном).
+
+Фоновые запросы (синхронизация, внутри background_requests()) стоят в
+отдельной очереди и уходят, только когда интерактивная пуста: кнопка
+менеджера не ждёт за порцией фоновой синхронизации.
+
+У каждого запроса есть дедлайн: если до него запрос не успевает уйти
+(очередь слишком длинная), он завершается KeyCrmQueueTimeout, не тратя
+лимит - где бы в очереди он ни стоял. Уже отправленный запрос дедлайном
+не прерывается: его ограничивает таймаут HTTP. Ответ 429 ставит выдачу на
+паузу по Retry-After и возвращает запрос в голову очереди (не больше
+KEYCRM_MAX_RETRIES раз).
+
+Настройки (.env):
+    KEYCRM_RATE_LIMIT       запросов в минуту (по умолчанию 60)
+    KEYCRM_BURST            сколько запросов уходит сразу, без ожидания (по умолчанию 1)
+    KEYCRM_QUEUE_TIMEOUT    дедлайн запроса с учётом ожидания в очереди, секунды (по умолчанию 120)
+    KEYCRM_MAX_RETRIES      повторов после 429 (по умолчанию 3)
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+import aiohttp
+
+from app.services.tracing import current_span, start_span
+
+logger = logging.getLogger(__name__)
+
+# Пауза после 429 без заголовка Retry-After, секунды
+DEFAULT_RETRY_AFTER = 60.0
+
+
+class KeyCrmError(Exception):
+    """keyCRM ответил ошибкой"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"keyCRM HTTP {status}: {message}")
+        self.status = status
+
+
+class KeyCrmRateLimited(KeyCrmError):
+    """429 повторился больше KEYCRM_MAX_RETRIES раз"""
+    pass
+
+
+class KeyCrmQueueTimeout(Exception):
+    """Запрос не успел уйти в keyCRM до своего дедлайна"""
+    pass
+
+
+class TokenBucket:
+    """Token bucket: capacity токенов, пополнение rate токенов в секунду."""
+
+    def __init__(self, capacity: float, rate: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Через сколько секунд будет доступен токен (0 - уже)."""
+        now = self._clock()
+        self._refill(now)
+        wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        return max(wait, self._paused_until - now)
+
+    def take(self) -> None:
+        self._refill(self._clock())
+        self._tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены seconds секунд и обнулить запас (после 429)."""
+        now = self._clock()
+        self._refill(now)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, now + seconds)
+
+
+class _QueuedRequest:
+    __slots__ = ("method", "path", "params", "json", "deadline", "future", "attempts", "sending", "span",
+                 "background")
+
+    def __init__(self, method: str, path: str, params: Optional[dict], json: Optional[dict],
+                 deadline: float, future: asyncio.Future, background: bool = False):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.json = json
+        self.deadline = deadline
+        self.future = future
+        self.attempts = 0
+        self.sending = False  # выдан диспетчером, ждёт ответа keyCRM
+        # Спан вызывающего: отправка идёт из задачи диспетчера, родителя передаём явно
+        self.span = current_span()
+        self.background = background
+
+
+def _retry_after(response: aiohttp.ClientResponse) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+_background: contextvars.ContextVar[bool] = contextvars.ContextVar("keycrm_background", default=False)
+
+
+@contextlib.contextmanager
+def background_requests():
+    """Запросы внутри блока (и порождённых задач) - в фоновую очередь, после интерактивных."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class KeyCrmClient:
+    """Очередь запросов к keyCRM с token bucket и дедлайнами."""
+
+    def __init__(
+            self,
+            base_url: str,
+            api_key: str,
+            rate_per_minute: int = 60,
+            queue_timeout: float = 120.0,
+            max_retries: int = 3,
+            request_timeout: float = 30.0,
+            burst: int = 1,
+            window: float = 60.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        # window - длина окна лимита в секундах (меньше 60 - только для стендов и бенчмарков)
+        burst = max(1, min(burst, rate_per_minute - 1))
+        self.bucket = TokenBucket(capacity=burst, rate=(rate_per_minute - burst) / window)
+
+        self._queue: Deque[_QueuedRequest] = deque()
+        self._background_queue: Deque[_QueuedRequest] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls) -> "KeyCrmClient":
+        from app.services.keycrm_service import KEYCRM_API_KEY, KEYCRM_BASE_URL
+        return cls(
+            base_url=KEYCRM_BASE_URL,
+            api_key=KEYCRM_API_KEY,
+            rate_per_minute=int(os.getenv("KEYCRM_RATE_LIMIT", "60")),
+            queue_timeout=float(os.getenv("KEYCRM_QUEUE_TIMEOUT", "120")),
+            max_retries=int(os.getenv("KEYCRM_MAX_RETRIES", "3")),
+            burst=int(os.getenv("KEYCRM_BURST", "1")),
+        )
+
+    @property
+    def pending(self) -> int:
+        """Запросы, ждущие отправки (обе очереди)."""
+        return len(self._queue) + len(self._background_queue)
+
+    def _ensure_started(self) -> None:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                },
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def request(self, method: str, path: str, *, params: Optional[dict] = None,
+                      json: Optional[dict] = None, timeout: Optional[float] = None) -> Any:
+        """
+        Ставит запрос в очередь и ждёт ответа (JSON).
+        timeout - дедлайн с учётом ожидания в очереди (по умолчанию KEYCRM_QUEUE_TIMEOUT).
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        timeout = self.queue_timeout if timeout is None else timeout
+        # Спан от постановки в очередь до ответа: разница с keycrm.http - ожидание очереди
+        background = _background.get()
+        with start_span(f"keycrm {method} {path}", only_in_trace=True,
+                        **{"keycrm.queue_depth": self.pending, "keycrm.background": background}):
+            item = _QueuedRequest(method, path, params, json, loop.time() + timeout, loop.create_future(),
+                                  background)
+            (self._background_queue if background else self._queue).append(item)
+            self._wakeup.set()
+            try:
+                return await asyncio.wait_for(asyncio.shield(item.future), timeout)
+            except asyncio.TimeoutError:
+                if item.sending:
+                    return await item.future
+                # Диспетчер выбросит отменённый запрос, не тратя лимит
+                item.future.cancel()
+                raise KeyCrmQueueTimeout(f"keyCRM: запит {method} {path} не дочекався черги") from None
+            except asyncio.CancelledError:
+                item.future.cancel()
+                raise
+
+    async def get(self, path: str, **kwargs: Any) -> Any:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs: Any) -> Any:
+        return await self.request("POST", path, **kwargs)
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            queue = self._queue or self._background_queue
+            if not queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            item = queue[0]
+            if item.future.done():  # вызывающий отменил ожидание
+                queue.popleft()
+                continue
+
+            wait = self.bucket.delay()
+            if loop.time() + wait > item.deadline:
+                queue.popleft()
+                item.future.set_exception(KeyCrmQueueTimeout(
+                    f"keyCRM: запит {item.method} {item.path} не дочекався черги"
+                ))
+                continue
+            if wait > 0:
+                # Новый запрос (интерактивный или повтор после 429) разбудит раньше
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.bucket.take()
+            queue.popleft()
+            item.sending = True
+            task = loop.create_task(self._send(item))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, item: _QueuedRequest) -> None:
+        item.attempts += 1
+        try:
+            async with self._traced_request(item) as response:
+                if response.status == 429:
+                    retry_after = _retry_after(response)
+                    self.bucket.pause(retry_after)
+                    logger.warning(f"keyCRM 429 on {item.method} {item.path}, pause {retry_after:.0f}s")
+                    if item.attempts > self.max_retries:
+                        raise KeyCrmRateLimited(429, "rate limit exceeded")
+                    item.sending = False
+                    (self._background_queue if item.background else self._queue).appendleft(item)
+                    self._wakeup.set()
+                    return
+                if response.status >= 400:
+                    raise KeyCrmError(response.status, (await response.text())[:500])
+                result = await response.json(content_type=None)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(result)
+
+    @contextlib.asynccontextmanager
+    async def _traced_request(self, item: _QueuedRequest):
+        if item.span is None:
+            async with self._session.request(
+                    item.method, f"{self.base_url}{item.path}", params=item.params, json=item.json,
+            ) as response:
+                yield response
+            return
+        with start_span("keycrm.http", parent=item.span,
+                        **{"http.method": item.method, "http.target": item.path, "attempt": item.attempts}) as span:
+            async with self._session.request(
+                    item.method, f"{self.base_url}{item.path}", params=item.params, json=item.json,
+            ) as response:
+                if span is not None:
+                    span.set_attribute("http.status_code", response.status)
+                yield response
+
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for item in (*self._queue, *self._background_queue):
+            if not item.future.done():
+                item.future.set_exception(KeyCrmQueueTimeout("keyCRM client closed"))
+        self._queue.clear()
+        self._background_queue.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_client: Optional[KeyCrmClient] = None
+
+
+def get_keycrm_client() -> KeyCrmClient:
+    """Глобальный клиент, сконфигурированный из .env"""
+    global _client
+    if _client is None:
+        _client = KeyCrmClient.from_env()
+    return _client
+
+
+async def close_keycrm_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
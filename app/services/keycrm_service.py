@@ -4,16 +4,18 @@ import logging
 from datetime import datetime
 
 import pytz
-import requests
 from dotenv import load_dotenv
 
+from app.services.keycrm_client import get_keycrm_client
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 KEYCRM_API_KEY = os.getenv("KEYCRM_API_KEY", "")
 KEYCRM_SOURCE_ID = int(os.getenv("KEYCRM_SOURCE_ID", "2"))
-KEYCRM_BASE_URL = "https://openapi.keycrm.app/v1"
+# Override to point at a local stand-in (python -m tools.fake_keycrm)
+KEYCRM_BASE_URL = os.getenv("KEYCRM_BASE_URL", "https://openapi.keycrm.app/v1").rstrip("/")
 KEYCRM_APP_URL = "https://timosh-design.keycrm.app/app/orders/view"
 KEYCRM_BUYER_URL = "https://timosh-design.keycrm.app/app/clients"
 
@@ -23,50 +25,61 @@ KYIV_TZ = pytz.timezone("Europe/Kyiv")
 _PROP_PHONE = "номер телефону"
 _PROP_SECOND = "другий номер або коротенька фраза"
 
-_session = requests.Session()
-_session.headers.update({
-    "Authorization": f"Bearer {KEYCRM_API_KEY}",
-    "Content-Type": "application/json",
-    "Accept": "application/json",
-})
-
-
-def create_crm_buyer(order) -> dict:
-    """Create buyer in keyCRM. Returns {"id": int, "url": str}.
-    Designed to run in a thread via asyncio.run_in_executor."""
-    raw = order.raw_json or {}
 
+def _full_name(order) -> str:
     first_name = (order.customer_first_name or "").strip()
     last_name = (order.customer_last_name or "").strip()
-    full_name = f"{first_name} {last_name}".strip() or "Без імені"
+    return f"{first_name} {last_name}".strip() or "Без імені"
 
+
+def build_buyer_body(order) -> dict:
+    """Request body for POST /buyer."""
+    raw = order.raw_json or {}
     phone = order.customer_phone_e164 or None
     email = raw.get("email") or None
 
-    body = {"full_name": full_name}
+    body = {"full_name": _full_name(order)}
     if phone:
         body["phone"] = [phone]
     if email:
         body["email"] = [email]
+    return body
+
+
+def order_source_uuid(order) -> str:
+    """Order key in keyCRM (source_uuid) - used to detect already pushed orders."""
+    return str(order.order_number or order.id)
+
+
+def build_order_body(order) -> dict:
+    """Request body for POST /order."""
+    raw = order.raw_json or {}
+    return {
+        "source_id": KEYCRM_SOURCE_ID,
+        "source_uuid": order_source_uuid(order),
+        "buyer": {
+            "full_name": _full_name(order),
+            "phone": order.customer_phone_e164 or None,
+            "email": raw.get("email") or None,
+        },
+        "manager_comment": _format_manager_comment(raw, order.comment),
+    }
 
-    response = _session.post(f"{KEYCRM_BASE_URL}/buyer", json=body, timeout=30)
-    response.raise_for_status()
 
-    buyer_id = response.json()["id"]
+async def create_crm_buyer(order) -> dict:
+    """Create buyer in keyCRM. Returns {"id": int, "url": str}.
+    Goes through the rate-limited request queue (see keycrm_client)."""
+    data = await get_keycrm_client().post("/buyer", json=build_buyer_body(order))
+    buyer_id = data["id"]
     return {"id": buyer_id, "url": f"{KEYCRM_BUYER_URL}/{buyer_id}"}
 
 
-def find_buyer_by_phone(phone: str) -> dict | None:
-    """Search buyer in keyCRM by phone. Returns {"id": int, "url": str} or None.
-    Designed to run in a thread via asyncio.run_in_executor."""
-    response = _session.get(
-        f"{KEYCRM_BASE_URL}/buyer",
-        params={"filter[buyer_phone]": phone, "limit": 1},
-        timeout=30,
+async def find_buyer_by_phone(phone: str) -> dict | None:
+    """Search buyer in keyCRM by phone. Returns {"id": int, "url": str} or None."""
+    response = await get_keycrm_client().get(
+        "/buyer", params={"filter[buyer_phone]": phone, "limit": 1},
     )
-    response.raise_for_status()
-
-    data = response.json().get("data") or []
+    data = response.get("data") or []
     if not data:
         return None
 
@@ -74,31 +87,28 @@ def find_buyer_by_phone(phone: str) -> dict | None:
     return {"id": buyer_id, "url": f"{KEYCRM_BUYER_URL}/{buyer_id}"}
 
 
-def create_crm_order(order) -> dict:
-    """Create order in keyCRM. Returns {"id": int, "url": str}.
-    Designed to run in a thread via asyncio.run_in_executor."""
-    raw = order.raw_json or {}
-
-    first_name = (order.customer_first_name or "").strip()
-    last_name = (order.customer_last_name or "").strip()
-    full_name = f"{first_name} {last_name}".strip() or "Без імені"
-    email = raw.get("email") or None
-
-    body = {
-        "source_id": KEYCRM_SOURCE_ID,
-        "source_uuid": str(order.order_number or order.id),
-        "buyer": {
-            "full_name": full_name,
-            "phone": order.customer_phone_e164 or None,
-            "email": email,
+async def find_crm_order_by_source_uuid(source_uuid: str) -> dict | None:
+    """Search order from our source in keyCRM by source_uuid. Returns {"id": int, "url": str} or None."""
+    response = await get_keycrm_client().get(
+        "/order",
+        params={
+            "filter[source_uuid]": source_uuid,
+            "filter[source_id]": KEYCRM_SOURCE_ID,
+            "limit": 1,
         },
-        "manager_comment": _format_manager_comment(raw, order.comment),
-    }
+    )
+    data = response.get("data") or []
+    if not data:
+        return None
+
+    crm_id = data[0]["id"]
+    return {"id": crm_id, "url": f"{KEYCRM_APP_URL}/{crm_id}"}
 
-    response = _session.post(f"{KEYCRM_BASE_URL}/order", json=body, timeout=30)
-    response.raise_for_status()
 
-    crm_id = response.json()["id"]
+async def create_crm_order(order) -> dict:
+    """Create order in keyCRM. Returns {"id": int, "url": str}."""
+    data = await get_keycrm_client().post("/order", json=build_order_body(order))
+    crm_id = data["id"]
     return {"id": crm_id, "url": f"{KEYCRM_APP_URL}/{crm_id}"}
 
 
@@ -0,0 +1,205 @@
+# app/services/log_pipeline.py
+"""
+Логирование без блокировок на горячем пути.
+
+Корневой логгер пишет в очередь (QueueHandler), форматирование и запись в
+stderr - в фоновом потоке (QueueListener). На вызывающей стороне остаются
+проверка уровня, фильтр сэмплирования и put_nowait; при переполнении очереди
+запись отбрасывается и считается в log_records_dropped_total.
+
+Настройки (env, меняются и на лету через POST /debug/logging):
+    LOG_LEVEL=INFO                              корневой уровень
+    LOG_LEVELS=app.bot.debug=DEBUG,app.services.keycrm_client=WARNING
+    LOG_FORMAT=text|json                        json - объект на строку (event-поля log_event - на верхнем уровне)
+    LOG_SAMPLE=webhook_duplicate=0.1,app.bot.debug=0.05
+                                                доля записей по типу события (log_event) или имени логгера;
+                                                WARNING и выше не сэмплируются
+    LOG_QUEUE_SIZE=10000
+
+JSON кодируется orjson, если он установлен, иначе json с заранее собранным
+энкодером - в любом случае не в потоке запроса.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from app.services.metrics import LOG_RECORDS_DROPPED
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass  # например, int больше 64 бит
+    return _encoder.encode(obj)
+
+
+class EventMessage:
+    """
+    Сообщение log_event: словарь кодируется в JSON только при форматировании
+    (в потоке записи), а JSON-формат кладёт поля на верхний уровень.
+    """
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+
+    def __str__(self) -> str:
+        return dumps(self.payload)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, EventMessage):
+            entry.update(record.msg.payload)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей своего типа: record.event (log_event) или имя логгера."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rates: Dict[str, float] = dict(rates or {})
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None) or record.name)
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Очередь в том же процессе - запись не сериализуется. Форматируются
+        # только %-аргументы: к моменту записи они могут измениться.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    pairs = {}
+    for item in value.split(","):
+        key, sep, val = item.partition("=")
+        if sep and key.strip() and val.strip():
+            pairs[key.strip()] = val.strip()
+    return pairs
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_sampler = SamplingFilter()
+_setup_lock = threading.Lock()
+
+
+def setup_logging() -> None:
+    """Ставит очередь на корневой логгер; повторный вызов ничего не делает."""
+    global _handler, _listener
+    with _setup_lock:
+        if _handler is not None:
+            return
+        stream = logging.StreamHandler(sys.stderr)
+        if os.getenv("LOG_FORMAT", "text").strip().lower() == "json":
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        try:
+            size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        except ValueError:
+            size = 10000
+        records: queue.Queue = queue.Queue(maxsize=size)
+        _handler = NonBlockingQueueHandler(records)
+        _handler.addFilter(_sampler)
+        _listener = QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # дописать очередь при выходе
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        # Опечатка в env не должна ронять импорт приложения: предупреждение и INFO
+        level = os.getenv("LOG_LEVEL", "INFO").strip() or "INFO"
+        try:
+            set_level("root", level)
+        except ValueError:
+            root.setLevel(logging.INFO)
+            logger.warning(f"Invalid LOG_LEVEL {level}, using INFO")
+        for name, level in _parse_pairs(os.getenv("LOG_LEVELS", "")).items():
+            try:
+                set_level(name, level)
+            except ValueError:
+                logger.warning(f"Invalid LOG_LEVELS level for {name}: {level}, using INFO")
+                set_level(name, "INFO")
+        for key, rate in _parse_pairs(os.getenv("LOG_SAMPLE", "")).items():
+            try:
+                set_sample_rate(key, float(rate))
+            except ValueError:
+                logger.warning(f"Invalid LOG_SAMPLE rate for {key}: {rate}")
+
+
+def set_level(name: str, level: str) -> None:
+    """name "" или "root" - корневой логгер; ValueError на неизвестный уровень."""
+    logger = logging.getLogger(None if name in ("", "root") else name)
+    logger.setLevel(level.strip().upper())
+
+
+def set_sample_rate(key: str, rate: Optional[float]) -> None:
+    """rate None или >= 1 - без сэмплирования."""
+    if rate is None or rate >= 1:
+        _sampler.rates.pop(key, None)
+        return
+    if rate < 0:
+        raise ValueError("rate must be >= 0")
+    _sampler.rates[key] = rate
+
+
+def logging_state() -> dict:
+    manager = logging.Logger.manager
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return {
+        "levels": levels,
+        "sample": dict(_sampler.rates),
+        "queue": _handler.queue.qsize() if _handler is not None else None,
+        "encoder": "orjson" if orjson is not None else "json",
+    }
@@ -0,0 +1,152 @@
+# app/services/loop_watchdog.py
+"""
+Сторож event loop: webhook FastAPI, polling aiogram и задачи APScheduler
+крутятся в одном цикле, и любой синхронный вызов в корутине (запрос к БД через
+get_session(), requests в shopify_service) останавливает их все.
+
+Две части:
+  - тикер в цикле: спит interval и меряет, насколько позже проснулся - это лаг
+    (EVENT_LOOP_LAG_SECONDS в /metrics);
+  - поток-наблюдатель: если тикер не просыпался дольше threshold, снимает стек
+    потока цикла (sys._current_frames) - видно, какая задача и какой синхронный
+    вызов держат цикл прямо сейчас - и пишет его в лог (один раз на остановку).
+
+Настройки: LOOP_WATCHDOG=0 - выключить; LOOP_WATCHDOG_THRESHOLD_MS (250),
+LOOP_WATCHDOG_INTERVAL_MS (100).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import NamedTuple, Optional
+
+from app.services.metrics import EVENT_LOOP_LAG_SECONDS, EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+STACK_LIMIT = 25  # кадров снизу стека: дальше - только asyncio/uvicorn
+
+
+class LoopStall(NamedTuple):
+    blocked: float  # секунд без тика на момент снимка
+    task: str
+    stack: str
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls = 0
+        self.last_stall: Optional[LoopStall] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional["LoopWatchdog"]:
+        if os.getenv("LOOP_WATCHDOG", "1").strip().lower() in ("0", "false", "no", "off"):
+            return None
+        try:
+            threshold = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "250")) / 1000
+            interval = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "100")) / 1000
+        except ValueError:
+            logger.warning("Invalid LOOP_WATCHDOG_* settings, using defaults")
+            threshold, interval = 0.25, 0.1
+        return cls(threshold=threshold, interval=interval)
+
+    def start(self) -> None:
+        """Вызывается из работающего цикла, который нужно сторожить."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._tick(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started: threshold={self.threshold * 1000:.0f}ms")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if self._reported_beat == self._heartbeat:
+                logger.warning(f"Event loop unblocked after {lag * 1000:.0f}ms")
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        period = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(period):
+            beat = self._heartbeat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or self._reported_beat == beat:
+                continue
+            stall = self._snapshot(blocked)
+            if stall is None:
+                continue
+            # Тикер мог проснуться, пока снимали стек - тогда это уже не остановка
+            if self._heartbeat != beat:
+                continue
+            self._reported_beat = beat
+            self.stalls += 1
+            self.last_stall = stall
+            EVENT_LOOP_STALLS.inc()
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f}ms+ in task {stall.task}, "
+                           f"stack:\n{stall.stack}")
+
+    def _snapshot(self, blocked: float) -> Optional[LoopStall]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT)).rstrip()
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        return LoopStall(blocked, task.get_name() if task is not None else "-", stack)
+
+
+_watchdog: Optional[LoopWatchdog] = None
+
+
+async def start_loop_watchdog() -> Optional[LoopWatchdog]:
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = LoopWatchdog.from_env()
+        if _watchdog is not None:
+            _watchdog.start()
+    return _watchdog
+
+
+async def stop_loop_watchdog() -> None:
+    global _watchdog
+    if _watchdog is not None:
+        await _watchdog.stop()
+        _watchdog = None
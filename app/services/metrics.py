@@ -0,0 +1,390 @@
+# app/services/metrics.py
+"""
+Метрики в текстовом формате Prometheus (GET /metrics) без внешних зависимостей.
+
+Горячий путь - observe()/inc(): поиск бакета bisect'ом и пара сложений под
+блокировкой дочерней метрики, без аллокаций. Дочерние метрики по набору
+меток кешируются; значения, которые дорого или не нужно считать на каждом
+событии (пул БД, глубина очередей), снимаются коллекторами в момент scrape.
+
+    WEBHOOK_STAGE_SECONDS.labels("hmac").observe(0.0004)
+    with SCHEDULER_JOB_SECONDS.labels("crm_sync").time():
+        ...
+
+Почему не prometheus_client: нужен только текстовый формат для одного
+процесса (Counter/Gauge/Histogram с метками и коллекторы на scrape) - это
+сотня строк, ради которых не стоит добавлять зависимость. Метрики пишет
+только основной процесс, multiprocess-режим не нужен. Методы те же, что в
+prometheus_client (labels/inc/set/observe/time): переход - замена импорта.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Секунды: от долей миллисекунды (HMAC) до десятков секунд (загрузка PDF)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Защита от взрыва кардинальности: лишние наборы меток сливаются в "other"
+MAX_LABEL_SETS = 200
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # последний - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+        with self._lock:
+            if key not in self._children and len(self._children) >= MAX_LABEL_SETS:
+                key = ("other",) * len(self.labelnames)
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def _render_child(self, values, child) -> List[str]:
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            cumulative += n
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        label_str = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """collector() вызывается перед каждым scrape и выставляет gauge'и."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# --- Метрики приложения ---
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("route", "method", "status"),
+)
+WEBHOOK_STAGE_SECONDS = histogram(
+    "webhook_stage_duration_seconds", "Shopify order webhook latency by processing stage", ("stage",),
+)
+DOCUMENT_RENDER_SECONDS = histogram(
+    "document_render_duration_seconds", "Order document (PDF/VCF) render time", ("doc_type",),
+)
+DOCUMENT_UPLOAD_SECONDS = histogram(
+    "document_upload_duration_seconds", "Order document send to Telegram (by file_id or upload)",
+    ("doc_type", "mode"),
+)
+CALLBACK_HANDLER_SECONDS = histogram(
+    "telegram_callback_duration_seconds", "Callback query handler latency by handler", ("handler", "result"),
+)
+SCHEDULER_JOB_SECONDS = histogram(
+    "scheduler_job_duration_seconds", "Scheduled job run time", ("job", "result"),
+    buckets=DEFAULT_BUCKETS + (60.0, 300.0),
+)
+DB_POOL_CONNECTIONS = gauge(
+    "db_pool_connections", "SQLAlchemy pool connections by state", ("state",),
+)
+OUTBOUND_QUEUE_DEPTH = gauge(
+    "outbound_queue_depth", "Pending work in outbound queues", ("queue",),
+)
+DB_QUERIES_PER_SCOPE = histogram(
+    "db_queries_per_scope", "SQL statements per HTTP request / Telegram update / scheduler run", ("scope",),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 100, 200, 500),
+)
+DB_TIME_PER_SCOPE_SECONDS = histogram(
+    "db_time_per_scope_seconds", "Total SQL time per HTTP request / Telegram update / scheduler run", ("scope",),
+)
+LOG_RECORDS_DROPPED = counter(
+    "log_records_dropped_total", "Log records dropped because the logging queue was full",
+)
+EVENT_LOOP_LAG_SECONDS = histogram(
+    "event_loop_lag_seconds", "Event loop wake-up delay (time the loop was blocked by sync code)",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+EVENT_LOOP_STALLS = counter(
+    "event_loop_stalls_total", "Event loop blocked longer than LOOP_WATCHDOG_THRESHOLD_MS",
+)
+
+
+def _collect_db_pool() -> None:
+    from app.db import engine
+
+    pool = engine.pool
+    # QueuePool; у других пулов (sqlite в тестах) части методов нет
+    for state, attr in (("size", "size"), ("checked_out", "checkedout"), ("idle", "checkedin"),
+                        ("overflow", "overflow")):
+        method = getattr(pool, attr, None)
+        if method is not None:
+            DB_POOL_CONNECTIONS.labels(state).set(method())
+
+
+def _collect_queues() -> None:
+    from app.services import document_service, keycrm_client, pdf_renderer
+
+    renderer = pdf_renderer._renderer
+    OUTBOUND_QUEUE_DEPTH.labels("pdf_render").set(renderer.pending if renderer else 0)
+    client = keycrm_client._client
+    OUTBOUND_QUEUE_DEPTH.labels("keycrm").set(client.pending if client else 0)
+    OUTBOUND_QUEUE_DEPTH.labels("document_prerender").set(len(document_service._prerender_tasks))
+
+
+REGISTRY.add_collector(_collect_db_pool)
+REGISTRY.add_collector(_collect_queues)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def job_timer(job: str, func: Callable) -> Callable:
+    """
+    Обёртка задачи планировщика: длительность и результат (ok/error) в SCHEDULER_JOB_SECONDS,
+    задача - корневой спан трассы (её запросы к БД и keyCRM - дочерние) и область подсчёта SQL.
+    """
+    from app.services.query_stats import query_scope
+    from app.services.tracing import start_span
+
+    async def timed_job(*args, **kwargs):
+        started = time.perf_counter()
+        result = "error"
+        try:
+            with start_span(f"job {job}"), query_scope(f"job {job}"):
+                value = await func(*args, **kwargs)
+            result = "ok"
+            return value
+        finally:
+            SCHEDULER_JOB_SECONDS.labels(job, result).observe(time.perf_counter() - started)
+
+    timed_job.__name__ = getattr(func, "__name__", job)
+    return timed_job
+
+
+class HttpMetricsMiddleware:
+    """ASGI middleware: латентность по шаблону маршрута (scope["route"] после роутинга)."""
+
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(template, scope.get("method", ""), status["code"]).observe(
+                time.perf_counter() - started
+            )
+
@@ -0,0 +1,232 @@
+# app/services/pdf_layout.py
+"""
+Декларативные шаблоны PDF заказа и скомпилированный план разметки.
+
+Шаблон - JSON в app/assets/templates/<name>.json. default.json задаёт все
+параметры; шаблон магазина содержит только то, что отличается, и
+накладывается поверх default. Размеры в шаблоне - в миллиметрах,
+колонки таблицы - смещения от левого поля.
+
+Шаблон компилируется один раз (на процесс и набор шрифтов) в LayoutPlan:
+все координаты уже в пунктах, подписи отформатированы, ширины
+статических подписей шапки таблицы посчитаны заранее.
+
+Выбор шаблона:
+    PDF_TEMPLATE            имя шаблона; если не задано - <SHOPIFY_STORE_DOMAIN>.json,
+                            если такого файла нет - default
+"""
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).resolve().parents[1] / "assets" / "templates"
+DEFAULT_TEMPLATE = "default"
+
+
+class LayoutPlan(NamedTuple):
+    """Скомпилированный шаблон: всё, что не зависит от конкретного заказа."""
+    name: str
+    title_font: str
+    text_font: str
+
+    # страница
+    x0: float
+    right: float
+    top: float
+    min_y: float
+
+    # заголовок и бренд
+    title_text: str
+    title_size: float
+    brand_enabled: bool
+    brand_y_top: float
+    brand_max_w_mm: float
+    brand_max_h_mm: float
+
+    # шапка
+    header_y: float
+    header_size: float
+    header_step: float
+    date_label: str
+    shipping_label: str
+
+    # адрес
+    address_label: str
+    address_size: float
+    address_step: float
+    address_width: float
+    customer_label: str
+    customer_gap: float
+    customer_size: float
+    address_gap_after: float
+
+    # таблица товаров
+    items_heading: str
+    items_heading_size: float
+    items_heading_step: float
+    table_header_size: float
+    table_header_cells: Tuple[Tuple[float, str], ...]  # (x, текст) - правое выравнивание уже учтено
+    col_name_x: float
+    col_qty_x: float
+    col_price_x: float
+    col_sum_x: float
+    rule_gap: float
+    after_rule: float
+    row_size: float
+    row_step: float
+    name_width: float
+    row_gap: float
+    detail_x: float
+    detail_width: float
+    detail_size: float
+    detail_step: float
+    detail_gap: float
+    variant_label: str
+
+    # итог
+    total_label: str
+    total_size: float
+
+
+def _deep_merge(base: dict, override: dict) -> dict:
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _read_template(name: str) -> dict:
+    with open(TEMPLATES_DIR / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_template(name: str = DEFAULT_TEMPLATE) -> dict:
+    """Шаблон name поверх default. Неизвестное имя - default с предупреждением."""
+    template = _read_template(DEFAULT_TEMPLATE)
+    if name != DEFAULT_TEMPLATE:
+        try:
+            template = _deep_merge(template, _read_template(name))
+        except FileNotFoundError:
+            logger.warning(f"PDF template '{name}' not found, using default")
+    return template
+
+
+def get_template_name() -> str:
+    """Имя шаблона для текущего магазина."""
+    name = os.getenv("PDF_TEMPLATE", "").strip()
+    if name:
+        return name
+    store = os.getenv("SHOPIFY_STORE_DOMAIN", "").strip()
+    if store and (TEMPLATES_DIR / f"{store}.json").exists():
+        return store
+    return DEFAULT_TEMPLATE
+
+
+def compile_template(template: dict, has_fonts: bool, name: str = DEFAULT_TEMPLATE) -> LayoutPlan:
+    """Переводит шаблон в план разметки (пункты, готовые подписи и ширины)."""
+    from app.services.pdf_service import FNT_BOLD, FNT_REGULAR
+
+    title_font = FNT_BOLD if has_fonts else "Helvetica-Bold"
+    text_font = FNT_REGULAR if has_fonts else "Helvetica"
+
+    width, height = A4
+    page = template["page"]
+    title = template["title"]
+    brand = template["brand"]
+    header = template["header"]
+    address = template["address"]
+    items = template["items"]
+    columns = items["columns"]
+    total = template["total"]
+
+    top = height - page["margin_top_mm"] * mm
+    x0 = page["margin_x_mm"] * mm
+    right = width - x0
+
+    col_name_x = x0 + columns["name"]["x_mm"] * mm
+    col_qty_x = x0 + columns["qty"]["x_mm"] * mm
+    col_price_x = x0 + columns["price"]["x_mm"] * mm
+    col_sum_x = x0 + columns["sum"]["x_mm"] * mm
+
+    # Статическая шапка таблицы: правое выравнивание считаем один раз
+    header_size = items["header_size"]
+    cells = [(col_name_x, columns["name"]["label"])]
+    for key, x in (("qty", col_qty_x), ("price", col_price_x), ("sum", col_sum_x)):
+        label = columns[key]["label"]
+        cells.append((x - pdfmetrics.stringWidth(label, title_font, header_size), label))
+
+    detail_x = col_name_x + items["detail_indent_mm"] * mm
+
+    return LayoutPlan(
+        name=name,
+        title_font=title_font,
+        text_font=text_font,
+        x0=x0,
+        right=right,
+        top=top,
+        min_y=page["min_y_mm"] * mm,
+        title_text=title["text"],
+        title_size=title["size"],
+        brand_enabled=bool(brand["enabled"]),
+        brand_y_top=top + brand["top_offset_mm"] * mm,
+        brand_max_w_mm=brand["max_w_mm"],
+        brand_max_h_mm=brand["max_h_mm"],
+        header_y=top - header["gap_after_title_mm"] * mm,
+        header_size=header["size"],
+        header_step=header["line_step_mm"] * mm,
+        date_label=header["date_label"],
+        shipping_label=header["shipping_label"],
+        address_label=address["label"],
+        address_size=address["size"],
+        address_step=address["line_step_mm"] * mm,
+        address_width=right - x0,
+        customer_label=address["customer_label"],
+        customer_gap=address["customer_gap_mm"] * mm,
+        customer_size=address["customer_size"],
+        address_gap_after=address["gap_after_mm"] * mm,
+        items_heading=items["heading"],
+        items_heading_size=items["heading_size"],
+        items_heading_step=items["heading_step_mm"] * mm,
+        table_header_size=header_size,
+        table_header_cells=tuple(cells),
+        col_name_x=col_name_x,
+        col_qty_x=col_qty_x,
+        col_price_x=col_price_x,
+        col_sum_x=col_sum_x,
+        rule_gap=items["rule_gap_mm"] * mm,
+        after_rule=items["after_rule_mm"] * mm,
+        row_size=items["row_size"],
+        row_step=items["row_step_mm"] * mm,
+        name_width=(col_qty_x - items["name_padding_mm"] * mm) - col_name_x,
+        row_gap=items["row_gap_mm"] * mm,
+        detail_x=detail_x,
+        detail_width=right - detail_x,
+        detail_size=items["detail_size"],
+        detail_step=items["detail_step_mm"] * mm,
+        detail_gap=items["detail_gap_mm"] * mm,
+        variant_label=items["variant_label"],
+        total_label=total["label"],
+        total_size=total["size"],
+    )
+
+
+@lru_cache(maxsize=16)
+def get_layout_plan(has_fonts: bool, name: Optional[str] = None) -> LayoutPlan:
+    """План для шаблона name (по умолчанию - шаблон магазина), компилируется один раз."""
+    name = name or get_template_name()
+    return compile_template(load_template(name), has_fonts, name)
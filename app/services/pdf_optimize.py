@@ -0,0 +1,196 @@
+# app/services/pdf_optimize.py
+"""
+Режим уменьшения размера PDF (PDF_OPTIMIZE_SIZE=1).
+
+ReportLab уже встраивает только использованные глифы (subset), но копирует
+в subset TrueType-хинтинг: инструкции в каждом глифе и таблицы cvt/fpgm/prep.
+Для PDF, который смотрят в вьюерах и печатают, хинтинг не нужен - в режиме
+оптимизации он вырезается, что уменьшает шрифты примерно вдвое.
+
+Бренд-картинка один раз при загрузке уменьшается до печатного DPI
+под её рамку в шаблоне, кладётся на белый фон (маска прозрачности
+не нужна) и встраивается как JPEG. ASCII85-обёртка потоков отключается.
+
+Настройки (.env):
+    PDF_OPTIMIZE_SIZE        1 - включить режим (по умолчанию 0)
+    PDF_BRAND_DPI            DPI бренд-картинки (по умолчанию 150)
+    PDF_BRAND_JPEG_QUALITY   качество JPEG (по умолчанию 75)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import struct
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Tuple
+
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace, TTFontMaker
+
+logger = logging.getLogger(__name__)
+
+_HINTING_TABLES = (b"cvt ", b"fpgm", b"prep")
+
+# Флаги составных глифов (спецификация glyf)
+_ARG_1_AND_2_ARE_WORDS = 0x0001
+_WE_HAVE_A_SCALE = 0x0008
+_MORE_COMPONENTS = 0x0020
+_WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+_WE_HAVE_A_TWO_BY_TWO = 0x0080
+_WE_HAVE_INSTRUCTIONS = 0x0100
+
+
+def is_size_optimized() -> bool:
+    return os.getenv("PDF_OPTIMIZE_SIZE", "0").strip().lower() in ("1", "true", "yes")
+
+
+def get_brand_dpi() -> int:
+    return int(os.getenv("PDF_BRAND_DPI", "150"))
+
+
+def get_brand_jpeg_quality() -> int:
+    return int(os.getenv("PDF_BRAND_JPEG_QUALITY", "75"))
+
+
+# ---------- шрифты ----------
+def _read_tables(data: bytes) -> Dict[bytes, bytes]:
+    num_tables = struct.unpack(">H", data[4:6])[0]
+    tables = {}
+    for i in range(num_tables):
+        tag, _, offset, length = struct.unpack(">4sLLL", data[12 + 16 * i:28 + 16 * i])
+        tables[tag] = data[offset:offset + length]
+    return tables
+
+
+def _strip_glyph(glyph: bytes) -> bytes:
+    """Глиф без инструкций хинтинга."""
+    if len(glyph) < 10:
+        return glyph  # пустой глиф
+
+    num_contours = struct.unpack(">h", glyph[:2])[0]
+    if num_contours >= 0:
+        # простой глиф: header(10) + endPtsOfContours + instructionLength + instructions + ...
+        pos = 10 + 2 * num_contours
+        ins_len = struct.unpack(">H", glyph[pos:pos + 2])[0]
+        return glyph[:pos] + b"\x00\x00" + glyph[pos + 2 + ins_len:]
+
+    # составной глиф: инструкции идут после последнего компонента
+    pos = 10
+    while True:
+        flags_pos = pos
+        flags = struct.unpack(">H", glyph[pos:pos + 2])[0]
+        pos += 4 + (4 if flags & _ARG_1_AND_2_ARE_WORDS else 2)
+        if flags & _WE_HAVE_A_SCALE:
+            pos += 2
+        elif flags & _WE_HAVE_AN_X_AND_Y_SCALE:
+            pos += 4
+        elif flags & _WE_HAVE_A_TWO_BY_TWO:
+            pos += 8
+        if not flags & _MORE_COMPONENTS:
+            break
+    if not flags & _WE_HAVE_INSTRUCTIONS:
+        return glyph
+    flags &= ~_WE_HAVE_INSTRUCTIONS
+    return glyph[:flags_pos] + struct.pack(">H", flags) + glyph[flags_pos + 2:pos]
+
+
+def strip_truetype_hinting(data: bytes) -> bytes:
+    """TrueType-шрифт без хинтинга: инструкции глифов и таблицы cvt/fpgm/prep удаляются."""
+    tables = _read_tables(data)
+    head = tables[b"head"]
+    loca = tables[b"loca"]
+    if struct.unpack(">h", head[50:52])[0]:
+        offsets = struct.unpack(f">{len(loca) // 4}L", loca)
+    else:
+        offsets = [o * 2 for o in struct.unpack(f">{len(loca) // 2}H", loca)]
+
+    glyf = tables[b"glyf"]
+    glyphs = []
+    new_offsets = [0]
+    for start, end in zip(offsets, offsets[1:]):
+        glyph = _strip_glyph(glyf[start:end])
+        glyph += b"\x00" * (-len(glyph) % 4)
+        glyphs.append(glyph)
+        new_offsets.append(new_offsets[-1] + len(glyph))
+
+    output = TTFontMaker()
+    for tag, table in tables.items():
+        if tag in _HINTING_TABLES:
+            continue
+        if tag == b"glyf":
+            table = b"".join(glyphs)
+        elif tag == b"loca":
+            table = struct.pack(f">{len(new_offsets)}L", *new_offsets)
+        elif tag == b"head":
+            # checkSumAdjustment пересчитает TTFontMaker, loca - длинный формат
+            table = head[:8] + b"\x00\x00\x00\x00" + head[12:50] + struct.pack(">h", 1) + head[52:]
+        output.add(tag.decode("latin-1"), table)
+    return output.makeStream()
+
+
+class _CompactTTFontFace(TTFontFace):
+    """Face, отдающий subset без хинтинга; готовые subset'ы кэшируются."""
+
+    _SUBSET_CACHE_MAX = 256
+
+    def makeSubset(self, subset):
+        cache = self.__dict__.setdefault("_compact_subsets", {})
+        key = tuple(subset)
+        data = cache.get(key)
+        if data is None:
+            if len(cache) >= self._SUBSET_CACHE_MAX:
+                cache.clear()
+            data = cache[key] = strip_truetype_hinting(super().makeSubset(subset))
+        return data
+
+
+def compact_ttfont(name: str, path: str) -> TTFont:
+    """TTFont, который встраивается в PDF без хинтинга."""
+    font = TTFont(name, path)
+    font.face.__class__ = _CompactTTFontFace
+    return font
+
+
+# ---------- бренд ----------
+def _to_jpeg(image, quality: int) -> BytesIO:
+    """RGBA/RGB-картинка на белом фоне в JPEG."""
+    from PIL import Image
+
+    image = image.convert("RGBA")
+    flat = Image.new("RGB", image.size, (255, 255, 255))
+    flat.paste(image, mask=image.getchannel("A"))
+    out = BytesIO()
+    flat.save(out, "JPEG", quality=quality, optimize=True)
+    out.seek(0)
+    return out
+
+
+def encode_brand_jpeg(path: Path, quality: int = 90) -> BytesIO:
+    """
+    Бренд-картинка в исходном размере, на белом фоне, в JPEG. JPEG ReportLab
+    встраивает как есть (DCTDecode), без распаковки пикселей и zlib на каждый документ.
+    """
+    from PIL import Image
+
+    with Image.open(path) as src:
+        src.load()
+        return _to_jpeg(src, quality)
+
+
+def downsample_brand(path: Path, max_w_mm: float, max_h_mm: float) -> Tuple[BytesIO, str]:
+    """
+    Бренд-картинка под рамку max_w_mm x max_h_mm при PDF_BRAND_DPI, на белом фоне, в JPEG.
+    Возвращает (jpeg, описание для лога).
+    """
+    from PIL import Image
+
+    dpi = get_brand_dpi()
+    with Image.open(path) as src:
+        src.load()
+        scale = min(max_w_mm / 25.4 * dpi / src.width, max_h_mm / 25.4 * dpi / src.height, 1.0)
+        size = (max(1, round(src.width * scale)), max(1, round(src.height * scale)))
+        image = src.convert("RGBA").resize(size, Image.LANCZOS)
+        original = f"{src.width}x{src.height} {src.format} {path.stat().st_size // 1024} KB"
+
+    out = _to_jpeg(image, get_brand_jpeg_quality())
+    return out, f"{original} -> {size[0]}x{size[1]} JPEG {len(out.getvalue()) // 1024} KB @ {dpi} DPI"
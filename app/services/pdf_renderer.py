@@ -0,0 +1,203 @@
+# app/services/pdf_renderer.py
+"""
+Сервис рендера PDF с выбираемым бэкендом.
+
+ReportLab - чистый Python, поэтому рендер в потоках конкурирует за GIL
+с event loop бота. Бэкенд "process" выносит рендер в ProcessPoolExecutor
+с прогретыми воркерами (шрифты зарегистрированы заранее), что даёт
+масштабирование по ядрам при одновременных запросах нескольких менеджеров.
+
+Настройки (.env):
+    PDF_RENDER_BACKEND      thread | process (по умолчанию thread)
+    PDF_RENDER_WORKERS      число воркеров (по умолчанию - число ядер)
+    PDF_RENDER_MAX_PENDING  максимум рендеров в очереди и в работе (по умолчанию 32)
+    PDF_RENDER_TIMEOUT      таймаут одного рендера, секунды (по умолчанию 30)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from app.services.pdf_service import build_order_pdf
+from app.services.tracing import run_in_executor, start_span
+
+logger = logging.getLogger(__name__)
+
+BACKEND_THREAD = "thread"
+BACKEND_PROCESS = "process"
+
+
+class PdfRenderQueueFull(Exception):
+    """Очередь рендера переполнена - запрос отклонён без ожидания"""
+    pass
+
+
+class PdfRenderTimeout(Exception):
+    """Рендер не уложился в PDF_RENDER_TIMEOUT"""
+    pass
+
+
+def _init_worker() -> None:
+    """Инициализация воркера: шрифты и бренд-картинка загружаются один раз до первого рендера."""
+    from app.services.pdf_service import warmup_assets
+    warmup_assets()
+
+
+def _warm() -> int:
+    """Пустая задача, чтобы пул поднял процессы заранее."""
+    return os.getpid()
+
+
+class PdfRenderer:
+    """Ограниченная по глубине очередь рендера поверх thread/process пула."""
+
+    def __init__(
+            self,
+            backend: str = BACKEND_THREAD,
+            workers: Optional[int] = None,
+            max_pending: int = 32,
+            timeout: float = 30.0,
+    ):
+        if backend not in (BACKEND_THREAD, BACKEND_PROCESS):
+            raise ValueError(f"Unknown PDF render backend: {backend}")
+
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    @classmethod
+    def from_env(cls) -> "PdfRenderer":
+        workers = os.getenv("PDF_RENDER_WORKERS", "").strip()
+        return cls(
+            backend=os.getenv("PDF_RENDER_BACKEND", BACKEND_THREAD).strip().lower() or BACKEND_THREAD,
+            workers=int(workers) if workers else None,
+            max_pending=int(os.getenv("PDF_RENDER_MAX_PENDING", "32")),
+            timeout=float(os.getenv("PDF_RENDER_TIMEOUT", "30")),
+        )
+
+    @property
+    def pending(self) -> int:
+        """Текущая глубина очереди (ожидающие + выполняющиеся рендеры)."""
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.backend == BACKEND_PROCESS:
+                # spawn: не форкаем процесс с работающим event loop и потоками
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="pdf-render",
+                    initializer=_init_worker,
+                )
+            logger.info(f"PDF renderer started: backend={self.backend}, workers={self.workers}")
+        return self._executor
+
+    async def start(self) -> None:
+        """Поднимает пул и прогревает всех воркеров (вызывается из lifespan)."""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _warm) for _ in range(self.workers)))
+
+    async def submit(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None,
+                     on_abandoned: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Выполняет fn(*args) в пуле рендера с учётом глубины очереди и таймаута.
+        Для process-бэкенда fn и аргументы должны быть picklable.
+        timeout переопределяет PDF_RENDER_TIMEOUT (для длинных пакетных задач).
+
+        Место в очереди освобождается, когда задача реально завершилась в пуле,
+        а не когда вызывающий перестал ждать (таймаут/отмена). on_abandoned
+        вызывается после такого завершения, если результат уже никому не нужен
+        (например, чтобы удалить файл, который писал воркер).
+        """
+        if self._pending >= self.max_pending:
+            raise PdfRenderQueueFull(f"PDF render queue is full ({self._pending}/{self.max_pending})")
+
+        timeout = self.timeout if timeout is None else timeout
+        self._pending += 1
+        state = {"abandoned": False, "finished": False}
+
+        def _cleanup() -> None:
+            if on_abandoned is not None:
+                try:
+                    on_abandoned()
+                except Exception:
+                    logger.exception("PDF render cleanup failed")
+
+        def _release(done: asyncio.Future) -> None:
+            self._pending -= 1
+            state["finished"] = True
+            if not done.cancelled():
+                done.exception()  # результат брошенной задачи не должен всплывать как "never retrieved"
+            if state["abandoned"]:
+                _cleanup()
+
+        def _abandon() -> None:
+            state["abandoned"] = True
+            if state["finished"]:
+                _cleanup()
+
+        with start_span("pdf_renderer.submit", only_in_trace=True,
+                        **{"pdf.backend": self.backend, "pdf.queue_depth": self._pending}):
+            try:
+                if self.backend == BACKEND_PROCESS:
+                    # Контекст в процесс не передать - спан покрывает ожидание целиком
+                    future = asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+                else:
+                    future = run_in_executor(self._get_executor(), fn, *args)
+            except BaseException:
+                self._pending -= 1
+                raise
+            future.add_done_callback(_release)
+            try:
+                # shield: отмена ожидания не отменяет future, иначе колбэк сработал бы
+                # до фактического завершения задачи в пуле
+                return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                # Уже запущенную задачу пул не прерывает - результат просто отбрасывается
+                _abandon()
+                raise PdfRenderTimeout(f"PDF render timed out after {timeout:.0f}s")
+            except asyncio.CancelledError:
+                _abandon()
+                raise
+
+    async def render_order(self, order: dict) -> Tuple[bytes, str]:
+        """Рендер PDF заказа. Возвращает (bytes, filename)."""
+        return await self.submit(build_order_pdf, order)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_renderer: Optional[PdfRenderer] = None
+
+
+def get_pdf_renderer() -> PdfRenderer:
+    """Глобальный рендерер, сконфигурированный из .env"""
+    global _renderer
+    if _renderer is None:
+        _renderer = PdfRenderer.from_env()
+    return _renderer
+
+
+def shutdown_pdf_renderer() -> None:
+    global _renderer
+    if _renderer is not None:
+        _renderer.shutdown()
+        _renderer = None
@@ -1,8 +1,12 @@
 # app/services/pdf_service.py - ОБНОВЛЕННАЯ ВЕРСИЯ
 from __future__ import annotations
+import hashlib
+import logging
+import threading
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, Optional, Iterable, Union, BinaryIO
 from pathlib import Path
 
 from reportlab.lib.pagesizes import A4
@@ -11,24 +15,136 @@ from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.utils import ImageReader
+from reportlab import rl_config
 
 from app.services.phone_utils import normalize_ua_phone, pretty_ua_phone
 from app.services.address_utils import get_delivery_and_contact_info, build_delivery_address_text, addresses_are_same
+from app.services.pdf_layout import LayoutPlan, get_layout_plan, get_template_name
+from app.services.pdf_optimize import is_size_optimized, compact_ttfont, downsample_brand, encode_brand_jpeg
+
+logger = logging.getLogger(__name__)
 
 FNT_REGULAR = "DejaVuSans"
 FNT_BOLD = "DejaVuSans-Bold"
 
 
-# ---------- fonts ----------
+# ---------- assets (загружаются один раз на процесс) ----------
+_ASSETS_DIR = Path(__file__).resolve().parents[1] / "assets"
+_assets_lock = threading.RLock()  # _load_brand вызывает _register_fonts под тем же локом
+_fonts_ok: Optional[bool] = None
+_brand: Optional["_BrandImage"] = None
+_brand_loaded = False
+
+
 def _register_fonts() -> bool:
-    """Регистрируем DejaVu Sans; если файлов нет — остаёмся на Helvetica."""
-    try:
-        base = Path(__file__).resolve().parents[1] / "assets" / "fonts"
-        pdfmetrics.registerFont(TTFont(FNT_REGULAR, str(base / "DejaVuSans.ttf")))
-        pdfmetrics.registerFont(TTFont(FNT_BOLD, str(base / "DejaVuSans-Bold.ttf")))
-        return True
-    except Exception:
-        return False
+    """Регистрируем DejaVu Sans один раз на процесс; если файлов нет — остаёмся на Helvetica."""
+    global _fonts_ok
+    if _fonts_ok is None:
+        with _assets_lock:
+            if _fonts_ok is None:
+                try:
+                    base = _ASSETS_DIR / "fonts"
+                    make_font = TTFont
+                    if is_size_optimized():
+                        # Шрифты без хинтинга, потоки без ASCII85-обёртки (+25% к размеру)
+                        make_font = compact_ttfont
+                        rl_config.useA85 = 0
+                    pdfmetrics.registerFont(make_font(FNT_REGULAR, str(base / "DejaVuSans.ttf")))
+                    pdfmetrics.registerFont(make_font(FNT_BOLD, str(base / "DejaVuSans-Bold.ttf")))
+                    _fonts_ok = True
+                except Exception:
+                    _fonts_ok = False
+    return _fonts_ok
+
+
+class _BrandImage:
+    """
+    Бренд-картинка, подготовленная один раз на процесс: сведена на белый фон
+    и сжата в JPEG, который canvas.drawImage встраивает без перекодирования
+    пикселей. Размер под рамку шаблона считается один раз.
+    """
+
+    def __init__(self, path: Path, jpeg: BinaryIO):
+        self.path = path
+        self.reader = ImageReader(jpeg)
+        self.width, self.height = self.reader.getSize()
+        self.reader.getRGBData()  # пиксели нужны drawImage для имени XObject - декодируем здесь
+        self._draw_lock = threading.Lock()  # drawImage читает общий JPEG-поток через seek/read
+        self._fit_cache: Dict[Tuple[float, float], Tuple[float, float]] = {}
+
+    def fit(self, max_w_mm: float, max_h_mm: float) -> Tuple[float, float]:
+        """Размер (w, h) в пунктах, вписанный в max_w_mm x max_h_mm (кэшируется)."""
+        key = (max_w_mm, max_h_mm)
+        size = self._fit_cache.get(key)
+        if size is None:
+            scale = min(max_w_mm * mm / self.width, max_h_mm * mm / self.height)
+            size = self._fit_cache[key] = (self.width * scale, self.height * scale)
+        return size
+
+    def draw(self, c: canvas.Canvas, x: float, y: float, w: float, h: float) -> None:
+        with self._draw_lock:
+            c.drawImage(self.reader, x, y, width=w, height=h)
+
+
+def _load_brand(path: Path) -> _BrandImage:
+    """В режиме оптимизации размера картинка уменьшается под рамку бренда в шаблоне."""
+    if not is_size_optimized():
+        return _BrandImage(path, encode_brand_jpeg(path))
+
+    plan = get_layout_plan(_register_fonts())
+    jpeg, report = downsample_brand(path, plan.brand_max_w_mm, plan.brand_max_h_mm)
+    logger.info(f"Brand image optimized: {report}")
+    return _BrandImage(path, jpeg)
+
+
+def _get_brand() -> Optional[_BrandImage]:
+    """
+    Бренд-картинка из app/assets/img/brand.(png|jpg|webp), загружается один раз.
+    None — если файла нет или он не читается.
+    """
+    global _brand, _brand_loaded
+    if not _brand_loaded:
+        with _assets_lock:
+            if not _brand_loaded:
+                base = _ASSETS_DIR / "img"
+                for name in ("brand.png", "brand.jpg", "brand.webp"):
+                    p = base / name
+                    if p.exists():
+                        try:
+                            _brand = _load_brand(p)
+                        except Exception:
+                            logger.exception(f"Failed to load brand image {p}")
+                            _brand = None
+                        break
+                _brand_loaded = True
+    return _brand
+
+
+def warmup_assets() -> None:
+    """Загружает шрифты и бренд-картинку заранее (вызывается из lifespan и воркеров рендера)."""
+    _register_fonts()
+    _get_brand()
+
+
+# Версия отрисовки: увеличить при изменении кода рендера, меняющем PDF, -
+# сохранённые документы заказов (order_documents) перерендерятся
+RENDERER_VERSION = 1
+
+
+def render_fingerprint(template: Optional[str] = None) -> str:
+    """
+    Всё, кроме данных заказа, от чего зависит PDF: версия рендера, режим
+    PDF_OPTIMIZE_SIZE, имя шаблона и его скомпилированный план. Входит в хэш
+    содержимого документа заказа.
+    """
+    plan = get_layout_plan(_register_fonts(), template or get_template_name())
+    return f"{_plan_fingerprint(plan)}:{'size' if is_size_optimized() else 'std'}"
+
+
+@lru_cache(maxsize=16)
+def _plan_fingerprint(plan: LayoutPlan) -> str:
+    digest = hashlib.sha256(repr(plan).encode("utf-8")).hexdigest()[:16]
+    return f"v{RENDERER_VERSION}:{plan.name}:{digest}"
 
 
 # ---------- small helpers ----------
@@ -59,23 +175,53 @@ def _money(value: float, cur: str) -> str:
     return f"{value:,.2f}".replace(",", " ") + f" {cur}"
 
 
+# Ширины слов по (шрифт, размер): названия и свойства товаров повторяются между заказами
+_WIDTH_CACHE_MAX = 20000
+_width_cache: Dict[Tuple[str, float], Dict[str, float]] = {}
+
+
+def _word_width(word: str, font: str, size: float) -> float:
+    """Ширина слова с мемоизацией; кэш на (font, size) ограничен _WIDTH_CACHE_MAX."""
+    widths = _width_cache.get((font, size))
+    if widths is None:
+        widths = _width_cache[(font, size)] = {}
+    width = widths.get(word)
+    if width is None:
+        if len(widths) >= _WIDTH_CACHE_MAX:
+            widths.clear()
+        width = widths[word] = pdfmetrics.stringWidth(word, font, size)
+    return width
+
+
 def _wrap_text(c: canvas.Canvas, text: str, x: float, y: float, max_width: float,
                font: str, size: int, line_step: float) -> float:
-    """Рисуем текст с переносами по ширине. Возвращаем новую y после отрисовки."""
+    """
+    Рисуем текст с переносами по ширине. Возвращаем новую y после отрисовки.
+    Ширина строки накапливается по словам (линейно по длине текста), а не
+    перемеряется целиком для каждого нового слова.
+    """
     c.setFont(font, size)
     words = str(text).split()
-    line = ""
+    space_w = _word_width(" ", font, size)
+    line: List[str] = []
+    line_w = 0.0
     for w in words:
-        trial = (line + " " + w).strip()
-        if c.stringWidth(trial, font, size) <= max_width:
-            line = trial
+        word_w = _word_width(w, font, size)
+        trial_w = line_w + space_w + word_w if line else word_w
+        if abs(trial_w - max_width) < 1e-6:
+            # На самой границе сумма может разойтись с точным замером в последнем знаке
+            trial_w = pdfmetrics.stringWidth(" ".join(line + [w]), font, size)
+        if trial_w <= max_width:
+            line.append(w)
+            line_w = trial_w
         else:
             if line:
-                c.drawString(x, y, line)
+                c.drawString(x, y, " ".join(line))
                 y -= line_step
-            line = w
+            line = [w]
+            line_w = word_w
     if line:
-        c.drawString(x, y, line)
+        c.drawString(x, y, " ".join(line))
         y -= line_step
     return y
 
@@ -99,43 +245,56 @@ def _try_draw_brand(c: canvas.Canvas, x_right: float, y_top: float, *, max_w_mm:
     Ищем: app/assets/img/brand.(png|jpg|webp)
     """
     try:
-        base = Path(__file__).resolve().parents[1] / "assets" / "img"
-        for name in ("brand.png", "brand.jpg", "brand.webp"):
-            p = base / name
-            if p.exists():
-                img = ImageReader(str(p))
-                iw, ih = img.getSize()
-                max_w = max_w_mm * mm
-                max_h = max_h_mm * mm
-                scale = min(max_w / iw, max_h / ih)
-                w, h = iw * scale, ih * scale
-                c.drawImage(img, x_right - w, y_top - h, width=w, height=h,
-                            preserveAspectRatio=True, mask="auto")
-                return
+        brand = _get_brand()
+        if brand is None:
+            return
+        w, h = brand.fit(max_w_mm, max_h_mm)
+        brand.draw(c, x_right - w, y_top - h, w, h)
     except Exception:
         pass
 
 
 # ---------- main ----------
-def build_order_pdf(order: dict) -> Tuple[bytes, str]:
+def _order_no(order: dict) -> Any:
+    return order.get("order_number") or order.get("id") or "—"
+
+
+def _draw_brand_header(c: canvas.Canvas, plan: LayoutPlan, as_form: bool) -> None:
+    """
+    Бренд справа сверху. as_form=True - статическая шапка один раз
+    записывается в form XObject документа, дальше страницы ссылаются на неё.
     """
+    if not plan.brand_enabled:
+        return
+    if not as_form:
+        _try_draw_brand(c, x_right=plan.right, y_top=plan.brand_y_top,
+                        max_w_mm=plan.brand_max_w_mm, max_h_mm=plan.brand_max_h_mm)
+        return
+
+    form_name = f"orderHeader_{plan.name}"
+    if not c.hasForm(form_name):
+        c.beginForm(form_name)
+        _try_draw_brand(c, x_right=plan.right, y_top=plan.brand_y_top,
+                        max_w_mm=plan.brand_max_w_mm, max_h_mm=plan.brand_max_h_mm)
+        c.endForm()
+    c.doForm(form_name)
+
+
+def _draw_order(c: canvas.Canvas, order: dict, plan: Optional[LayoutPlan] = None,
+                header_form: bool = False) -> None:
+    """
+    Рисует заказ на canvas по плану разметки, начиная с новой страницы
+    и заканчивая showPage(). Используется и для одиночного PDF, и для
+    пакетного экспорта (header_form=True - бренд через общий form XObject).
+
     ОБНОВЛЕННАЯ ВЕРСИЯ с новой логикой адресов:
     - Если адреса одинаковые → используем shipping
     - Если адреса разные → billing для доставки, shipping для контакта
     """
-    import time
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    start_time = time.time()
-    order_id = order.get('id', 'unknown')
-    buf = BytesIO()
-    # Создаем PDF с минимальными настройками для уменьшения размера
-    c = canvas.Canvas(buf, pagesize=A4, compress=1)  # Включаем сжатие
-    width, height = A4
-    has_fonts = _register_fonts()
+    if plan is None:
+        plan = get_layout_plan(_register_fonts())
 
-    order_no = order.get("order_number") or order.get("id") or "—"
+    order_no = _order_no(order)
     created = _fmt_date(order.get("created_at"))
     ship_title = _shipping_title(order)
     cur = _currency(order)
@@ -156,84 +315,73 @@ def build_order_pdf(order: dict) -> Tuple[bytes, str]:
         if not addresses_are_same(shipping, billing):
             contact_name = f"{contact_info.get('first_name', '')} {contact_info.get('last_name', '')}".strip()
             if contact_name:
-                scenario_info = f"Замовник: {contact_name}"
+                scenario_info = f"{plan.customer_label}: {contact_name}"
 
-    # Разметка страницы
-    top = height - 20 * mm
-    x0 = 20 * mm
-    right = width - x0
-
-    title_font = FNT_BOLD if has_fonts else "Helvetica-Bold"
-    text_font = FNT_REGULAR if has_fonts else "Helvetica"
+    x0 = plan.x0
+    title_font = plan.title_font
+    text_font = plan.text_font
 
     # Заголовок
-    c.setTitle(f"Замовлення #{order_no}")
-    c.setFont(title_font, 16)
-    c.drawString(x0, top, f"Замовлення №{order_no}")
+    c.setFont(title_font, plan.title_size)
+    c.drawString(x0, plan.top, plan.title_text.format(order_no=order_no))
 
     # Бренд справа сверху
-    _try_draw_brand(c, x_right=right, y_top=top + 2 * mm, max_w_mm=89.25, max_h_mm=51.0)
+    _draw_brand_header(c, plan, header_form)
 
     # Шапка
-    y = top - 10 * mm
-    c.setFont(text_font, 11)
-    c.drawString(x0, y, f"Дата: {created}")
-    y -= 6.2 * mm
-    c.drawString(x0, y, f"Доставка: {ship_title}")
-    y -= 6.2 * mm
+    y = plan.header_y
+    c.setFont(text_font, plan.header_size)
+    c.drawString(x0, y, f"{plan.date_label}: {created}")
+    y -= plan.header_step
+    c.drawString(x0, y, f"{plan.shipping_label}: {ship_title}")
+    y -= plan.header_step
 
     # ОБНОВЛЕННЫЙ блок адреса доставки
-    c.setFont(text_font, 11)
-    c.drawString(x0, y, "Адреса доставки:")
-    y -= 5.2 * mm
+    c.setFont(text_font, plan.address_size)
+    c.drawString(x0, y, plan.address_label)
+    y -= plan.address_step
 
     # Рисуем адрес доставки
     delivery_lines = delivery_text.split('\n')
     for line in delivery_lines:
         if line.strip():
-            y = _wrap_text(c, line, x0, y, right - x0, text_font, 11, 5.2 * mm)
+            y = _wrap_text(c, line, x0, y, plan.address_width, text_font, plan.address_size, plan.address_step)
 
     # Если есть информация о заказчике - добавляем
     if scenario_info:
-        y -= 3 * mm
-        c.setFont(text_font, 10)
+        y -= plan.customer_gap
+        c.setFont(text_font, plan.customer_size)
         c.drawString(x0, y, scenario_info)
-        y -= 5.2 * mm
+        y -= plan.address_step
 
-    y -= 7 * mm
+    y -= plan.address_gap_after
 
     # Заголовок таблицы товаров
-    c.setFont(title_font, 12)
-    c.drawString(x0, y, "Товари")
-    y -= 7 * mm
-
-    c.setFont(title_font, 10)
-    # колонки
-    col_name_x = x0
-    col_qty_x = x0 + 112 * mm
-    col_price_x = x0 + 140 * mm
-    col_sum_x = x0 + 180 * mm
-
-    c.drawString(col_name_x, y, "Назва")
-    c.drawRightString(col_qty_x, y, "К-ть")
-    c.drawRightString(col_price_x, y, "Ціна")
-    c.drawRightString(col_sum_x, y, "Сума")
-
-    y -= 4 * mm
-    c.line(x0, y, right, y)
-    y -= 6 * mm
-    c.setFont(text_font, 10)
+    c.setFont(title_font, plan.items_heading_size)
+    c.drawString(x0, y, plan.items_heading)
+    y -= plan.items_heading_step
+
+    # Шапка таблицы (правое выравнивание посчитано при компиляции плана)
+    c.setFont(title_font, plan.table_header_size)
+    for cell_x, label in plan.table_header_cells:
+        c.drawString(cell_x, y, label)
+
+    y -= plan.rule_gap
+    c.line(x0, y, plan.right, y)
+    y -= plan.after_rule
+    c.setFont(text_font, plan.row_size)
 
     # Рендер строк
     line_items = order.get("line_items") or []
     subtotal = 0.0
+    row_step = plan.row_step
 
-    def ensure_space(min_y: float = 25 * mm):
+    def ensure_space():
         nonlocal y
-        if y < min_y:
+        if y < plan.min_y:
             c.showPage()
-            c.setFont(text_font, 10)
-            y = height - 20 * mm
+            c.setFont(text_font, plan.row_size)
+            y = plan.top
 
     for it in line_items:
         title = str(it.get("title") or "—")
@@ -242,31 +390,30 @@ def build_order_pdf(order: dict) -> Tuple[bytes, str]:
         total = qty * price
         subtotal += total
 
-        usable_w = (col_qty_x - 3 * mm) - col_name_x
-        y = _wrap_text(c, title, col_name_x, y, usable_w, text_font, 10, 5.5 * mm)
+        y = _wrap_text(c, title, plan.col_name_x, y, plan.name_width, text_font, plan.row_size, row_step)
 
-        c.drawRightString(col_qty_x, y + 5.5 * mm, str(qty))
-        c.drawRightString(col_price_x, y + 5.5 * mm, f"{price:,.2f}".replace(",", " "))
-        c.drawRightString(col_sum_x, y + 5.5 * mm, f"{total:,.2f}".replace(",", " "))
+        c.drawRightString(plan.col_qty_x, y + row_step, str(qty))
+        c.drawRightString(plan.col_price_x, y + row_step, f"{price:,.2f}".replace(",", " "))
+        c.drawRightString(plan.col_sum_x, y + row_step, f"{total:,.2f}".replace(",", " "))
 
         ensure_space()
 
         # Выводим размер из variant_title если есть
         variant_title = str(it.get("variant_title") or "").strip()
         if variant_title:
-            y -= 1.5 * mm
-            text = f"• Розмір: {variant_title}"
-            y = _wrap_text(c, text, col_name_x + 6 * mm, y, right - (col_name_x + 6 * mm), text_font, 9, 5 * mm)
+            y -= plan.detail_gap
+            text = f"• {plan.variant_label}: {variant_title}"
+            y = _wrap_text(c, text, plan.detail_x, y, plan.detail_width, text_font, plan.detail_size, plan.detail_step)
             ensure_space()
 
         props = it.get("properties") or []
         if props:
-            y -= 1.5 * mm
-            y = _draw_properties(c, props, col_name_x + 6 * mm, y,
-                                 right - (col_name_x + 6 * mm), text_font, 9, 5 * mm)
+            y -= plan.detail_gap
+            y = _draw_properties(c, props, plan.detail_x, y,
+                                 plan.detail_width, text_font, plan.detail_size, plan.detail_step)
             ensure_space()
 
-        y -= 3 * mm
+        y -= plan.row_gap
 
     # Разом
     total_price = None
@@ -279,15 +426,55 @@ def build_order_pdf(order: dict) -> Tuple[bytes, str]:
                 pass
     grand_total_str = _money(total_price if total_price is not None else subtotal, cur)
 
-    c.setFont(title_font, 11)
-    c.drawRightString(col_sum_x, y, f"Разом: {grand_total_str}")
+    c.setFont(title_font, plan.total_size)
+    c.drawRightString(plan.col_sum_x, y, f"{plan.total_label}: {grand_total_str}")
 
     c.showPage()
+
+
+def build_order_pdf(order: dict, template: Optional[str] = None) -> Tuple[bytes, str]:
+    """PDF одного заказа по шаблону template (по умолчанию - шаблон магазина). Возвращает (bytes, filename)."""
+    import time
+
+    start_time = time.time()
+    order_id = order.get('id', 'unknown')
+    order_no = _order_no(order)
+    buf = BytesIO()
+    # Создаем PDF с минимальными настройками для уменьшения размера
+    c = canvas.Canvas(buf, pagesize=A4, compress=1)  # Включаем сжатие
+    c.setTitle(f"Замовлення #{order_no}")
+    _draw_order(c, order, get_layout_plan(_register_fonts(), template))
     c.save()
     pdf_bytes = buf.getvalue()
     buf.close()
-    
+
     generation_time = time.time() - start_time
-    logger.info(f"PDF generation completed in {generation_time:.2f}s for order {order_id}")
+    logger.info(f"PDF generation completed in {generation_time:.2f}s for order {order_id} "
+                f"({len(pdf_bytes) / 1024:.1f} KB)")
+
+    return pdf_bytes, f"order_#{order_no}.pdf"
 
-    return pdf_bytes, f"order_#{order_no}.pdf"
\ No newline at end of file
+
+def build_orders_pdf(orders: Iterable[dict], out: Union[str, BinaryIO], title: str = "Замовлення",
+                     template: Optional[str] = None) -> int:
+    """
+    Пакетный PDF: каждый заказ - своя группа страниц с закладкой в оглавлении.
+    orders может быть генератором - заказы рисуются по одному и не держатся в памяти,
+    шапка с бренд-картинкой записывается в документ один раз (form XObject).
+    Возвращает число заказов.
+    """
+    plan = get_layout_plan(_register_fonts(), template)
+    c = canvas.Canvas(out, pagesize=A4, compress=1)
+    c.setTitle(title)
+    c.showOutline()
+
+    count = 0
+    for order in orders:
+        key = f"order-{count}"
+        c.bookmarkPage(key)
+        c.addOutlineEntry(f"№{_order_no(order)}", key, level=0)
+        _draw_order(c, order, plan, header_form=True)
+        count += 1
+
+    c.save()
+    return count
\ No newline at end of file
@@ -1,9 +1,13 @@
 from __future__ import annotations
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import Iterable, List, Optional
 
 UA_COUNTRY = "380"
 
+# Сколько разных "сырых" строк помнит мемо normalize_ua_phone
+PHONE_CACHE_SIZE = 8192
+
 # --- helpers ---------------------------------------------------------------
 
 _SPLIT_PAT = re.compile(r"[;/,\|\n]")  # разделители нескольких номеров
@@ -29,16 +33,12 @@ def _first_chunk(s: str) -> str:
     return parts[0] if parts else (s or "")
 
 
-# --- public API ------------------------------------------------------------
+# Уже нормализованный номер: один проход вместо трёх regex
+_E164_UA_PAT = re.compile(r"\+380[0-9]{9}")
 
-def normalize_ua_phone(phone_raw: str | None) -> Optional[str]:
-    """
-    Преобразует входной номер к E.164 формату: +380XXXXXXXXX.
-    Возвращает None, если привести нельзя.
-    """
-    if not phone_raw:
-        return None
 
+def _normalize_slow(phone_raw: str) -> Optional[str]:
+    """Полный разбор: первый из нескольких номеров, без добавочного, только цифры."""
     cleaned = _strip_extension(_first_chunk(phone_raw))
     digits = _only_digits(cleaned)
     if not digits:
@@ -56,6 +56,42 @@ def normalize_ua_phone(phone_raw: str | None) -> Optional[str]:
     return None
 
 
+# Повторные вызовы с той же строкой (webhook, карточка, PDF, адрес) - из мемо
+_normalize_cached = lru_cache(maxsize=PHONE_CACHE_SIZE)(_normalize_slow)
+
+
+# --- public API ------------------------------------------------------------
+
+def normalize_ua_phone(phone_raw: str | None) -> Optional[str]:
+    """
+    Преобразует входной номер к E.164 формату: +380XXXXXXXXX.
+    Возвращает None, если привести нельзя.
+    Готовый E.164 возвращается без разбора, остальное мемоизируется (LRU).
+    """
+    if not phone_raw:
+        return None
+    if _E164_UA_PAT.fullmatch(phone_raw):
+        return phone_raw
+    return _normalize_cached(phone_raw)
+
+
+def normalize_ua_phone_many(phones: Iterable[str | None]) -> List[Optional[str]]:
+    """
+    Пакетная нормализация (экспорт, бэкфиллы): результат по позициям входа.
+    Повторы внутри пакета берутся из локального словаря, уникальные строки
+    идут через normalize_ua_phone (fast path для E.164 и LRU).
+    """
+    seen: dict = {}
+    out: List[Optional[str]] = []
+    for raw in phones:
+        try:
+            result = seen[raw]
+        except KeyError:
+            result = seen[raw] = normalize_ua_phone(raw)
+        out.append(result)
+    return out
+
+
 def pretty_ua_phone(e164: str) -> str:
     """
     Форматирует украинский номер для отображения: +380 XX XXX XX XX
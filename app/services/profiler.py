@@ -0,0 +1,199 @@
+# app/services/profiler.py
+"""
+Профилирование живого процесса без перезапуска (GET /debug/profile, /debug/memory).
+
+Сэмплирующий профайлер: отдельный поток раз в interval снимает стеки всех
+потоков (sys._current_frames) - event loop, пулы executor'ов, APScheduler - и
+считает одинаковые стеки. Результат - collapsed stacks, по строке на стек:
+
+    MainThread;run (asyncio/runners.py:86);...;get_order (app/services/shopify_service.py:70) 42
+
+формат flamegraph.pl / speedscope / inferno. Первый элемент - поток (пулы
+сведены по имени без номера воркера). Ожидание без работы (select event loop,
+пустая очередь пула) по умолчанию отбрасывается: в профиле только то, что
+занимает CPU или блокирует.
+
+Память: tracemalloc включается первым запросом (оверхед на каждую аллокацию,
+поэтому не с запуска), следующие показывают рост относительно базового снимка
+и размеры хранилищ состояния бота (app/bot/routers/shared/state.py).
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+MAX_PROFILE_SECONDS = 60
+DEFAULT_INTERVAL = 0.005
+
+# (файл, функция) верхнего кадра, когда поток просто ждёт работы
+IDLE_FRAMES = {
+    ("selectors.py", "select"),     # event loop без готовых событий
+    ("threading.py", "wait"),       # Condition/Event.wait
+    ("queue.py", "get"),            # пустая очередь (APScheduler, экспорт трасс)
+    ("thread.py", "_worker"),       # воркер ThreadPoolExecutor ждёт задачу
+    ("socket.py", "accept"),
+}
+
+_WORKER_SUFFIX = re.compile(r"_\d+$")
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _short_path(filename: str) -> str:
+    """Путь относительно sys.path: app/services/x.py, asyncio/events.py."""
+    best = filename
+    for base in sys.path:
+        if base and filename.startswith(base.rstrip(os.sep) + os.sep):
+            candidate = filename[len(base.rstrip(os.sep)) + 1:]
+            if len(candidate) < len(best):
+                best = candidate
+    return best
+
+
+def _frame_label(frame, cache: Dict) -> str:
+    code = frame.f_code
+    label = cache.get(code)
+    if label is None:
+        # ';' - разделитель формата, пробел перед счётчиком - тоже
+        name = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        label = cache[code] = name.replace(";", ":")
+    return label
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _thread_names() -> Dict[int, str]:
+    return {t.ident: _WORKER_SUFFIX.sub("", t.name) for t in threading.enumerate() if t.ident is not None}
+
+
+def sample_stacks(seconds: float, interval: float = DEFAULT_INTERVAL, include_idle: bool = False) -> Counter:
+    """
+    Снимает стеки всех потоков, кроме текущего, seconds секунд; блокирующий вызов -
+    из event loop только через executor. Параллельно - один профиль (ProfilerBusy).
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("profile already running")
+    try:
+        stacks: Counter = Counter()
+        labels: Dict = {}
+        me = threading.get_ident()
+        names = _thread_names()
+        deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                if ident not in names:
+                    names = _thread_names()
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame, labels))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _profile_lock.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# --- Память ---
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    # Аллокации самого tracemalloc не интересны
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+
+
+def state_sizes() -> Dict[str, Dict[str, int]]:
+    """Число ключей и вложенных элементов in-memory хранилищ бота."""
+    from app.bot.routers.shared import state
+
+    def nested(value) -> int:
+        if isinstance(value, dict):
+            return sum(nested(v) for v in value.values())
+        if isinstance(value, (set, list, tuple)):
+            return len(value)
+        return 1
+
+    sizes = {}
+    for name in ("user_navigation_messages", "user_all_navigation_messages", "user_order_files",
+                 "webhook_order_messages"):
+        value = getattr(state, name)
+        sizes[name] = {"keys": len(value), "items": nested(value)}
+    return sizes
+
+
+def memory_report(limit: int = 25, group_by: str = "lineno", reset: bool = False, stop: bool = False,
+                  frames: int = 10) -> dict:
+    """
+    Первый вызов запускает tracemalloc и запоминает базовый снимок; следующие -
+    top-limit мест роста относительно него. reset - новый базовый снимок,
+    stop - выключить tracemalloc (оверхед уходит).
+    """
+    global _baseline
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise ValueError("group_by must be lineno, filename or traceback")
+
+    if stop:
+        tracemalloc.stop()
+        _baseline = None
+        return {"tracing": False}
+
+    report = {"tracing": True, "state": state_sizes()}
+    if not tracemalloc.is_tracing() or _baseline is None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _baseline = _snapshot()
+        report["baseline"] = "started"
+        return report
+
+    snapshot = _snapshot()
+    stats = snapshot.compare_to(_baseline, group_by)
+    current, peak = tracemalloc.get_traced_memory()
+    report.update({
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "growth_bytes": sum(s.size_diff for s in stats),
+        "top": [_stat_entry(s, group_by) for s in stats[:limit]],
+    })
+    if reset:
+        _baseline = snapshot
+        report["baseline"] = "reset"
+    return report
+
+
+def _stat_entry(stat: tracemalloc.StatisticDiff, group_by: str) -> dict:
+    frames: List[str] = [f"{_short_path(f.filename)}:{f.lineno}" for f in stat.traceback]
+    entry = {
+        "size_diff": stat.size_diff,
+        "size": stat.size,
+        "count_diff": stat.count_diff,
+        "count": stat.count,
+    }
+    if group_by == "traceback":
+        entry["traceback"] = frames
+    else:
+        entry["where"] = frames[0] if frames else "?"
+    return entry
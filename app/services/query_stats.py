@@ -0,0 +1,208 @@
+# app/services/query_stats.py
+"""
+Счётчик SQL-запросов по областям: webhook-запрос, апдейт Telegram, запуск
+задачи планировщика. Хуки SQLAlchemy считают запросы и время БД в текущей
+области (contextvars - видна и в потоках пула через tracing.run_in_executor).
+
+На выходе из области:
+  - db_queries_per_scope / db_time_per_scope_seconds в /metrics;
+  - предупреждение, если запросов больше DB_QUERY_BUDGET (по умолчанию 50),
+    с самыми частыми запросами - так видны N+1 и повторные session.get().
+Отдельные запросы дольше DB_SLOW_QUERY_MS (200) - в лог с отпечатком
+параметров: типы, а не значения (в параметрах телефоны и имена).
+
+В тестах:
+
+    with query_budget(3):
+        await on_order_callback(callback)   # AssertionError, если запросов больше 3
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services.metrics import DB_QUERIES_PER_SCOPE, DB_TIME_PER_SCOPE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_SELECT_COLUMNS = re.compile(r"^SELECT .*? FROM ", re.IGNORECASE)
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)")
+MAX_FINGERPRINT_LENGTH = 300
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"Invalid {name}, using {default}")
+        return default
+
+
+def fingerprint(statement: str) -> str:
+    """Запрос без переносов, списка колонок SELECT и с IN (?, ?, ...) свёрнутым в IN (...)."""
+    text = _WHITESPACE.sub(" ", statement).strip()
+    text = _IN_LIST.sub("(...)", _SELECT_COLUMNS.sub("SELECT ... FROM ", text, count=1))
+    return text[:MAX_FINGERPRINT_LENGTH]
+
+
+def params_fingerprint(parameters: Any, executemany: bool = False) -> str:
+    """Форма параметров без значений: (int, str, None) / {id: int}; executemany - N x форма."""
+    if executemany and isinstance(parameters, (list, tuple)) and parameters:
+        return f"{len(parameters)} x {params_fingerprint(parameters[0])}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {_type_name(v)}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(_type_name(v) for v in parameters) + ")"
+    return _type_name(parameters)
+
+
+def _type_name(value: Any) -> str:
+    return "None" if value is None else type(value).__name__
+
+
+class QueryScope:
+    """Запросы одной области; счётчики общие для потоков пула (под блокировкой)."""
+
+    def __init__(self, name: str, parent: Optional["QueryScope"] = None):
+        self.name = name
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        scope = self
+        while scope is not None:
+            with scope._lock:
+                scope.count += 1
+                scope.seconds += seconds
+                scope.statements[statement] += 1
+            scope = scope.parent
+
+    def top(self, n: int = 5) -> str:
+        with self._lock:
+            common = self.statements.most_common(n)
+        return "\n".join(f"  {count:4d} x {statement}" for statement, count in common)
+
+
+_current_scope: contextvars.ContextVar[Optional[QueryScope]] = contextvars.ContextVar(
+    "query_scope", default=None
+)
+
+
+def current_scope() -> Optional[QueryScope]:
+    return _current_scope.get()
+
+
+# --- Хуки SQLAlchemy ---
+
+_slow_query_seconds = _env_number("DB_SLOW_QUERY_MS", 200) / 1000
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    scope = _current_scope.get()
+    if scope is None and elapsed < _slow_query_seconds:
+        return
+    text = fingerprint(statement)
+    if scope is not None:
+        scope.record(text, elapsed)
+    if elapsed >= _slow_query_seconds:
+        logger.warning(f"Slow query {elapsed * 1000:.0f}ms in {scope.name if scope else '-'}: {text} "
+                       f"params={params_fingerprint(parameters, executemany)}")
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    started = conn.info.get("query_started") if conn is not None else None
+    if started:
+        started.pop()
+
+
+def install() -> None:
+    """Хуки на все Engine (и тестовые sqlite); повторный вызов ничего не делает."""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+
+
+# --- Области ---
+
+@contextmanager
+def query_scope(name: str, budget: Optional[int] = None):
+    """
+    Область подсчёта; name - метка в /metrics (ограниченное множество: шаблон
+    маршрута, тип апдейта, имя задачи), его можно уточнить внутри (scope.name = ...).
+    """
+    scope = QueryScope(name, parent=_current_scope.get())
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        if scope.parent is None:
+            DB_QUERIES_PER_SCOPE.labels(scope.name).observe(scope.count)
+            DB_TIME_PER_SCOPE_SECONDS.labels(scope.name).observe(scope.seconds)
+            limit = _query_budget() if budget is None else budget
+            if scope.count > limit:
+                logger.warning(f"{scope.name}: {scope.count} queries ({scope.seconds * 1000:.0f}ms) "
+                               f"over budget {limit}, most frequent:\n{scope.top()}")
+
+
+def _query_budget() -> int:
+    return int(_env_number("DB_QUERY_BUDGET", 50))
+
+
+@contextmanager
+def query_budget(max_queries: int, name: str = "test"):
+    """Для тестов: AssertionError, если в блоке выполнено больше max_queries запросов."""
+    install()
+    scope = QueryScope(name)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+    if scope.count > max_queries:
+        raise AssertionError(f"{scope.count} queries, budget {max_queries}; most frequent:\n{scope.top()}")
+
+
+class QueryScopeMiddleware:
+    """ASGI: область на HTTP-запрос, метка - шаблон маршрута (scope["route"] после роутинга)."""
+
+    def __init__(self, app, exclude=("/metrics", "/health")):
+        self.app = app
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+        with query_scope("http unmatched") as queries:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    queries.name = f"http {route}"
@@ -0,0 +1,14 @@
+# app/services/shopify_hmac.py
+"""
+Подпись webhook Shopify (X-Shopify-Hmac-Sha256): проверка в app.main,
+переподпись при воспроизведении (tools.replay_webhooks) и в бенчмарке.
+"""
+import base64
+import hashlib
+import hmac
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    """base64(HMAC-SHA256) тела; Shopify использует secret как UTF-8 строку."""
+    return base64.b64encode(hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest()).decode()
+
@@ -3,6 +3,8 @@ from __future__ import annotations
 import os, time
 from typing import Any, Dict, Optional
 import requests
+
+from app.services.tracing import start_span, traced
 from dotenv import load_dotenv
 import logging
 
@@ -82,7 +84,11 @@ def _request_json(method: str, path: str, *, params: Optional[Dict[str, Any]] =
             time.sleep(pause)
 
         try:
-            response = _session.request(method, url, params=params, timeout=30)
+            with start_span("shopify.http", only_in_trace=True,
+                            **{"http.method": method, "http.target": path, "attempt": attempt + 1}) as span:
+                response = _session.request(method, url, params=params, timeout=30)
+                if span is not None:
+                    span.set_attribute("http.status_code", response.status_code)
 
             # Обработка rate limiting (429)
             if response.status_code == 429:
@@ -172,6 +178,7 @@ def _request_json(method: str, path: str, *, params: Optional[Dict[str, Any]] =
         raise ShopifyApiError("All retry attempts failed")
 
 
+@traced("shopify.get_order", only_in_trace=True)
 def get_order(order_id: int | str) -> Dict[str, Any]:
     """
     Получает полный заказ по ID через REST Admin API.
@@ -5,9 +5,16 @@ import json
 import requests
 from dotenv import load_dotenv
 
+from app.config import get_telegram_api_base_url
+
 load_dotenv()
 
 
+def _api_url(token: str, method: str) -> str:
+    base = get_telegram_api_base_url() or "https://api.telegram.org"
+    return f"{base}/bot{token}/{method}"
+
+
 def send_text(message: str):
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     chat_id = os.getenv("TELEGRAM_TARGET_CHAT_ID")
@@ -15,7 +22,7 @@ def send_text(message: str):
     if not token or not chat_id:
         raise RuntimeError("TELEGRAM_BOT_TOKEN or TELEGRAM_TARGET_CHAT_ID is not set in .env")
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    url = _api_url(token, "sendMessage")
     payload = {
         "chat_id": chat_id,
         "text": message
@@ -38,7 +45,7 @@ def send_file(data: bytes, filename: str, caption: str | None = None):
     if not token or not chat_id:
         raise RuntimeError("TELEGRAM_BOT_TOKEN or TELEGRAM_TARGET_CHAT_ID is not set in .env")
 
-    url = f"https://api.telegram.org/bot{token}/sendDocument"
+    url = _api_url(token, "sendDocument")
     files = {
         "document": (filename, data, "text/vcard" if filename.endswith('.vcf') else "application/pdf"),
     }
@@ -68,7 +75,7 @@ def send_text_with_buttons(message: str, buttons: list[list[dict]]):
     if not token or not chat_id:
         raise RuntimeError("TELEGRAM_BOT_TOKEN or TELEGRAM_TARGET_CHAT_ID is not set in .env")
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+    url = _api_url(token, "sendMessage")
 
     payload = {
         "chat_id": chat_id,
@@ -96,7 +103,7 @@ def edit_message_text(chat_id: int | str, message_id: int, text: str,
     if not token:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set in .env")
 
-    url = f"https://api.telegram.org/bot{token}/editMessageText"
+    url = _api_url(token, "editMessageText")
     payload: dict[str, object] = {
         "chat_id": chat_id,
         "message_id": message_id,
@@ -119,7 +126,7 @@ def answer_callback_query(callback_query_id: str, text: str | None = None,
     if not token:
         raise RuntimeError("TELEGRAM_BOT_TOKEN is not set in .env")
 
-    url = f"https://api.telegram.org/bot{token}/answerCallbackQuery"
+    url = _api_url(token, "answerCallbackQuery")
     payload: dict[str, object] = {"callback_query_id": callback_query_id}
     if text:
         payload["text"] = text
@@ -0,0 +1,436 @@
+# app/services/tracing.py
+"""
+Трассировка в духе OpenTelemetry без внешних зависимостей.
+
+Спан - интервал работы с trace_id/span_id/parent_id и атрибутами; текущий спан
+живёт в contextvars, поэтому дочерние спаны находят родителя сами - в корутинах,
+в задачах asyncio (create_task копирует контекст) и в потоках пулов, если
+задача отправлена через run_in_executor() этого модуля.
+
+Включается TRACING_EXPORTER:
+    file - JSON-строка на спан в TRACING_FILE (по умолчанию traces.jsonl),
+           разбор: python -m tools.trace_report traces.jsonl --order <id>;
+    otlp - OTLP/HTTP JSON на OTEL_EXPORTER_OTLP_ENDPOINT (по умолчанию
+           http://127.0.0.1:4318) - локальный OpenTelemetry Collector, Jaeger, Tempo.
+По умолчанию выключено: start_span() сразу отдаёт None, SQL-хуки не ставятся.
+
+Экспорт - в фоновом потоке пачками; при переполнении очереди спаны
+отбрасываются (счётчик dropped), запросы не ждут экспорта.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVICE_NAME = "shopify-order-notifier"
+MAX_ATTRIBUTE_LENGTH = 1000
+
+_SHUTDOWN = object()  # метка остановки потока экспорта
+
+
+class SpanContext(NamedTuple):
+    """Родитель из другого процесса (заголовок traceparent)."""
+    trace_id: str
+    span_id: str
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes",
+                 "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes else {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"[:MAX_ATTRIBUTE_LENGTH]
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Атрибут текущего спана (no-op вне трассы)."""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """W3C traceparent: 00-<trace_id 32 hex>-<span_id 16 hex>-<flags>."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+# --- Экспорт ---
+
+class FileExporter:
+    """JSON-строка на спан; файл только дописывается."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n" for s in spans)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)[:MAX_ATTRIBUTE_LENGTH]}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP с JSON-кодированием (POST {endpoint}/v1/traces)."""
+
+    def __init__(self, endpoint: str, service_name: str = DEFAULT_SERVICE_NAME, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def payload(self, spans: List[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "app.services.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, spans: List[Span]) -> None:
+        body = json.dumps(self.payload(spans)).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """Собирает завершённые спаны и отдаёт их экспортеру из фонового потока."""
+
+    def __init__(self, exporter, max_queue: int = 10000, batch_size: int = 512, flush_interval: float = 1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["Tracer"]:
+        kind = os.getenv("TRACING_EXPORTER", "").strip().lower()
+        if kind in ("", "none", "0", "off"):
+            return None
+        if kind == "file":
+            exporter = FileExporter(os.getenv("TRACING_FILE", "traces.jsonl"))
+        elif kind == "otlp":
+            exporter = OtlpHttpExporter(
+                os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://127.0.0.1:4318"),
+                service_name=os.getenv("OTEL_SERVICE_NAME", DEFAULT_SERVICE_NAME),
+            )
+        else:
+            logger.warning(f"Unknown TRACING_EXPORTER={kind!r}, tracing disabled")
+            return None
+        logger.info(f"Tracing enabled: exporter={kind}")
+        return cls(exporter)
+
+    def submit(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _SHUTDOWN:
+                self._export(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _export(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Trace export failed ({len(batch)} spans): {e}")
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._queue.put(_SHUTDOWN)
+        self._thread.join(timeout)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_loaded = False
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    global _tracer, _tracer_loaded
+    if not _tracer_loaded:
+        with _tracer_lock:
+            if not _tracer_loaded:
+                _tracer = Tracer.from_env()
+                _tracer_loaded = True
+    return _tracer
+
+
+def shutdown_tracer() -> None:
+    global _tracer, _tracer_loaded
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.shutdown()
+        _tracer, _tracer_loaded = None, False
+
+
+# --- API спанов ---
+
+_UNSET: Any = object()
+
+
+def begin_span(name: str, parent: Any = _UNSET, **attributes) -> Optional[Span]:
+    """Низкоуровневый старт спана без смены текущего (для хуков с парой before/after)."""
+    if get_tracer() is None:
+        return None
+    parent = _current_span.get() if parent is _UNSET else parent
+    if parent is None:
+        return Span(name, _new_trace_id(), None, attributes)
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+def finish_span(span: Optional[Span], exc: Optional[BaseException] = None) -> None:
+    if span is None:
+        return
+    if exc is not None:
+        span.record_error(exc)
+    span.end()
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.submit(span)
+
+
+@contextmanager
+def start_span(name: str, parent: Any = _UNSET, only_in_trace: bool = False, **attributes):
+    """
+    Спан на время блока; внутри блока он текущий.
+    only_in_trace - не начинать новую трассу (для вызовов, интересных только внутри запроса).
+    """
+    if get_tracer() is None or (only_in_trace and parent is _UNSET and _current_span.get() is None):
+        yield None
+        return
+    span = begin_span(name, parent, **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        finish_span(span)
+
+
+def traced(name: Optional[str] = None, only_in_trace: bool = False):
+    """Декоратор: спан на вызов функции (sync или async)."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name, only_in_trace=only_in_trace):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, only_in_trace=only_in_trace):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run_in_executor(executor, fn: Callable, *args) -> asyncio.Future:
+    """
+    loop.run_in_executor с копией contextvars: спаны в потоке пула - дочерние
+    для вызывающего. Только для пулов потоков (контекст не pickle'ится).
+    """
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, functools.partial(ctx.run, fn, *args))
+
+
+# --- Интеграции ---
+
+def instrument_sqlalchemy(engine) -> None:
+    """Спан на каждый SQL-запрос внутри трассы (вне трассы - без спанов)."""
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if _current_span.get() is None:
+            return
+        span = begin_span("db.query", **{"db.system": conn.dialect.name,
+                                         "db.statement": statement[:MAX_ATTRIBUTE_LENGTH]})
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            finish_span(spans.pop())
+
+    def on_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            finish_span(spans.pop(), exception_context.original_exception)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "handle_error", on_error)
+
+
+class TracingMiddleware:
+    """ASGI: корневой спан на HTTP-запрос; входящий traceparent - родитель."""
+
+    def __init__(self, app, exclude=("/metrics", "/health")):
+        self.app = app
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude or get_tracer() is None:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        parent = parse_traceparent(traceparent)
+        method = scope.get("method", "")
+        status = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        with start_span(f"{method} {scope.get('path')}", parent=parent,
+                        **{"http.method": method, "http.target": scope.get("path")}) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if getattr(route, "path", None):
+                    span.name = f"{method} {route.path}"
+                span.set_attribute("http.status_code", status.get("code", 500))
+                if status.get("code", 500) >= 500:
+                    span.status = "error"
+
+
+def aiogram_request_middleware():
+    """Middleware сессии aiogram: спан на каждый вызов Bot API внутри трассы."""
+    from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+    class TelegramTracingMiddleware(BaseRequestMiddleware):
+        async def __call__(self, make_request, bot, method):
+            api_method = type(method).__name__
+            with start_span(f"telegram.{api_method}", only_in_trace=True,
+                            **{"telegram.method": api_method}) as span:
+                result = await make_request(bot, method)
+                if span is not None:
+                    chat_id = getattr(method, "chat_id", None)
+                    if chat_id is not None:
+                        span.set_attribute("telegram.chat_id", chat_id)
+                return result
+
+    return TelegramTracingMiddleware()
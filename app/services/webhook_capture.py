@@ -0,0 +1,256 @@
+# app/services/webhook_capture.py
+"""
+Запись входящих webhook Shopify для воспроизведения (python -m tools.replay_webhooks).
+
+Включается WEBHOOK_CAPTURE_PATH: каждый запрос на /webhooks/shopify/orders
+дописывается одной JSON-строкой в файл (.gz - сжатый, тоже только дописывается):
+
+    {"ts": 1760000000.123, "path": "...", "headers": {...}, "status": 200,
+     "duration_ms": 85.1, "body": {...}}
+
+Подпись (X-Shopify-Hmac-Sha256) не сохраняется - при воспроизведении тело
+подписывается заново. Персональные данные (имена, телефоны, email, адреса)
+заменяются детерминированными псевдонимами: один и тот же покупатель даёт тот
+же псевдоним, телефон остаётся валидным украинским номером - повторные заказы
+и нормализация телефона воспроизводятся как в проде.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+from app.services.phone_utils import normalize_ua_phone
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_PATHS = ("/webhooks/shopify/orders",)
+
+# Заголовки Shopify, нужные для воспроизведения (без HMAC)
+CAPTURED_HEADERS = (
+    "content-type",
+    "x-shopify-topic",
+    "x-shopify-shop-domain",
+    "x-shopify-api-version",
+    "x-shopify-webhook-id",
+    "x-shopify-event-id",
+    "x-shopify-triggered-at",
+)
+
+# Объекты, внутри которых name/first_name/... - данные человека, а не товара
+_PERSON_KEYS = {"customer", "shipping_address", "billing_address", "default_address", "addresses"}
+# Списки {name, value}: значения - текст покупателя (персонализация товара)
+_PROPERTY_KEYS = {"properties", "note_attributes"}
+_NAME_FIELDS = {"first_name", "last_name", "name", "company"}
+_PHONE_FIELDS = {"phone"}
+_EMAIL_FIELDS = {"email", "contact_email"}
+_ADDRESS_FIELDS = {"address1", "address2", "zip", "latitude", "longitude"}
+# Поля, которые просто вырезаются
+_DROP_FIELDS = {"browser_ip", "client_details", "customer_locale", "landing_site", "referring_site"}
+_TEXT_FIELDS = {"note"}
+
+
+def _digest(value, salt: str) -> str:
+    return hashlib.sha256(f"{salt}:{value}".encode("utf-8")).hexdigest()
+
+
+def _pseudonym(key: str, value, salt: str):
+    if value in (None, ""):
+        return value
+    if key in _PHONE_FIELDS:
+        # Один номер в разной записи (067..., +38067...) - один псевдоним
+        value = normalize_ua_phone(str(value)) or value
+    h = _digest(str(value).strip().lower(), salt)
+    if key in _PHONE_FIELDS:
+        # Оператор 67 + 7 цифр из хеша: номер проходит normalize_ua_phone
+        return "+38067" + str(int(h[:12], 16))[-7:].rjust(7, "0")
+    if key in _EMAIL_FIELDS:
+        return f"u{h[:10]}@example.invalid"
+    if key in ("latitude", "longitude"):
+        return None
+    if key == "value":
+        # Длина сохраняется - рендер PDF с персонализацией ведёт себя как с оригиналом
+        text = str(value)
+        return (h * (len(text) // len(h) + 1))[:len(text)]
+    return f"{key[:1].upper()}{h[:8]}"
+
+
+def redact(payload, salt: str = "", _context: Optional[str] = None):
+    """Копия payload с псевдонимами вместо персональных данных."""
+    if isinstance(payload, list):
+        return [redact(item, salt, _context) for item in payload]
+    if not isinstance(payload, dict):
+        return payload
+
+    result = {}
+    for key, value in payload.items():
+        if key in _DROP_FIELDS:
+            continue
+        if isinstance(value, (dict, list)):
+            if key in _PERSON_KEYS:
+                context = "person"
+            elif key in _PROPERTY_KEYS:
+                context = "properties"
+            else:
+                context = _context if _context == "person" else None
+            result[key] = redact(value, salt, context)
+        elif key in _PHONE_FIELDS or key in _EMAIL_FIELDS or key in _ADDRESS_FIELDS:
+            result[key] = _pseudonym(key, value, salt)
+        elif key in _NAME_FIELDS and _context == "person":
+            result[key] = _pseudonym(key, value, salt)
+        elif key == "value" and _context == "properties":
+            result[key] = _pseudonym(key, value, salt)
+        elif key in _TEXT_FIELDS and value:
+            result[key] = "[redacted]"
+        else:
+            result[key] = value
+    return result
+
+
+_SHUTDOWN = object()
+
+
+class WebhookCapture:
+    """
+    Дописывает записи в файл. record() только кладёт запрос в очередь: разбор
+    JSON, псевдонимы, сжатие и запись - в фоновом потоке, не в event loop.
+    Очередь переполнена (диск не успевает) - запись отбрасывается и считается в dropped.
+    """
+
+    def __init__(self, path: str, salt: str = "", max_queue: int = 1000):
+        self.path = path
+        self.salt = salt
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+
+    @classmethod
+    def from_env(cls) -> Optional["WebhookCapture"]:
+        path = (os.getenv("WEBHOOK_CAPTURE_PATH") or "").strip()
+        if not path:
+            return None
+        return cls(path, salt=os.getenv("WEBHOOK_CAPTURE_SALT", ""))
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = gzip.open(self.path, "ab") if self.path.endswith(".gz") else open(self.path, "ab")
+        return self._file
+
+    def record(self, path: str, headers: dict, body: bytes, status: Optional[int], duration: float,
+               ts: Optional[float] = None) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="webhook-capture", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((path, headers, body, status, duration,
+                                    ts if ts is not None else time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _SHUTDOWN:
+                break
+            try:
+                self._write(*item)
+                if self._file is not None and self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                logger.error(f"Failed to capture webhook: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, path: str, headers: dict, body: bytes, status: Optional[int], duration: float,
+               ts: float) -> None:
+        try:
+            parsed = redact(json.loads(body), self.salt)
+        except ValueError:
+            # Невалидный JSON не воспроизводим как заказ - сохраняем только факт
+            parsed = None
+        entry = {
+            "ts": round(ts, 3),
+            "path": path,
+            "headers": {k: v for k, v in headers.items() if k in CAPTURED_HEADERS},
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "body": parsed,
+        }
+        self._open().write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Дописывает очередь и закрывает файл."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_SHUTDOWN)
+            thread.join(timeout)
+
+
+def read_capture(path: str):
+    """Записи файла по порядку; обрезанный хвост (процесс убит на записи) пропускается."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        try:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line)
+        except EOFError:
+            logger.warning(f"Capture file {path} ends with a truncated gzip member")
+
+
+class WebhookCaptureMiddleware:
+    """
+    ASGI middleware: тело запроса собирается из receive, статус - из send,
+    запись ставится в очередь после ответа. Остальные пути проходят без изменений.
+    """
+
+    def __init__(self, app, capture: WebhookCapture, paths=CAPTURED_PATHS):
+        self.app = app
+        self.capture = capture
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope.get("path") not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        status = {}
+        started_wall, started = time.time(), time.perf_counter()
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def capturing_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capturing_receive, capturing_send)
+        finally:
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+            try:
+                self.capture.record(scope["path"], headers, b"".join(chunks), status.get("code"),
+                                    time.perf_counter() - started, ts=started_wall)
+            except Exception as e:
+                logger.error(f"Failed to capture webhook: {e}")
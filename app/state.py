@@ -9,6 +9,7 @@ from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 from app.db import get_session
 from app.models import Order, OrderStatus
+from app.services.customer_service import attach_customer
 
 
 async def is_processed(order_id: str | int) -> bool:
@@ -67,6 +68,9 @@ async def mark_processed(order_id: str | int, order_data: Optional[dict] = None)
 
             session.add(order)
 
+        # Покупатель по телефону (upsert) - повторные заказы ссылаются на ту же запись
+        attach_customer(session, order)
+
         try:
             session.commit()
             return True
@@ -0,0 +1,140 @@
+# benchmarks/bench_keycrm.py
+"""
+Пропускная способность keyCRM-клиента и фоновой синхронизации на локальной
+заглушке keyCRM (tools.fake_keycrm) - без реального аккаунта.
+
+Лимит заглушки - --rate-limit запросов за окно 60/--speedup секунд
+(--speedup 10: минута лимита проходит за 6 секунд). Отчёт: время,
+запросов за окно против лимита, число 429, латентность запросов.
+
+    python -m benchmarks.bench_keycrm --mode client --requests 200
+    python -m benchmarks.bench_keycrm --mode sync --orders 100 --latency 0.1 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _report(title, elapsed, sent, window, limit, stats, latencies=None):
+    per_window = sent / elapsed * window if elapsed else 0.0
+    print(f"{title}: {elapsed:.2f}s")
+    print(f"  requests:      {sent} ({stats.get('rate_limited', 0)} x 429, "
+          f"{stats.get('injected_errors', 0)} injected errors)")
+    print(f"  per window:    {per_window:.1f} / {limit} ({per_window / limit:.0%} of limit)")
+    if latencies:
+        qs = statistics.quantiles(latencies, n=20)
+        print(f"  latency:       p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {qs[18] * 1000:.0f} ms")
+
+
+async def bench_client(base_url, args, window):
+    from app.services.keycrm_client import KeyCrmClient, KeyCrmError
+
+    client = KeyCrmClient(base_url, "bench", rate_per_minute=args.rate_limit, window=window,
+                          queue_timeout=3600)
+    latencies = []
+
+    async def one(n):
+        started = time.perf_counter()
+        try:
+            await client.post("/order", json={
+                "source_id": 2, "source_uuid": f"bench-{n}",
+                "buyer": {"full_name": "Bench", "phone": f"+38050{n:07d}"},
+            })
+        except KeyCrmError:
+            pass
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(n) for n in range(args.requests)))
+    finally:
+        await client.close()
+    return time.perf_counter() - started, latencies
+
+
+def _prepare_db(path, orders):
+    """Временная sqlite-БД с orders оплаченными заказами."""
+    from app.db import Base, engine, get_session
+    from app.models import Order, OrderStatus
+
+    Base.metadata.create_all(engine)
+    with get_session() as session:
+        session.add_all([
+            Order(id=n, order_number=str(10000 + n), status=OrderStatus.PAID,
+                  customer_first_name="Bench", customer_phone_e164=f"+38050{n:07d}",
+                  raw_json={"id": n, "order_number": 10000 + n, "line_items": []})
+            for n in range(1, orders + 1)
+        ])
+        session.commit()
+
+
+async def bench_sync(base_url, args, window):
+    from app.services import keycrm_client
+    from app.services.crm_sync import run_crm_sync
+
+    keycrm_client._client = keycrm_client.KeyCrmClient(
+        base_url, "bench", rate_per_minute=args.rate_limit, window=window, queue_timeout=3600,
+    )
+    started = time.perf_counter()
+    try:
+        result = await run_crm_sync()
+    finally:
+        await keycrm_client.close_keycrm_client()
+    return time.perf_counter() - started, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="keyCRM client/sync throughput on the local stand-in")
+    parser.add_argument("--mode", choices=("client", "sync"), default="client")
+    parser.add_argument("--requests", type=int, default=200, help="client mode: POST /order count")
+    parser.add_argument("--orders", type=int, default=100, help="sync mode: PAID orders to sync")
+    parser.add_argument("--rate-limit", type=int, default=60)
+    parser.add_argument("--speedup", type=float, default=10.0, help="rate limit window = 60 / speedup seconds")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    window = 60.0 / args.speedup
+    tmpdir = tempfile.TemporaryDirectory()
+    # Бенчмарк никогда не трогает настоящую БД
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmpdir.name) / 'bench.db'}"
+    os.environ.setdefault("SHOPIFY_STORE_DOMAIN", "bench")
+    os.environ.setdefault("SHOPIFY_ADMIN_ACCESS_TOKEN", "bench")
+
+    from tools.fake_keycrm import FakeKeyCrmConfig, create_app
+    from tools.stub_server import serve_in_thread
+
+    app = create_app(FakeKeyCrmConfig(
+        rate_limit=args.rate_limit, window=window, latency=args.latency,
+        jitter=args.jitter, error_rate=args.error_rate, seed=1,
+    ))
+    server = serve_in_thread(app)
+    base_url = f"{server.url}/v1"
+    stats = app.state.fake.stats
+    try:
+        if args.mode == "client":
+            elapsed, latencies = asyncio.run(bench_client(base_url, args, window))
+            _report(f"client, {args.requests} x POST /order", elapsed, stats["requests"],
+                    window, args.rate_limit, stats, latencies)
+        else:
+            os.environ["CRM_SYNC_STATUSES"] = "PAID"
+            _prepare_db(tmpdir.name, args.orders)
+            elapsed, result = asyncio.run(bench_sync(base_url, args, window))
+            _report(f"sync, {args.orders} orders", elapsed, stats["requests"], window, args.rate_limit, stats)
+            print(f"  result:        created={result.created}, existing={result.existing}, failed={result.failed}, "
+                  f"deferred={result.deferred}")
+            print(f"  orders/window: {(result.created + result.existing) / elapsed * window:.1f}")
+    finally:
+        server.stop()
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# benchmarks/bench_payment_sender.py
+"""
+Латентность кнопки "Реквізити" на замоканном Bot API.
+
+Сравнивает старую схему (6 сообщений с паузой 1с между копируемыми)
+с упорядоченной отправкой без пауз, в т.ч. в режиме "одним сообщением".
+
+    python -m benchmarks.bench_payment_sender --latency-ms 150
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.bot.services.payment_sender import build_payment_messages, send_ordered
+
+LEGACY_DELAY = 1  # прежний PAYMENT_MESSAGE_DELAY
+
+
+class MockBot:
+    """Имитирует round-trip до Bot API фиксированной задержкой."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self._next_id = 0
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(self.latency)
+        self._next_id += 1
+        return SimpleNamespace(message_id=self._next_id)
+
+
+async def _legacy(bot: MockBot) -> None:
+    messages = build_payment_messages("800", "грн", collapse_copy=False)
+    await bot.send_message(1, messages[0])
+    for text in messages[1:-1]:
+        await bot.send_message(1, text)
+        await asyncio.sleep(LEGACY_DELAY)
+    await bot.send_message(1, messages[-1])
+
+
+async def _ordered(bot: MockBot, collapse: bool) -> None:
+    await send_ordered(bot, 1, build_payment_messages("800", "грн", collapse_copy=collapse))
+
+
+async def _measure(coro_factory, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        await coro_factory()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main(latency_ms: float, runs: int) -> None:
+    bot = MockBot(latency_ms / 1000)
+    results = {
+        "legacy (sleep 1s)": await _measure(lambda: _legacy(bot), 1),
+        "ordered": await _measure(lambda: _ordered(bot, False), runs),
+        "ordered, collapsed": await _measure(lambda: _ordered(bot, True), runs),
+    }
+    print(f"Bot API latency: {latency_ms:.0f} ms per call")
+    for name, seconds in results.items():
+        print(f"  {name:<22} {seconds * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, args.runs))
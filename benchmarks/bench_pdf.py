@@ -0,0 +1,214 @@
+# benchmarks/bench_pdf.py
+"""
+Бенчмарк рендера PDF заказа на синтетических заказах Shopify.
+
+Заказы на 1, 10, 100 и 1000 позиций: длинные кириллические названия,
+варианты и много properties. Для каждого размера считается время рендера
+(медиана), пиковая память (tracemalloc) и размер PDF. Работает офлайн.
+
+Абсолютное время зависит от машины, поэтому --check сравнивает не мс, а
+time_ratio - отношение ко времени эталонной нагрузки (голый ReportLab canvas
+без кода приложения), измеренной в том же запуске вперемешку с заказами. Память и размер PDF от
+машины не зависят и сравниваются как есть.
+
+    python -m benchmarks.bench_pdf                     # отчёт
+    python -m benchmarks.bench_pdf --check             # сравнение с baseline, exit 1 при регрессии
+    python -m benchmarks.bench_pdf --update-baseline   # перезаписать baseline
+    python -m benchmarks.bench_pdf --optimize-size     # режим PDF_OPTIMIZE_SIZE (отдельный baseline)
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.services import pdf_service
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "pdf_render.json"
+OPTIMIZED_BASELINE_PATH = BASELINE_PATH.with_name("pdf_render_optimized.json")
+SIZES = (1, 10, 100, 1000)
+
+# Допустимый рост относительно baseline
+TIME_TOLERANCE = 1.5    # для time_ratio: шум планировщика и кэшей остаётся
+MEMORY_TOLERANCE = 1.25
+SIZE_TOLERANCE = 1.10
+
+_WORDS = (
+    "Футболка", "чоловіча", "жіноча", "дитяча", "бавовняна", "з", "принтом",
+    "іменна", "чашка", "керамічна", "подарункова", "класична", "оверсайз",
+    "вишиванка", "ручної", "роботи", "сімейний", "набір", "для", "всієї", "родини",
+)
+_PROPERTY_NAMES = ("Ім'я", "Напис", "Колір", "Шрифт", "Дата", "Побажання", "Фото", "_hidden")
+
+
+def make_order(items: int, seed: int = 0) -> dict:
+    """Детерминированный синтетический заказ Shopify на items позиций."""
+    rnd = random.Random(seed + items)
+    line_items = []
+    for i in range(items):
+        title = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(4, 18)))
+        properties = [
+            {"name": name, "value": " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(1, 12)))}
+            for name in _PROPERTY_NAMES[:rnd.randint(2, len(_PROPERTY_NAMES))]
+        ]
+        line_items.append({
+            "id": 10_000 + i,
+            "title": f"{title} #{i + 1}",
+            "quantity": rnd.randint(1, 5),
+            "price": f"{rnd.randint(100, 2500)}.00",
+            "variant_title": rnd.choice(("S", "M", "L", "XL", "XXL / Чорний", "")),
+            "properties": properties,
+        })
+
+    address = {
+        "first_name": "Олександра",
+        "last_name": "Шевченко-Коваленко",
+        "phone": "+380671234567",
+        "city": "Київ",
+        "address1": "вул. Богдана Хмельницького, 25, кв. 17",
+        "address2": "Відділення Нової Пошти №123",
+    }
+    return {
+        "id": 5_000_000 + items,
+        "order_number": 1000 + items,
+        "created_at": "2025-01-01T10:00:00Z",
+        "currency": "UAH",
+        "email": "customer@example.com",
+        "shipping_lines": [{"title": "Нова Пошта"}],
+        "shipping_address": address,
+        "billing_address": address,
+        "line_items": line_items,
+    }
+
+
+def _reference_render() -> bytes:
+    """Эталонная нагрузка: страницы текста стандартным шрифтом, без кода приложения."""
+    buf = BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    for page in range(20):
+        c.setFont("Helvetica", 9)
+        for line in range(80):
+            c.drawString(40, 800 - line * 9.5, f"Reference line {page}-{line}: " + "lorem ipsum " * 6)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def measure(order: dict, runs: int) -> dict:
+    """
+    Медиана времени рендера, отношение к эталону, пиковая память и размер PDF.
+    Эталон и заказ рендерятся поочерёдно: частота CPU и соседние процессы
+    в каждой паре одни и те же, time_ratio - медиана отношений по парам.
+    """
+    pdf_service.build_order_pdf(order)  # прогрев ассетов
+    _reference_render()
+
+    timings, ratios = [], []
+    for _ in range(runs):
+        reference, _ = _timed(_reference_render)
+        elapsed, (data, _) = _timed(pdf_service.build_order_pdf, order)
+        timings.append(elapsed)
+        ratios.append(elapsed / reference)
+
+    # Память меряем отдельным прогоном - tracemalloc искажает время
+    tracemalloc.start()
+    try:
+        pdf_service.build_order_pdf(order)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time_ms": round(statistics.median(timings) * 1000, 2),
+        "time_ratio": round(statistics.median(ratios), 3),
+        "peak_kb": round(peak / 1024, 1),
+        "size_kb": round(len(data) / 1024, 1),
+    }
+
+
+def run_suite(sizes=SIZES, runs: int = 5) -> dict:
+    # Детерминированный вывод ReportLab: стабильный размер PDF между запусками
+    invariant, rl_config.invariant = rl_config.invariant, 1
+    try:
+        return {str(n): measure(make_order(n), runs if n < 1000 else max(1, runs // 2)) for n in sizes}
+    finally:
+        rl_config.invariant = invariant
+
+
+def find_regressions(results: dict, baseline: dict, time_tolerance: float = TIME_TOLERANCE) -> list[str]:
+    """
+    Список регрессий относительно baseline (пустой - всё в норме). Время - только
+    как time_ratio; time_ms в baseline справочный и не сравнивается.
+    """
+    limits = {"time_ratio": time_tolerance, "peak_kb": MEMORY_TOLERANCE, "size_kb": SIZE_TOLERANCE}
+    problems = []
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric, tolerance in limits.items():
+            if metric in base and metric in metrics and metrics[metric] > base[metric] * tolerance:
+                problems.append(
+                    f"{case} items: {metric} {metrics[metric]} > {base[metric]} x {tolerance}"
+                )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--check", action="store_true", help="сравнить с baseline, exit 1 при регрессии")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--optimize-size", action="store_true", help="рендер в режиме PDF_OPTIMIZE_SIZE=1")
+    args = parser.parse_args()
+
+    if args.optimize_size:
+        # Режим читается при первой загрузке ассетов - до первого рендера
+        os.environ["PDF_OPTIMIZE_SIZE"] = "1"
+    if args.baseline is None:
+        args.baseline = OPTIMIZED_BASELINE_PATH if args.optimize_size else BASELINE_PATH
+
+    results = run_suite(args.sizes, args.runs)
+
+    print(f"{'items':>6} {'time, ms':>10} {'x ref':>8} {'peak, KB':>10} {'size, KB':>10}")
+    for case, m in results.items():
+        print(f"{case:>6} {m['time_ms']:>10.1f} {m['time_ratio']:>8.2f} {m['peak_kb']:>10.1f} {m['size_kb']:>10.1f}")
+
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+
+    if args.check:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        problems = find_regressions(results, baseline, args.time_tolerance)
+        if problems:
+            print("Regressions:")
+            for p in problems:
+                print(f"  {p}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
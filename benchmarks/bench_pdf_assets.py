@@ -0,0 +1,62 @@
+# benchmarks/bench_pdf_assets.py
+"""
+Время рендера PDF заказа: холодная загрузка ассетов на каждый документ
+(как было раньше) против шрифтов и бренд-картинки, загруженных один раз.
+
+    python -m benchmarks.bench_pdf_assets --runs 20
+"""
+import argparse
+import time
+
+from app.services import pdf_service
+
+ORDER = {
+    "id": 1,
+    "order_number": 1001,
+    "created_at": "2025-01-01T10:00:00Z",
+    "line_items": [
+        {"title": "Чашка", "quantity": 2, "price": "150",
+         "properties": [{"name": "Ім'я", "value": "Оля"}]},
+        {"title": "Футболка", "quantity": 1, "price": "500"},
+        {"title": "Брелок", "quantity": 3, "price": "50"},
+    ],
+    "shipping_address": {
+        "first_name": "Іван", "last_name": "Петренко", "phone": "+380501234567",
+        "city": "Київ", "address1": "вул. Хрещатик 1",
+    },
+}
+
+
+def _reset_assets() -> None:
+    """Сбрасывает кэш ассетов - эмуляция прежней загрузки на каждый документ."""
+    pdf_service._fonts_ok = None
+    pdf_service._brand = None
+    pdf_service._brand_loaded = False
+
+
+def _measure(runs: int, cold: bool) -> float:
+    total = 0.0
+    for _ in range(runs):
+        if cold:
+            _reset_assets()
+        start = time.perf_counter()
+        pdf_service.build_order_pdf(ORDER)
+        total += time.perf_counter() - start
+    return total / runs
+
+
+def main(runs: int) -> None:
+    cold = _measure(runs, cold=True)
+    pdf_service.warmup_assets()
+    warm = _measure(runs, cold=False)
+    print(f"PDF render, mean of {runs} runs")
+    print(f"  {'assets per document':<22} {cold * 1000:8.1f} ms")
+    print(f"  {'assets loaded once':<22} {warm * 1000:8.1f} ms")
+    print(f"  speedup                {cold / warm:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    main(args.runs)
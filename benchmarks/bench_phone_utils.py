@@ -0,0 +1,66 @@
+# benchmarks/bench_phone_utils.py
+"""
+Нормализация 1M телефонов смешанного формата: прежняя реализация
+(три regex на вызов) против normalize_ua_phone с мемо и normalize_ua_phone_many.
+
+    python -m benchmarks.bench_phone_utils --count 1000000 --unique 50000
+"""
+import argparse
+import random
+import time
+
+from app.services import phone_utils
+from app.services.phone_utils import normalize_ua_phone, normalize_ua_phone_many
+
+_FORMATS = (
+    "+380{op}{n}",             # уже E.164
+    "380{op}{n}",
+    "0{op}{n}",
+    "+38 (0{op}) {a}-{b}-{c}",
+    "0{op} {a} {b} {c}",
+    "00380{op}{n}",
+    "+380{op}{n} доб. 12",
+    "0{op}{n}; +380501112233",
+    "12345",                   # мусор
+)
+
+
+def make_phones(count: int, unique: int, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    pool = []
+    for _ in range(unique):
+        op = rnd.choice(("50", "63", "66", "67", "68", "73", "93", "95", "97", "99"))
+        n = f"{rnd.randrange(10 ** 7):07d}"
+        pool.append(rnd.choice(_FORMATS).format(op=op, n=n, a=n[:3], b=n[3:5], c=n[5:]))
+    return [rnd.choice(pool) for _ in range(count)]
+
+
+def _legacy(phone_raw):
+    """Прежний normalize_ua_phone без fast path и мемо."""
+    if not phone_raw:
+        return None
+    return phone_utils._normalize_slow(phone_raw)
+
+
+def _measure(name: str, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    print(f"  {name:<32} {time.perf_counter() - start:8.2f} s")
+
+
+def main(count: int, unique: int) -> None:
+    phones = make_phones(count, unique)
+    print(f"{count} numbers, {unique} unique")
+    _measure("legacy (3 regex per call)", lambda: [_legacy(p) for p in phones])
+    phone_utils._normalize_cached.cache_clear()
+    _measure("normalize_ua_phone (LRU)", lambda: [normalize_ua_phone(p) for p in phones])
+    phone_utils._normalize_cached.cache_clear()
+    _measure("normalize_ua_phone_many", lambda: normalize_ua_phone_many(phones))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--unique", type=int, default=50_000)
+    args = parser.parse_args()
+    main(args.count, args.unique)
@@ -0,0 +1,28 @@
+# tests/test_bench_pdf.py
+from benchmarks.bench_pdf import find_regressions, make_order, run_suite
+
+
+def test_synthetic_order_is_deterministic():
+    order = make_order(10)
+    assert order == make_order(10)
+    assert len(order["line_items"]) == 10
+    assert all(it["properties"] for it in order["line_items"])
+
+
+def test_find_regressions():
+    baseline = {"10": {"time_ms": 100.0, "time_ratio": 2.0, "peak_kb": 1000.0, "size_kb": 400.0}}
+
+    # Машина медленнее вдвое: мс выросли, отношение к эталону - нет
+    ok = {"10": {"time_ms": 240.0, "time_ratio": 2.4, "peak_kb": 1100.0, "size_kb": 410.0}}
+    assert find_regressions(ok, baseline) == []
+
+    slow = {"10": {"time_ms": 100.0, "time_ratio": 4.0, "peak_kb": 1000.0, "size_kb": 500.0}}
+    problems = find_regressions(slow, baseline)
+    assert len(problems) == 2
+    assert problems[0].startswith("10 items: time_ratio 4.0")
+
+
+def test_run_suite_smoke():
+    results = run_suite(sizes=(1,), runs=1)
+    assert results["1"]["size_kb"] > 0
+    assert results["1"]["time_ratio"] > 0
@@ -0,0 +1,61 @@
+# tests/test_bench_webhook.py
+import base64
+import hashlib
+import hmac
+from collections import Counter
+
+from sqlalchemy import create_engine, text
+
+from app.main import _extract_customer_data_new_logic
+from app.services.shopify_hmac import sign_webhook
+from benchmarks.bench_webhook import StatementCounter, find_regressions, make_webhook, summarize
+
+
+def test_webhook_payload_and_signature():
+    first, second = make_webhook(0, 1000), make_webhook(1, 1000)
+    assert (first["id"], second["id"]) == (1000, 1001)
+    assert first["line_items"] and "line_items" in first  # полный заказ - без запроса к Shopify
+    assert _extract_customer_data_new_logic(first)[2] != _extract_customer_data_new_logic(second)[2]
+
+    body = b'{"id": 1}'
+    expected = base64.b64encode(hmac.new(b"s3cret", body, hashlib.sha256).digest()).decode()
+    assert sign_webhook(body, "s3cret") == expected
+
+
+def test_statement_counter():
+    engine = create_engine("sqlite://")
+    counter = StatementCounter(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+        conn.execute(text("SELECT x FROM t"))
+    counts = counter.snapshot()
+    assert counts["statements"] == 3 and counts["commits"] == 1
+    assert counts["INSERT"] == counts["SELECT"] == 1
+
+
+def test_summarize_matches_deliveries_by_order_number():
+    results = [(100001, 10.0, 200, 0.05), (100002, 10.1, 200, 0.07), (100003, 10.2, 500, 0.5)]
+    calls = [
+        {"method": "sendMessage", "status": 200, "ts": 10.2, "params": {"text": "📦 <b>Замовлення #100001</b>"}},
+        {"method": "sendMessage", "status": 429, "ts": 10.3, "params": {"text": "📦 <b>Замовлення #100003</b>"}},
+    ]
+    summary = summarize(results, calls, Counter(statements=30, commits=9), elapsed=1.0)
+    assert summary["delivered"] == 1
+    assert summary["delivery_lag_ms"]["max"] == 200.0
+    assert summary["latency_ms"]["max"] == 70.0
+    assert summary["db"]["roundtrips_per_order"] == 13.0
+    assert summary["statuses"] == {"200": 2, "500": 1}
+    assert summary["telegram_429"] == 1
+
+
+def test_find_regressions():
+    baseline = {"latency_ms": {"p95": 100.0}, "delivery_lag_ms": {"p95": 200.0},
+                "db": {"roundtrips_per_order": 20.0}, "error_rate": 0.0}
+    ok = {"latency_ms": {"p95": 120.0}, "delivery_lag_ms": {"p95": 210.0},
+          "db": {"roundtrips_per_order": 20.5}, "error_rate": 0.005}
+    assert find_regressions(ok, baseline) == []
+
+    bad = {"latency_ms": {"p95": 200.0}, "delivery_lag_ms": {}, "db": {"roundtrips_per_order": 23.0},
+           "error_rate": 0.1}
+    assert len(find_regressions(bad, baseline)) == 3
@@ -1,7 +1,10 @@
 import asyncio
+import os
+import tempfile
 from unittest.mock import Mock, patch, AsyncMock
 
-from app.bot.routers.commands import on_menu, main_menu_buttons
+from app.bot.routers.commands import on_export_pdf_command, on_export_vcf_command, on_menu, main_menu_buttons
+from app.services.export_service import PdfExport, VcfExport
 
 
 def test_menu_command_sends_two_buttons():
@@ -14,3 +17,37 @@ def test_menu_command_sends_two_buttons():
         assert buttons == main_menu_buttons()
         assert len(buttons) == 2
         assert all(len(row) == 1 for row in buttons)
+
+
+def test_export_pdf_reports_send_failure_and_removes_file():
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    progress = Mock(edit_text=AsyncMock(), delete=AsyncMock())
+    msg = Mock(from_user=Mock(id=1), answer=AsyncMock(return_value=progress),
+               answer_document=AsyncMock(side_effect=RuntimeError("Request timeout error")))
+
+    with patch("app.bot.routers.commands.check_permission", return_value=True), \
+            patch("app.bot.routers.commands.export_pdf",
+                  new_callable=AsyncMock, return_value=PdfExport(path, "orders.pdf", 3, False)):
+        asyncio.run(on_export_pdf_command(msg, Mock(args="paid today")))
+
+    progress.edit_text.assert_awaited_once()
+    assert progress.edit_text.await_args.args[0].startswith("❌")
+    progress.delete.assert_not_awaited()
+    assert not os.path.exists(path)
+
+
+def test_export_vcf_reports_send_failure_and_removes_file():
+    fd, path = tempfile.mkstemp(suffix=".vcf")
+    os.close(fd)
+    msg = Mock(from_user=Mock(id=1), answer=AsyncMock(),
+               answer_document=AsyncMock(side_effect=RuntimeError("Request timeout error")))
+
+    with patch("app.bot.routers.commands.check_permission", return_value=True), \
+            patch("app.bot.routers.commands.export_vcf",
+                  new_callable=AsyncMock, return_value=VcfExport(path, "contacts.vcf", 3)):
+        asyncio.run(on_export_vcf_command(msg, Mock(args="all today")))
+
+    msg.answer.assert_awaited_once()
+    assert msg.answer.await_args.args[0].startswith("❌")
+    assert not os.path.exists(path)
@@ -0,0 +1,133 @@
+# tests/test_crm_sync.py
+import asyncio
+import threading
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import Order, OrderStatus
+from app.services import crm_sync
+from app.services.keycrm_client import KeyCrmQueueTimeout
+
+
+@pytest.fixture
+def Session(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    with Session() as s:
+        s.add_all([
+            Order(id=1, order_number="1001", status=OrderStatus.PAID, raw_json={"id": 1}),
+            Order(id=2, order_number="1002", status=OrderStatus.PAID, raw_json={"id": 2}),
+            Order(id=3, order_number="1003", status=OrderStatus.PAID, raw_json={"id": 3}),
+            Order(id=4, order_number="1004", status=OrderStatus.NEW, raw_json={"id": 4}),
+            Order(id=5, order_number="1005", status=OrderStatus.PAID, raw_json={"id": 5, "_crm_order_id": 9},
+                  crm_synced_at=crm_sync.datetime.now(crm_sync.timezone.utc)),
+        ])
+        s.commit()
+
+    # Одно соединение StaticPool на все потоки executor - сессии по очереди
+    lock = threading.Lock()
+
+    @contextmanager
+    def get_session():
+        with lock, Session() as session:
+            yield session
+
+    monkeypatch.setattr(crm_sync, "get_session", get_session)
+    yield Session
+
+
+class FakeCrm:
+    """keyCRM: заказ 1002 уже существует, 1003 падает с ошибкой."""
+
+    def __init__(self):
+        self.created = []
+        self.next_id = 100
+
+    async def find(self, source_uuid):
+        return {"id": 77, "url": ""} if source_uuid == "1002" else None
+
+    async def create(self, order):
+        if order.order_number == "1003":
+            raise RuntimeError("keyCRM HTTP 422: invalid")
+        self.created.append(order.order_number)
+        self.next_id += 1
+        return {"id": self.next_id, "url": ""}
+
+
+def _run(fake, batch_size=2):
+    with patch("app.services.keycrm_service.find_crm_order_by_source_uuid", fake.find), \
+            patch("app.services.keycrm_service.create_crm_order", fake.create):
+        return asyncio.run(crm_sync.run_crm_sync(batch_size=batch_size))
+
+
+def test_sync_creates_missing_and_links_existing(Session):
+    fake = FakeCrm()
+    result = _run(fake)
+
+    assert result == crm_sync.CrmSyncResult(created=1, existing=1, failed=1)
+    assert fake.created == ["1001"]
+
+    with Session() as s:
+        assert s.get(Order, 1).raw_json["_crm_order_id"] == 101
+        assert s.get(Order, 2).raw_json["_crm_order_id"] == 77
+        failed = s.get(Order, 3)
+        assert failed.crm_synced_at is None
+        assert failed.crm_sync_attempts == 1 and "422" in failed.crm_sync_error
+        assert s.get(Order, 4).crm_synced_at is None  # статус не из CRM_SYNC_STATUSES
+
+
+def test_sync_is_resumable_and_idempotent(Session, monkeypatch):
+    fake = FakeCrm()
+    _run(fake)
+
+    # Повторный проход (как после рестарта) трогает только незавершённые заказы
+    result = _run(fake)
+    assert result == crm_sync.CrmSyncResult(created=0, existing=0, failed=1)
+    assert fake.created == ["1001"]
+
+    monkeypatch.setenv("CRM_SYNC_MAX_ATTEMPTS", "2")
+    assert _run(fake) == crm_sync.CrmSyncResult(0, 0, 0)
+
+
+class BusyCrm(FakeCrm):
+    """keyCRM за длинной очередью: 1003 не дожидается отправки; считает заказы в работе."""
+
+    def __init__(self):
+        super().__init__()
+        self.active = self.max_active = 0
+
+    async def find(self, source_uuid):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if source_uuid == "1003":
+                raise KeyCrmQueueTimeout("keyCRM: запит GET /order не дочекався черги")
+            return None
+        finally:
+            self.active -= 1
+
+
+def test_queue_timeout_is_not_an_attempt_and_concurrency_is_bounded(Session, monkeypatch):
+    monkeypatch.setenv("CRM_SYNC_CONCURRENCY", "2")
+    with Session() as s:
+        s.add_all([Order(id=n, order_number=str(1000 + n), status=OrderStatus.PAID, raw_json={"id": n})
+                   for n in range(6, 12)])
+        s.commit()
+
+    fake = BusyCrm()
+    result = _run(fake, batch_size=10)
+
+    assert result == crm_sync.CrmSyncResult(created=8, existing=0, failed=0, deferred=1)
+    assert fake.max_active == 2
+    with Session() as s:
+        deferred = s.get(Order, 3)
+        assert deferred.crm_sync_attempts == 0 and deferred.crm_sync_error is None
@@ -0,0 +1,91 @@
+# tests/test_customer_service.py
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import Customer, Order, OrderStatus
+from app.services.customer_service import (
+    attach_customer,
+    get_cached_buyer_id,
+    get_customer_orders,
+    remember_crm_buyer_id,
+    upsert_customer,
+)
+
+PHONE = "+380501111111"
+
+
+@pytest.fixture
+def Session():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_session():
+        with Session() as session:
+            yield session
+
+    with patch("app.services.customer_service.get_session", get_session):
+        yield Session
+
+
+def _order(order_id, phone=PHONE, first="Іван", created=None):
+    return Order(
+        id=order_id, order_number=str(1000 + order_id), status=OrderStatus.NEW,
+        customer_first_name=first, customer_last_name="Петренко", customer_phone_e164=phone,
+        raw_json={"email": "ivan@example.com"}, created_at=created or datetime(2025, 3, 15, 8, order_id),
+    )
+
+
+def test_upsert_dedupes_by_phone_and_keeps_known_names(Session):
+    with Session() as s:
+        first = upsert_customer(s, PHONE, "Іван", "Петренко", "ivan@example.com")
+        second = upsert_customer(s, PHONE, "", None, None)
+        third = upsert_customer(s, PHONE, "Іванко", None, None)
+        s.commit()
+
+        assert first == second == third
+        customer = s.get(Customer, first)
+        assert (customer.first_name, customer.last_name, customer.email) == \
+            ("Іванко", "Петренко", "ivan@example.com")
+        assert s.query(Customer).count() == 1
+
+
+def test_attach_customer_links_orders_and_lists_them(Session):
+    with Session() as s:
+        orders = [_order(1), _order(2), _order(3, phone="+380502222222"), _order(4, phone=None)]
+        for order in orders:
+            attach_customer(s, order)
+            s.add(order)
+        s.commit()
+
+        assert orders[0].customer_id == orders[1].customer_id
+        assert orders[2].customer_id != orders[0].customer_id
+        assert orders[3].customer_id is None
+
+        history = get_customer_orders(s, orders[0].customer_id)
+        assert [o.id for o in history] == [2, 1]
+
+
+def test_buyer_id_is_cached_per_customer(Session):
+    with Session() as s:
+        first, repeat = _order(1), _order(2)
+        for order in (first, repeat):
+            attach_customer(s, order)
+            s.add(order)
+        s.commit()
+
+    assert get_cached_buyer_id(repeat) is None
+    remember_crm_buyer_id(first, 777)
+    assert get_cached_buyer_id(repeat) == 777
+
+    # Заказ без привязки (старые записи) - находится по телефону
+    unlinked = _order(5)
+    assert get_cached_buyer_id(unlinked) == 777
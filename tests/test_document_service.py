@@ -0,0 +1,106 @@
+# tests/test_document_service.py
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app.services import pdf_service
+from app.services.document_service import order_content_hash, render_document, DOC_PDF, DOC_VCF
+
+
+def _order(**overrides):
+    data = dict(
+        id=5001,
+        order_number="1694",
+        customer_first_name="Іван",
+        customer_last_name="Петренко",
+        customer_phone_e164="+380672326239",
+        raw_json={"id": 5001, "order_number": 1694, "line_items": [{"title": "Футболка", "quantity": 1, "price": "500"}]},
+    )
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+def test_hash_stable_for_same_content():
+    assert order_content_hash(_order()) == order_content_hash(_order())
+
+
+def test_hash_changes_on_raw_json_or_contact_change():
+    base = order_content_hash(_order())
+    assert order_content_hash(_order(raw_json={"id": 5001, "line_items": []})) != base
+    assert order_content_hash(_order(customer_phone_e164="+380500000000")) != base
+    assert order_content_hash(_order(customer_first_name="Петро")) != base
+
+
+def test_hash_changes_with_template_or_renderer_version(monkeypatch):
+    base = order_content_hash(_order())
+
+    monkeypatch.setenv("PDF_TEMPLATE", "other-shop")
+    assert order_content_hash(_order()) != base
+    monkeypatch.delenv("PDF_TEMPLATE")
+
+    monkeypatch.setenv("PDF_OPTIMIZE_SIZE", "1")
+    assert order_content_hash(_order()) != base
+    monkeypatch.delenv("PDF_OPTIMIZE_SIZE")
+
+    plan = pdf_service.get_layout_plan(pdf_service._register_fonts())
+    monkeypatch.setattr(pdf_service, "get_layout_plan", lambda *args: plan._replace(title_text="Рахунок"))
+    assert order_content_hash(_order()) != base
+    monkeypatch.undo()
+
+    monkeypatch.setattr(pdf_service, "RENDERER_VERSION", pdf_service.RENDERER_VERSION + 1)
+    pdf_service._plan_fingerprint.cache_clear()
+    try:
+        assert order_content_hash(_order()) != base
+    finally:
+        monkeypatch.undo()
+        pdf_service._plan_fingerprint.cache_clear()
+    assert order_content_hash(_order()) == base
+
+
+def test_render_document_types():
+    order = _order()
+    vcf_bytes, vcf_name = render_document(order, DOC_VCF)
+    assert vcf_name == "contact_#1694.vcf"
+    assert b"TEL;TYPE=CELL:+380672326239" in vcf_bytes
+
+    pdf_bytes, pdf_name = render_document(order, DOC_PDF)
+    assert pdf_name == "order_#1694.pdf"
+    assert pdf_bytes.startswith(b"%PDF")
+
+
+def test_send_order_document_uses_file_id_without_upload():
+    import asyncio
+    from unittest.mock import AsyncMock, patch
+    from app.services.document_service import CachedDocument
+    from app.bot.routers.orders import send_order_document
+
+    bot = SimpleNamespace(send_document=AsyncMock(return_value=SimpleNamespace(message_id=7, document=None)))
+    cached = CachedDocument(None, "order_#1694.pdf", "h1", "FILE_ID")
+
+    with patch("app.bot.routers.orders.get_order_document", new=AsyncMock(return_value=cached)), \
+         patch("app.bot.routers.orders.remember_file_id", new=AsyncMock()) as remember_mock:
+        msg = asyncio.run(send_order_document(bot, 1, 5001, DOC_PDF, "caption"))
+
+    assert msg.message_id == 7
+    assert bot.send_document.await_args.kwargs["document"] == "FILE_ID"
+    remember_mock.assert_not_awaited()
+
+
+def test_send_order_document_uploads_and_remembers_file_id():
+    import asyncio
+    from unittest.mock import AsyncMock, patch
+    from aiogram.types import BufferedInputFile
+    from app.services.document_service import CachedDocument
+    from app.bot.routers.orders import send_order_document
+
+    sent = SimpleNamespace(message_id=8, document=SimpleNamespace(file_id="NEW_ID"))
+    bot = SimpleNamespace(send_document=AsyncMock(return_value=sent))
+    cached = CachedDocument(b"BEGIN:VCARD", "contact_#1694.vcf", "h2", None)
+
+    with patch("app.bot.routers.orders.get_order_document", new=AsyncMock(return_value=cached)), \
+         patch("app.bot.routers.orders.remember_file_id", new=AsyncMock()) as remember_mock:
+        asyncio.run(send_order_document(bot, 1, 5001, DOC_VCF, "caption"))
+
+    assert isinstance(bot.send_document.await_args.kwargs["document"], BufferedInputFile)
+    remember_mock.assert_awaited_once_with(5001, DOC_VCF, "h2", "NEW_ID")
@@ -0,0 +1,156 @@
+# tests/test_export_service.py
+from datetime import date
+from io import BytesIO
+
+import pytest
+
+from app.main import app
+from app.models import OrderStatus
+from app.services.export_service import parse_export_filter
+from app.services.pdf_service import build_orders_pdf
+from tests.test_metrics import _asgi_get
+
+TODAY = date(2025, 3, 15)
+
+
+def test_parse_defaults_to_paid_today():
+    flt = parse_export_filter("", today=TODAY)
+    assert flt.status == OrderStatus.PAID
+    assert (flt.date_from, flt.date_to) == (TODAY, TODAY)
+
+
+@pytest.mark.parametrize("args, status, date_from, date_to", [
+    ("paid today", OrderStatus.PAID, TODAY, TODAY),
+    ("yesterday waiting", OrderStatus.WAITING_PAYMENT, date(2025, 3, 14), date(2025, 3, 14)),
+    ("all week", None, date(2025, 3, 9), TODAY),
+    ("2025-01-31", OrderStatus.PAID, date(2025, 1, 31), date(2025, 1, 31)),
+    ("new 2025-01-01..2025-01-31", OrderStatus.NEW, date(2025, 1, 1), date(2025, 1, 31)),
+])
+def test_parse_filter(args, status, date_from, date_to):
+    flt = parse_export_filter(args, today=TODAY)
+    assert flt == (status, date_from, date_to)
+
+
+@pytest.mark.parametrize("args", ["paid tomorrow", "2025-02-01..2025-01-01"])
+def test_parse_filter_rejects_invalid(args):
+    with pytest.raises(ValueError):
+        parse_export_filter(args, today=TODAY)
+
+
+def test_build_orders_pdf_one_group_per_order():
+    orders = (
+        {"id": i, "order_number": 2000 + i, "line_items": [{"title": "Чашка", "quantity": 1, "price": "150"}]}
+        for i in range(3)
+    )
+    out = BytesIO()
+    assert build_orders_pdf(orders, out) == 3
+
+    data = out.getvalue()
+    assert data.startswith(b"%PDF")
+    assert data.count(b"/Type /Page\n") == 3
+    assert b"/Outlines" in data
+
+
+# ---------- vCard ----------
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import Order
+from app.services.export_service import ExportFilter, iter_contacts_vcf
+
+
+@pytest.fixture
+def contacts_db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    with Session() as s:
+        s.add_all([
+            Order(id=1, order_number="1001", status=OrderStatus.NEW, customer_first_name="Іван",
+                  customer_last_name="Петренко", customer_phone_e164="+380501111111",
+                  created_at=datetime(2025, 3, 15, 8, 0)),
+            Order(id=2, order_number="1002", status=OrderStatus.PAID, customer_first_name="Оля",
+                  customer_phone_e164="+380502222222", created_at=datetime(2025, 3, 15, 9, 0)),
+            Order(id=3, order_number="1003", status=OrderStatus.NEW, customer_first_name="Без телефону",
+                  created_at=datetime(2025, 3, 15, 10, 0)),
+            Order(id=4, order_number="1004", status=OrderStatus.NEW, customer_first_name="Вчора",
+                  customer_phone_e164="+380504444444", created_at=datetime(2025, 3, 14, 10, 0)),
+        ])
+        s.commit()
+
+    @contextmanager
+    def get_session():
+        with Session() as session:
+            yield session
+
+    with patch("app.services.export_service.get_session", get_session):
+        yield
+
+
+def test_iter_contacts_vcf_filters_and_streams(contacts_db):
+    data = b"".join(iter_contacts_vcf(ExportFilter(None, TODAY, TODAY)))
+    assert data.count(b"BEGIN:VCARD") == 2
+    assert b"+380501111111" in data and b"+380502222222" in data
+
+    new_only = b"".join(iter_contacts_vcf(ExportFilter(OrderStatus.NEW, TODAY, TODAY)))
+    assert new_only.count(b"BEGIN:VCARD") == 1
+
+
+def test_iter_contacts_vcf_yields_in_chunks(contacts_db):
+    chunks = list(iter_contacts_vcf(ExportFilter(None, date(2025, 3, 14), TODAY), chunk_bytes=1))
+    assert len(chunks) == 3
+    assert all(chunk.startswith(b"BEGIN:VCARD") for chunk in chunks)
+
+
+def test_export_endpoint_requires_bearer_token(monkeypatch):
+    monkeypatch.delenv("EXPORT_API_TOKEN", raising=False)
+    assert _asgi_get(app, "/export/contacts.vcf")[0] == 404
+    monkeypatch.setenv("EXPORT_API_TOKEN", "s3cret")
+    assert _asgi_get(app, "/export/contacts.vcf")[0] == 401
+    assert _asgi_get(app, "/export/contacts.vcf", [("Authorization", "Bearer other")])[0] == 401
+
+
+# ---------- PDF export cleanup ----------
+import asyncio
+import os
+import time
+
+from app.services.export_service import export_pdf
+from app.services.pdf_renderer import PdfRenderer, PdfRenderTimeout
+
+
+def test_export_pdf_timeout_removes_file_after_worker_finishes():
+    renderer = PdfRenderer(backend="thread", workers=1)
+    written = []
+
+    def slow_export(order_ids, path, title):
+        time.sleep(0.2)
+        with open(path, "wb") as f:
+            f.write(b"%PDF")
+        written.append(path)
+        return len(order_ids)
+
+    async def run():
+        with pytest.raises(PdfRenderTimeout):
+            await export_pdf(ExportFilter(None, TODAY, TODAY))
+        while renderer.pending:
+            await asyncio.sleep(0.02)
+
+    with patch("app.services.export_service.select_order_ids", return_value=[1, 2]), \
+            patch("app.services.export_service.export_orders_pdf", slow_export), \
+            patch("app.services.export_service.get_export_timeout", return_value=0.05), \
+            patch("app.services.pdf_renderer.get_pdf_renderer", return_value=renderer):
+        try:
+            asyncio.run(run())
+        finally:
+            renderer.shutdown()
+
+    assert len(written) == 1
+    assert not os.path.exists(written[0])
@@ -0,0 +1,93 @@
+# tests/test_fake_keycrm.py
+import asyncio
+import time
+
+import pytest
+
+from app.services.keycrm_client import KeyCrmClient, KeyCrmError, TokenBucket
+from tools.fake_keycrm import FakeKeyCrmConfig, FixedWindowLimiter, create_app, load_spec, validate_body
+from tools.stub_server import serve_in_thread
+
+
+@pytest.fixture
+def fake_crm():
+    servers = []
+
+    def start(**config):
+        app = create_app(FakeKeyCrmConfig(**config))
+        server = serve_in_thread(app)
+        servers.append(server)
+        return app.state.fake, f"{server.url}/v1"
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_request_bodies_validated_against_spec():
+    spec = load_spec()
+    assert validate_body({"full_name": "Іван", "phone": ["+380501111111"]}, spec.create_buyer) == {}
+    assert "full_name" in validate_body({"phone": ["+380501111111"]}, spec.create_buyer)
+    assert "phone.0" in validate_body({"full_name": "Іван", "phone": [380501111111]}, spec.create_buyer)
+
+    errors = validate_body({"source_id": "2", "buyer": {"full_name": 1}}, spec.create_order)
+    assert set(errors) == {"source_id", "buyer.full_name"}
+
+
+def test_fixed_window_limiter():
+    limiter = FixedWindowLimiter(limit=2, window=10)
+    assert limiter.hit("k", 0) is None
+    assert limiter.hit("k", 1) is None
+    assert limiter.hit("k", 2) == pytest.approx(8)
+    assert limiter.hit("other", 2) is None
+    assert limiter.hit("k", 10) is None
+
+
+def test_buyer_and_order_roundtrip(fake_crm):
+    state, base_url = fake_crm()
+
+    async def scenario():
+        client = KeyCrmClient(base_url, "key", rate_per_minute=600)
+        try:
+            buyer = await client.post("/buyer", json={"full_name": "Іван", "phone": ["+380501111111"]})
+            found = await client.get("/buyer", params={"filter[buyer_phone]": "380501111111", "limit": 1})
+            assert found["data"][0]["id"] == buyer["id"]
+
+            order = await client.post("/order", json={
+                "source_id": 2, "source_uuid": "1001",
+                "buyer": {"full_name": "Іван", "phone": "+380501111111"},
+            })
+            assert order["buyer_id"] == buyer["id"]
+            listed = await client.get("/order", params={"filter[source_uuid]": "1001", "filter[source_id]": 2})
+            assert [o["id"] for o in listed["data"]] == [order["id"]]
+
+            with pytest.raises(KeyCrmError) as err:
+                await client.post("/order", json={"source_uuid": "1002"})
+            assert err.value.status == 422
+        finally:
+            await client.close()
+
+    asyncio.run(scenario())
+    assert state.stats["orders_created"] == 1
+
+
+def test_client_stays_under_limit_and_recovers_from_429(fake_crm):
+    state, base_url = fake_crm(rate_limit=5, window=1.0)
+
+    async def scenario(client, n):
+        try:
+            return await asyncio.gather(*(client.get("/order") for _ in range(n)))
+        finally:
+            await client.close()
+
+    started = time.monotonic()
+    results = asyncio.run(scenario(KeyCrmClient(base_url, "key", rate_per_minute=5, window=1.0), 12))
+    assert len(results) == 12
+    assert state.stats["rate_limited"] == 0
+    assert time.monotonic() - started >= 1.5  # 12 запросов при 5/с - минимум два полных окна
+
+    # Клиент, не знающий лимита: получает 429 и дожидается окна по Retry-After
+    greedy = KeyCrmClient(base_url, "other-key", rate_per_minute=600)
+    greedy.bucket = TokenBucket(capacity=100, rate=100)
+    assert len(asyncio.run(scenario(greedy, 8))) == 8
+    assert state.stats["rate_limited"] > 0
@@ -0,0 +1,80 @@
+# tests/test_fake_telegram.py
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup
+
+from tools.fake_telegram import FAKE_STATE, FakeTelegramConfig, create_app
+from tools.stub_server import serve_in_thread
+
+TOKEN = "123456:TEST-token"
+CHAT = 555
+
+
+@pytest.fixture
+def fake_tg():
+    servers = []
+
+    def start(**config):
+        app = create_app(FakeTelegramConfig(**config))
+        server = serve_in_thread(app)
+        servers.append(server)
+        return app[FAKE_STATE], server.url
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+async def _with_bot(url, scenario):
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    try:
+        return await scenario(bot)
+    finally:
+        await bot.session.close()
+
+
+def test_bot_roundtrip_records_calls(fake_tg):
+    state, url = fake_tg(chat_burst=10)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="PDF", callback_data="order:1:pdf")]])
+
+    async def scenario(bot):
+        msg = await bot.send_message(CHAT, "Замовлення #1001", reply_markup=keyboard)
+        with pytest.raises(TelegramBadRequest, match="not modified"):
+            await bot.edit_message_text("Замовлення #1001", chat_id=CHAT, message_id=msg.message_id,
+                                        reply_markup=keyboard)
+        await bot.edit_message_text("Замовлення #1001 ✅", chat_id=CHAT, message_id=msg.message_id)
+
+        doc = await bot.send_document(CHAT, BufferedInputFile(b"%PDF-1.4", filename="order_1001.pdf"))
+        assert doc.document.file_name == "order_1001.pdf" and doc.document.file_size == 8
+        again = await bot.send_document(CHAT, doc.document.file_id)
+        assert again.document.file_id == doc.document.file_id
+
+        assert await bot.delete_message(CHAT, msg.message_id)
+        with pytest.raises(TelegramBadRequest, match="not found"):
+            await bot.delete_message(CHAT, msg.message_id)
+
+    asyncio.run(_with_bot(url, scenario))
+    methods = [c["method"] for c in state.calls]
+    assert methods == ["sendMessage", "editMessageText", "editMessageText", "sendDocument", "sendDocument",
+                       "deleteMessage", "deleteMessage"]
+    assert state.calls[0]["params"]["reply_markup"]["inline_keyboard"][0][0]["text"] == "PDF"
+
+
+def test_per_chat_rate_limit_returns_retry_after(fake_tg):
+    state, url = fake_tg(chat_burst=2, chat_rate=1.0)
+
+    async def scenario(bot):
+        await bot.send_message(CHAT, "1")
+        await bot.send_message(CHAT, "2")
+        with pytest.raises(TelegramRetryAfter) as err:
+            await bot.send_message(CHAT, "3")
+        assert err.value.retry_after >= 1
+        await bot.send_message(CHAT + 1, "інший чат")  # лимит - на чат
+
+    asyncio.run(_with_bot(url, scenario))
+    assert state.stats["rate_limited"] == 1
@@ -0,0 +1,152 @@
+# tests/test_keycrm_client.py
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.keycrm_client import (
+    KeyCrmClient, KeyCrmError, KeyCrmQueueTimeout, TokenBucket, background_requests,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=2, rate=1.0, clock=clock)
+
+    bucket.take()
+    bucket.take()
+    assert bucket.delay() == pytest.approx(1.0)
+
+    clock.now = 0.5
+    assert bucket.delay() == pytest.approx(0.5)
+
+    clock.now = 10.0
+    assert bucket.delay() == 0  # запас не больше ёмкости
+    bucket.take()
+    bucket.take()
+    assert bucket.delay() > 0
+
+
+def test_token_bucket_pause_after_429():
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=60, rate=1.0, clock=clock)
+    bucket.pause(5)
+    assert bucket.delay() == pytest.approx(5.0)
+    clock.now = 5.0
+    assert bucket.delay() == pytest.approx(0.0)
+
+
+async def _run_with_server(handler, scenario):
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    client = KeyCrmClient(str(server.make_url("")), "key", rate_per_minute=600)
+    try:
+        return await scenario(client)
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_requests_are_sent_in_fifo_order():
+    seen = []
+
+    async def handler(request):
+        seen.append(int(request.query["n"]))
+        return web.json_response({"n": int(request.query["n"])})
+
+    async def scenario(client):
+        client.bucket = TokenBucket(capacity=1, rate=50.0)  # всплеск выше лимита ждёт в очереди
+        return await asyncio.gather(*(client.get("/buyer", params={"n": n}) for n in range(5)))
+
+    results = asyncio.run(_run_with_server(handler, scenario))
+    assert [r["n"] for r in results] == list(range(5))
+    assert seen == list(range(5))
+
+
+def test_429_is_retried_after_retry_after():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path)
+        if len(calls) == 1:
+            return web.json_response({"message": "Too Many Attempts."}, status=429,
+                                     headers={"Retry-After": "0.05"})
+        return web.json_response({"id": 42})
+
+    result = asyncio.run(_run_with_server(handler, lambda client: client.post("/order", json={})))
+    assert result == {"id": 42}
+    assert len(calls) == 2
+
+
+def test_http_error_and_deadline():
+    async def handler(request):
+        return web.json_response({"message": "invalid"}, status=422)
+
+    async def scenario(client):
+        with pytest.raises(KeyCrmError) as err:
+            await client.post("/buyer", json={})
+        assert err.value.status == 422
+
+        # Токенов нет, а дедлайн раньше пополнения - запрос не уходит
+        client.bucket = TokenBucket(capacity=1, rate=0.01)
+        client.bucket.take()
+        with pytest.raises(KeyCrmQueueTimeout):
+            await client.get("/buyer", timeout=1)
+
+    asyncio.run(_run_with_server(handler, scenario))
+
+
+def test_deadline_applies_behind_the_head_of_queue():
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return web.json_response({"ok": True})
+
+    async def scenario(client):
+        # Уже отправленный запрос дедлайном не обрывается
+        assert await client.get("/buyer", timeout=0.1) == {"ok": True}
+
+        client.bucket = TokenBucket(capacity=1, rate=2.0)
+        head = asyncio.ensure_future(client.get("/buyer", timeout=5))
+        second = asyncio.ensure_future(client.get("/buyer", timeout=5))  # ждёт токен ~0.5 с
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with pytest.raises(KeyCrmQueueTimeout):
+            await client.get("/buyer", timeout=0.1)  # третий в очереди
+        assert loop.time() - started < 0.3
+        assert await head == {"ok": True}
+        assert await second == {"ok": True}
+        assert client.pending == 0
+
+    asyncio.run(_run_with_server(handler, scenario))
+
+
+def test_interactive_requests_go_before_background():
+    seen = []
+
+    async def handler(request):
+        seen.append(request.query["n"])
+        return web.json_response({})
+
+    async def scenario(client):
+        client.bucket = TokenBucket(capacity=1, rate=50.0)
+        with background_requests():
+            sync = [asyncio.ensure_future(client.get("/order", params={"n": f"bg{n}"})) for n in range(3)]
+        await asyncio.sleep(0)
+        await client.get("/order", params={"n": "ui"})
+        await asyncio.gather(*sync)
+
+    asyncio.run(_run_with_server(handler, scenario))
+    # Интерактивный поставлен последним, но ушёл раньше фоновых
+    assert seen == ["ui", "bg0", "bg1", "bg2"]
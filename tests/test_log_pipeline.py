@@ -0,0 +1,125 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from app.bot.routers.shared.utils import debug_print
+from app.services import log_pipeline
+from app.services.log_pipeline import (
+    EventMessage, JsonFormatter, NonBlockingQueueHandler, SamplingFilter, dumps, set_level, set_sample_rate,
+)
+from app.services.metrics import LOG_RECORDS_DROPPED
+
+
+def _record(msg, *args, name="app.test", level=logging.INFO, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full():
+    records = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(records)
+    items = ["a"]
+    handler.handle(_record("items=%s", items))
+    items.append("b")  # изменение после вызова не попадает в запись
+    event = EventMessage({"event": "webhook_processed"})
+    dropped = LOG_RECORDS_DROPPED._children[()].value
+    handler.handle(_record(event))
+
+    assert records.get_nowait().msg == "items=['a']"
+    assert LOG_RECORDS_DROPPED._children[()].value == dropped + 1
+
+    handler.handle(_record(event))
+    assert records.get_nowait().msg is event  # JSON ещё не собран
+
+
+def test_sampling_by_event_and_logger_name(monkeypatch):
+    sampler = SamplingFilter({"webhook_duplicate": 0.0, "app.bot.debug": 0.0})
+    assert not sampler.filter(_record("x", event="webhook_duplicate"))
+    assert sampler.filter(_record("x", event="webhook_processed"))
+    assert not sampler.filter(_record("x", name="app.bot.debug"))
+    assert sampler.filter(_record("x", name="app.bot.debug", level=logging.WARNING))
+
+    monkeypatch.setattr(log_pipeline, "_sampler", SamplingFilter())
+    set_sample_rate("callback", 0.5)
+    assert log_pipeline._sampler.rates == {"callback": 0.5}
+    set_sample_rate("callback", 1)
+    assert log_pipeline._sampler.rates == {}
+    with pytest.raises(ValueError):
+        set_sample_rate("callback", -1)
+
+
+def test_json_formatter_flattens_events():
+    formatter = JsonFormatter()
+    entry = json.loads(formatter.format(_record(EventMessage({"event": "order_data_ok", "order_id": "1"}))))
+    assert entry["event"] == "order_data_ok" and entry["order_id"] == "1"
+    assert entry["level"] == "INFO" and entry["logger"] == "app.test"
+
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        record = logging.LogRecord("app.test", logging.ERROR, __file__, 1, "failed %s", ("Ж",),
+                                   sys.exc_info())
+    entry = json.loads(formatter.format(record))
+    assert entry["message"] == "failed Ж"
+    assert "ValueError: bad" in entry["exc"]
+    assert dumps({"n": 2 ** 70, 1: "x"}) == '{"n":1180591620717411303424,"1":"x"}'
+
+
+def test_debug_print_is_gated_by_level(caplog):
+    debug_logger = logging.getLogger("app.bot.debug")
+    with caplog.at_level(logging.INFO):
+        debug_print("callback received")
+        debug_print("no allowed users", "WARN")
+    assert [(r.name, r.levelname, r.getMessage()) for r in caplog.records] == [
+        ("app.bot.debug", "WARNING", "no allowed users"),
+    ]
+
+    caplog.clear()
+    set_level("app.bot.debug", "debug")
+    try:
+        with caplog.at_level(logging.DEBUG):
+            debug_print("callback received")
+        assert caplog.records[0].levelname == "DEBUG"
+        assert caplog.records[0].funcName == "test_debug_print_is_gated_by_level"
+    finally:
+        debug_logger.setLevel(logging.NOTSET)
+    with pytest.raises(ValueError):
+        set_level("app.bot.debug", "LOUD")
+
+
+def test_logging_state_reports_levels():
+    logging.getLogger("app.services.keycrm_client").setLevel(logging.WARNING)
+    try:
+        state = log_pipeline.logging_state()
+        assert state["levels"]["app.services.keycrm_client"] == "WARNING"
+        assert "root" in state["levels"]
+    finally:
+        logging.getLogger("app.services.keycrm_client").setLevel(logging.NOTSET)
+
+
+def test_setup_logging_falls_back_to_info_on_bad_levels(monkeypatch, caplog):
+    root = logging.getLogger()
+    root_level = root.level
+    monkeypatch.setattr(log_pipeline, "_handler", None)
+    monkeypatch.setattr(log_pipeline, "_listener", None)
+    monkeypatch.setenv("LOG_LEVEL", "INFOO")
+    monkeypatch.setenv("LOG_LEVELS", "app.services.keycrm_client=LOUD,app.bot.debug=DEBUG")
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.services.log_pipeline"):
+            log_pipeline.setup_logging()
+        assert root.level == logging.INFO
+        assert logging.getLogger("app.services.keycrm_client").level == logging.INFO
+        assert logging.getLogger("app.bot.debug").level == logging.DEBUG
+        assert "Invalid LOG_LEVEL INFOO" in caplog.text and "LOUD" in caplog.text
+    finally:
+        atexit.unregister(log_pipeline._listener.stop)
+        log_pipeline._listener.stop()
+        root.removeHandler(log_pipeline._handler)
+        root.setLevel(root_level)
+        for name in ("app.services.keycrm_client", "app.bot.debug"):
+            logging.getLogger(name).setLevel(logging.NOTSET)
@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from app.services.loop_watchdog import LoopWatchdog
+from app.services.metrics import EVENT_LOOP_LAG_SECONDS
+
+
+def blocking_shopify_call():
+    time.sleep(0.3)
+
+
+def test_stall_is_detected_with_stack_of_blocking_code(caplog):
+    lag_count = EVENT_LOOP_LAG_SECONDS._children[()].count
+    watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+
+    async def handler():
+        blocking_shopify_call()
+
+    async def main():
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        await asyncio.create_task(handler(), name="webhook-handler")
+        await asyncio.sleep(0.1)
+        await watchdog.stop()
+
+    with caplog.at_level("WARNING", logger="app.services.loop_watchdog"):
+        asyncio.run(main())
+
+    # Одна остановка - один отчёт, хотя наблюдатель проверял много раз
+    assert watchdog.stalls == 1
+    stall = watchdog.last_stall
+    assert stall.task == "webhook-handler"
+    assert "blocking_shopify_call" in stall.stack
+    assert stall.stack.rstrip().endswith("time.sleep(0.3)")
+    assert "Event loop unblocked after" in caplog.text
+    assert EVENT_LOOP_LAG_SECONDS._children[()].count > lag_count
+
+
+def test_idle_loop_has_no_stalls():
+    watchdog = LoopWatchdog(threshold=0.2, interval=0.02)
+
+    async def main():
+        watchdog.start()
+        await asyncio.sleep(0.3)
+        await watchdog.stop()
+
+    asyncio.run(main())
+    assert watchdog.stalls == 0
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("LOOP_WATCHDOG", "0")
+    assert LoopWatchdog.from_env() is None
+    monkeypatch.setenv("LOOP_WATCHDOG", "1")
+    monkeypatch.setenv("LOOP_WATCHDOG_THRESHOLD_MS", "500")
+    watchdog = LoopWatchdog.from_env()
+    assert watchdog.threshold == 0.5 and watchdog.interval == 0.1
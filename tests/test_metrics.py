@@ -0,0 +1,101 @@
+# tests/test_metrics.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.bot.middlewares import CallbackMetricsMiddleware
+from app.services import metrics
+from app.services.metrics import Counter, Histogram, Registry, job_timer
+
+
+def _asgi_get(app, path, headers=()):
+    """Минимальный ASGI-клиент (httpx в зависимостях нет)."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+             "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+    asyncio.run(app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body.decode()
+
+
+def test_histogram_exposition_format():
+    registry = Registry()
+    h = registry.register(Histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0)))
+    h.labels("hmac").observe(0.05)
+    h.labels("hmac").observe(0.5)
+    h.labels("hmac").observe(5)
+    with h.labels('we"ird').time():
+        pass
+    registry.register(Counter("events_total", "Events")).inc(3)
+
+    text = registry.render()
+    assert '# TYPE stage_seconds histogram' in text
+    assert 'stage_seconds_bucket{stage="hmac",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="hmac",le="1"} 2' in text
+    assert 'stage_seconds_bucket{stage="hmac",le="+Inf"} 3' in text
+    assert 'stage_seconds_sum{stage="hmac"} 5.55' in text
+    assert 'stage_seconds_count{stage="hmac"} 3' in text
+    assert 'stage_seconds_count{stage="we\\"ird"} 1' in text
+    assert "events_total 3" in text
+
+    with pytest.raises(ValueError):
+        registry.register(Counter("events_total", "dup"))
+
+
+def test_label_sets_are_capped(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_LABEL_SETS", 2)
+    h = Histogram("capped_seconds", "Capped", ("route",))
+    h.labels("a").observe(1)
+    h.labels("b").observe(1)
+    assert h.labels("c") is h.labels("d") is h.labels("other")
+
+
+def test_job_timer_and_callback_middleware_record_results():
+    async def ok_job():
+        return 42
+
+    async def failing_job():
+        raise RuntimeError("boom")
+
+    async def on_order_view(event, data):
+        return "handled"
+
+    async def scenario():
+        assert await job_timer("test_ok", ok_job)() == 42
+        with pytest.raises(RuntimeError):
+            await job_timer("test_fail", failing_job)()
+        data = {"handler": SimpleNamespace(callback=on_order_view)}
+        assert await CallbackMetricsMiddleware()(on_order_view, object(), data) == "handled"
+
+    asyncio.run(scenario())
+    assert metrics.SCHEDULER_JOB_SECONDS.labels("test_ok", "ok").count == 1
+    assert metrics.SCHEDULER_JOB_SECONDS.labels("test_fail", "error").count == 1
+    assert metrics.CALLBACK_HANDLER_SECONDS.labels("test_metrics.on_order_view", "ok").count == 1
+
+
+def test_metrics_endpoint(monkeypatch):
+    from app.main import app
+
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    _asgi_get(app, "/health")
+    status, text = _asgi_get(app, "/metrics")
+    assert status == 200
+    assert 'http_request_duration_seconds_count{route="/health",method="GET",status="200"}' in text
+    assert "# TYPE webhook_stage_duration_seconds histogram" in text
+    assert 'outbound_queue_depth{queue="keycrm"}' in text
+    assert 'route="/metrics"' not in text  # сам scrape не считается
+
+    monkeypatch.setenv("METRICS_TOKEN", "t0ken")
+    assert _asgi_get(app, "/metrics")[0] == 401
+    assert _asgi_get(app, "/metrics", [("Authorization", "Bearer t0ken")])[0] == 200
@@ -2,7 +2,10 @@ import os
 import sys
 import types
 import asyncio
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
 
 
 # Ensure environment configuration for import
@@ -17,7 +20,9 @@ fake_bot_main.stop_bot = lambda: None
 fake_bot_main.get_bot = lambda: None
 sys.modules.setdefault("app.bot.main", fake_bot_main)
 
+from app.bot.routers.orders import send_order_document
 from app.main import telegram_webhook
+from app.services.document_service import CachedDocument
 from app.services.menu_ui import orders_list_buttons, order_card_buttons
 
 
@@ -100,3 +105,12 @@ def test_order_card_buttons_structure():
     ]
     assert buttons[1] == [{"text": "Назад", "callback_data": "orders:list:pending:offset=0"}]
     assert buttons[2] == [{"text": "🏠 Главное меню", "callback_data": "menu:main"}]
+
+
+def test_send_order_document_stale_file_id_and_deleted_order():
+    cached = CachedDocument(None, "order_1001.pdf", "hash", "stale-file-id")
+    bot = MagicMock(send_document=AsyncMock(side_effect=TelegramBadRequest(MagicMock(), "wrong file identifier")))
+    with patch("app.bot.routers.orders.get_order_document", AsyncMock(side_effect=[cached, None])):
+        with pytest.raises(ValueError, match="Дані замовлення не знайдено"):
+            asyncio.run(send_order_document(bot, 1, 1001, "pdf", "caption"))
+    bot.send_document.assert_awaited_once()
@@ -0,0 +1,54 @@
+# tests/test_payment_sender.py
+import asyncio
+from types import SimpleNamespace
+
+from app.bot.services.payment_sender import build_payment_messages, send_ordered, PAYMENT_CHOICE_TEXT
+
+REQ = {"recipient": "ФОП Тест", "iban": "UA000", "edrpou": "123", "purpose": "Оплата"}
+
+
+class FakeBot:
+    """Bot API с "задержкой", обратной порядку отправки - проверяем, что порядок сохраняется."""
+
+    def __init__(self):
+        self.sent = []
+        self._next_id = 100
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(0.001 * (5 - len(self.sent) % 5))
+        self._next_id += 1
+        self.sent.append(text)
+        return SimpleNamespace(message_id=self._next_id)
+
+
+def test_build_messages_separate():
+    msgs = build_payment_messages("800", "грн", requisites=REQ, collapse_copy=False)
+    assert len(msgs) == 6
+    assert "800 грн" in msgs[0]
+    assert "<b>ФОП Тест</b>" in msgs[0]
+    assert msgs[1:5] == ["<code>ФОП Тест</code>", "<code>UA000</code>", "<code>123</code>", "<code>Оплата</code>"]
+    assert msgs[-1] == PAYMENT_CHOICE_TEXT
+
+
+def test_build_messages_collapsed():
+    msgs = build_payment_messages("800", "грн", requisites=REQ, collapse_copy=True)
+    assert len(msgs) == 3
+    assert msgs[1] == "<code>ФОП Тест</code>\n<code>UA000</code>\n<code>123</code>\n<code>Оплата</code>"
+
+
+def test_build_messages_escapes_requisites():
+    req = dict(REQ, recipient="ТОВ <Ромашка> & Ко")
+    msgs = build_payment_messages("800", "грн", requisites=req, collapse_copy=False)
+    assert "<b>ТОВ &lt;Ромашка&gt; &amp; Ко</b>" in msgs[0]
+    assert msgs[1] == "<code>ТОВ &lt;Ромашка&gt; &amp; Ко</code>"
+
+
+def test_send_ordered_keeps_order_and_tracks():
+    bot = FakeBot()
+    tracked = []
+    texts = build_payment_messages("800", "грн", requisites=REQ, collapse_copy=False)
+
+    ids = asyncio.run(send_ordered(bot, 1, texts, on_sent=tracked.append))
+
+    assert bot.sent == texts
+    assert ids == tracked == list(range(101, 107))
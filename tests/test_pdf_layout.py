@@ -0,0 +1,53 @@
+# tests/test_pdf_layout.py
+from io import BytesIO
+
+from reportlab.lib.units import mm
+
+from app.services import pdf_layout
+from app.services.pdf_layout import compile_template, get_layout_plan, load_template
+from app.services.pdf_service import build_orders_pdf
+
+ORDER = {"id": 1, "order_number": 1001, "line_items": [{"title": "Чашка", "quantity": 2, "price": "150"}]}
+
+
+def test_default_plan_matches_template():
+    plan = compile_template(load_template(), has_fonts=False)
+    assert plan.x0 == 20 * mm
+    assert plan.col_qty_x == plan.x0 + 112 * mm
+    assert plan.name_width == (plan.col_qty_x - 3 * mm) - plan.col_name_x
+    # Правые колонки шапки уже сдвинуты на ширину подписи
+    assert [label for _, label in plan.table_header_cells] == ["Назва", "К-ть", "Ціна", "Сума"]
+    assert plan.table_header_cells[1][0] < plan.col_qty_x
+
+
+def test_store_template_overrides_default(tmp_path, monkeypatch):
+    default = (pdf_layout.TEMPLATES_DIR / "default.json").read_text(encoding="utf-8")
+    monkeypatch.setattr(pdf_layout, "TEMPLATES_DIR", tmp_path)
+    (tmp_path / "default.json").write_text(default, encoding="utf-8")
+    (tmp_path / "shop.json").write_text(
+        '{"title": {"text": "Order #{order_no}"}, "items": {"columns": {"qty": {"x_mm": 100}}}}',
+        encoding="utf-8",
+    )
+
+    template = load_template("shop")
+    assert template["title"]["text"] == "Order #{order_no}"
+    assert template["items"]["columns"]["qty"] == {"label": "К-ть", "x_mm": 100}
+    assert template["items"]["columns"]["sum"]["x_mm"] == 180
+
+    monkeypatch.setenv("SHOPIFY_STORE_DOMAIN", "shop")
+    monkeypatch.delenv("PDF_TEMPLATE", raising=False)
+    assert pdf_layout.get_template_name() == "shop"
+
+    # Неизвестный шаблон - default
+    assert load_template("missing") == load_template()
+
+
+def test_plan_is_compiled_once():
+    assert get_layout_plan(False, "default") is get_layout_plan(False, "default")
+
+
+def test_batch_pdf_shares_header_form():
+    out = BytesIO()
+    build_orders_pdf([ORDER, dict(ORDER, id=2, order_number=1002)], out)
+    data = out.getvalue()
+    assert data.count(b"/Subtype /Form") == 1
@@ -0,0 +1,91 @@
+# tests/test_pdf_renderer.py
+import asyncio
+import time
+
+import pytest
+
+from app.services.pdf_renderer import PdfRenderer, PdfRenderQueueFull, PdfRenderTimeout
+
+ORDER = {"id": 1, "order_number": 1001, "line_items": [{"title": "Чашка", "quantity": 2, "price": "150"}]}
+
+
+def _sleep(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+def test_thread_backend_renders_pdf():
+    renderer = PdfRenderer(backend="thread", workers=1)
+    try:
+        data, filename = asyncio.run(renderer.render_order(ORDER))
+    finally:
+        renderer.shutdown()
+    assert data.startswith(b"%PDF")
+    assert filename == "order_#1001.pdf"
+
+
+def test_process_backend_renders_pdf():
+    renderer = PdfRenderer(backend="process", workers=1)
+
+    async def run():
+        await renderer.start()
+        return await renderer.render_order(ORDER)
+
+    try:
+        data, _ = asyncio.run(run())
+    finally:
+        renderer.shutdown()
+    assert data.startswith(b"%PDF")
+
+
+def test_queue_depth_is_bounded():
+    renderer = PdfRenderer(backend="thread", workers=1, max_pending=1)
+
+    async def run():
+        first = asyncio.ensure_future(renderer.submit(_sleep, 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(PdfRenderQueueFull):
+            await renderer.submit(_sleep, 0)
+        await first
+        assert renderer.pending == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        renderer.shutdown()
+
+
+def test_render_timeout():
+    renderer = PdfRenderer(backend="thread", workers=1, timeout=0.05)
+    try:
+        with pytest.raises(PdfRenderTimeout):
+            asyncio.run(renderer.submit(_sleep, 0.3))
+    finally:
+        renderer.shutdown()
+
+
+def test_timeout_keeps_slot_until_render_finishes():
+    renderer = PdfRenderer(backend="thread", workers=1, max_pending=1, timeout=0.05)
+    abandoned = []
+
+    async def run():
+        with pytest.raises(PdfRenderTimeout):
+            await renderer.submit(_sleep, 0.3, on_abandoned=lambda: abandoned.append(True))
+        # воркер ещё занят - новый рендер не должен встать в очередь сверх лимита
+        assert renderer.pending == 1
+        with pytest.raises(PdfRenderQueueFull):
+            await renderer.submit(_sleep, 0)
+        while renderer.pending:
+            await asyncio.sleep(0.02)
+        assert abandoned == [True]
+        assert await renderer.submit(_sleep, 0) == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        renderer.shutdown()
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        PdfRenderer(backend="gpu")
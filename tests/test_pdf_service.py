@@ -0,0 +1,92 @@
+# tests/test_pdf_service.py
+from reportlab import rl_config
+from reportlab.lib.utils import ImageReader
+
+from app.services import pdf_service
+from app.services.pdf_optimize import encode_brand_jpeg, is_size_optimized
+
+ORDER = {
+    "id": 1,
+    "order_number": 1001,
+    "created_at": "2025-01-01T10:00:00Z",
+    "line_items": [{"title": "Чашка", "quantity": 2, "price": "150"}],
+}
+
+
+def test_assets_loaded_once():
+    pdf_service.warmup_assets()
+    brand = pdf_service._get_brand()
+    fonts_ok = pdf_service._register_fonts()
+
+    pdf_service.build_order_pdf(ORDER)
+
+    assert pdf_service._get_brand() is brand
+    assert pdf_service._register_fonts() is fonts_ok
+
+
+def test_cached_brand_output_is_stable(monkeypatch):
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    first, _ = pdf_service.build_order_pdf(ORDER)
+    second, _ = pdf_service.build_order_pdf(ORDER)
+
+    assert first == second
+    if pdf_service._get_brand() is not None:
+        # Бренд встраивается готовым JPEG, без zlib-потока пикселей и маски
+        assert b"/DCTDecode" in second
+        assert b"/SMask" not in second
+
+
+def test_cached_brand_matches_plain_draw_image(monkeypatch):
+    monkeypatch.setattr(rl_config, "invariant", 1)
+    brand = pdf_service._get_brand()
+    if brand is None or is_size_optimized():
+        return
+    cached, _ = pdf_service.build_order_pdf(ORDER)
+
+    def draw_from_file(self, c, x, y, w, h):
+        c.drawImage(ImageReader(encode_brand_jpeg(self.path)), x, y, width=w, height=h)
+
+    monkeypatch.setattr(pdf_service._BrandImage, "draw", draw_from_file)
+    plain, _ = pdf_service.build_order_pdf(ORDER)
+    assert cached == plain
+
+
+class _RecordingCanvas:
+    """Минимальный canvas: запоминает нарисованные строки."""
+
+    def __init__(self):
+        self.lines = []
+
+    def setFont(self, font, size):
+        pass
+
+    def drawString(self, x, y, text):
+        self.lines.append(text)
+
+    def stringWidth(self, text, font, size):
+        from reportlab.pdfbase import pdfmetrics
+        return pdfmetrics.stringWidth(text, font, size)
+
+
+def _wrap_naive(c, text, max_width, font, size):
+    """Прежний алгоритм: перемер всей строки на каждое слово."""
+    line = ""
+    for w in str(text).split():
+        trial = (line + " " + w).strip()
+        if c.stringWidth(trial, font, size) <= max_width:
+            line = trial
+        else:
+            if line:
+                c.drawString(0, 0, line)
+            line = w
+    if line:
+        c.drawString(0, 0, line)
+
+
+def test_wrap_text_matches_full_measurement():
+    text = "Футболка чоловіча бавовняна з принтом " * 20 + "надзвичайно-довге-слово-без-пробілів" * 3
+    for max_width in (30, 120, 250.5, 400):
+        fast, naive = _RecordingCanvas(), _RecordingCanvas()
+        pdf_service._wrap_text(fast, text, 0, 0, max_width, "Helvetica", 10, 5)
+        _wrap_naive(naive, text, max_width, "Helvetica", 10)
+        assert fast.lines == naive.lines
@@ -1,5 +1,5 @@
 # tests/test_phone_utils.py
-from app.services.phone_utils import normalize_ua_phone, pretty_ua_phone
+from app.services.phone_utils import normalize_ua_phone, normalize_ua_phone_many, pretty_ua_phone
 
 def test_normalize_e164_ok():
     assert normalize_ua_phone("+380672326239") == "+380672326239"
@@ -14,6 +14,11 @@ def test_normalize_bad():
     assert normalize_ua_phone("") is None
     assert normalize_ua_phone(None) is None
 
+def test_normalize_many_keeps_positions():
+    phones = ["0672326239", "12345", "+380672326239", None, "0672326239", "+38 (067) 232-62-39"]
+    assert normalize_ua_phone_many(phones) == [normalize_ua_phone(p) for p in phones] == \
+        ["+380672326239", None, "+380672326239", None, "+380672326239", "+380672326239"]
+
 def test_pretty_format():
     assert pretty_ua_phone("+380672326239") == "+380 67 232 62 39"
     # не-ua или неверный формат — вернуть как есть
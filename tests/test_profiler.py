@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from app.bot.routers.shared import state
+from app.services import profiler
+from tests.test_metrics import _asgi_get
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profile_covers_event_loop_and_threads():
+    stop = threading.Event()
+
+    def blocking_call():
+        time.sleep(0.3)
+
+    async def handler():
+        loop = asyncio.get_running_loop()
+        worker = loop.run_in_executor(None, busy_worker, stop)
+        # Сэмплер - в потоке, как в /debug/profile; цикл тем временем блокируется
+        sampling = loop.run_in_executor(None, profiler.sample_stacks, 0.2, 0.002)
+        blocking_call()
+        stacks = await sampling
+        stop.set()
+        await worker
+        return stacks
+
+    stacks = asyncio.run(handler())
+    text = profiler.collapsed(stacks)
+    lines = text.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.startswith("MainThread;") and ";blocking_call (" in line for line in lines)
+    assert any(not line.startswith("MainThread;") and ";busy_worker (" in line for line in lines)
+    # Пул потоков без работы - не в профиле
+    leaves = [line.rsplit(" ", 1)[0].rsplit(";", 1)[-1] for line in lines]
+    assert not any(leaf.startswith("_worker (concurrent/futures/thread.py:") for leaf in leaves)
+
+
+def test_only_one_profile_at_a_time():
+    with profiler._profile_lock:
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.sample_stacks(0.01)
+
+
+def test_memory_report_diff(monkeypatch):
+    monkeypatch.setattr(state, "webhook_order_messages", {})
+    try:
+        first = profiler.memory_report()
+        assert first["baseline"] == "started" and tracemalloc.is_tracing()
+
+        for order_id in range(2000):
+            state.add_webhook_message(order_id, 1, order_id)
+        report = profiler.memory_report(limit=5)
+        assert report["state"]["webhook_order_messages"] == {"keys": 2000, "items": 2000}
+        assert report["growth_bytes"] > 0
+        assert any(e["where"].startswith("app/bot/routers/shared/state.py:") for e in report["top"])
+
+        with pytest.raises(ValueError):
+            profiler.memory_report(group_by="module")
+    finally:
+        assert profiler.memory_report(stop=True) == {"tracing": False}
+    assert not tracemalloc.is_tracing()
+
+
+def test_debug_endpoints_require_token(monkeypatch):
+    from app.main import app
+
+    monkeypatch.delenv("DEBUG_API_TOKEN", raising=False)
+    assert _asgi_get(app, "/debug/profile")[0] == 404
+    assert _asgi_get(app, "/debug/orders")[0] == 404
+    monkeypatch.setenv("DEBUG_API_TOKEN", "s3cret")
+    assert _asgi_get(app, "/debug/memory")[0] == 401
+    assert _asgi_get(app, "/debug/orders", [("Authorization", "Bearer other")])[0] == 401
+    try:
+        status, body = _asgi_get(app, "/debug/memory", [("Authorization", "Bearer s3cret")])
+        assert status == 200 and '"baseline":"started"' in body
+    finally:
+        profiler.memory_report(stop=True)
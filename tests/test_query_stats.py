@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import state
+from app.db import Base
+from app.models import Order
+from app.services import query_stats
+from app.services.metrics import DB_QUERIES_PER_SCOPE
+from app.services.query_stats import fingerprint, params_fingerprint, query_budget, query_scope
+from app.services.tracing import run_in_executor
+
+
+@pytest.fixture
+def Session(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextmanager
+    def get_session():
+        with Session() as session:
+            yield session
+
+    monkeypatch.setattr(state, "get_session", get_session)
+    return Session
+
+
+def test_fingerprints_hide_values():
+    assert fingerprint("SELECT *\n  FROM orders WHERE id IN (?, ?, ?)") == "SELECT ... FROM orders WHERE id IN (...)"
+    assert params_fingerprint((1, "+380671234567", None)) == "(int, str, None)"
+    assert params_fingerprint({"id": 5}) == "{id: int}"
+    assert params_fingerprint([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+
+
+def test_budget_reports_repeated_statements(Session):
+    with Session() as session:
+        session.add_all([Order(id=i, order_number=str(i)) for i in (1, 2, 3)])
+        session.commit()
+
+    with pytest.raises(AssertionError) as exc:
+        with query_budget(2):
+            with Session() as session:
+                for i in (1, 2, 3):
+                    session.get(Order, i)
+    assert "3 queries, budget 2" in str(exc.value)
+    assert "3 x SELECT ... FROM orders WHERE orders.id = ?" in str(exc.value)
+
+
+def test_mark_processed_query_budget(Session):
+    order = {"id": 10, "order_number": 1010, "phone": "+380671234567",
+             "customer": {"first_name": "Ivan", "last_name": "Petrenko"}}
+    with query_budget(5):
+        assert asyncio.run(state.mark_processed(10, order)) is True
+    # Повторный webhook отсекается одним запросом
+    with query_budget(1):
+        assert asyncio.run(state.mark_processed(10, order)) is False
+
+
+def test_scope_counts_executor_threads_and_observes_metrics(Session):
+    def query():
+        with Session() as session:
+            session.execute(text("SELECT 1"))
+
+    async def main():
+        with ThreadPoolExecutor(1) as pool, query_scope("job test_scope") as scope:
+            query()
+            await run_in_executor(pool, query)
+        return scope
+
+    scope = asyncio.run(main())
+    assert scope.count == 2
+    assert DB_QUERIES_PER_SCOPE.labels("job test_scope").count == 1
+
+
+def test_slow_query_and_budget_warnings(Session, monkeypatch, caplog):
+    monkeypatch.setattr(query_stats, "_slow_query_seconds", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.services.query_stats"):
+        with query_scope("telegram callback_query", budget=1):
+            with Session() as session:
+                session.execute(text("SELECT :a, :b"), {"a": 1, "b": "secret"})
+                session.execute(text("SELECT 2"))
+    assert "Slow query" in caplog.text and "params=(int, str)" in caplog.text
+    assert "secret" not in caplog.text
+    assert "telegram callback_query: 2 queries" in caplog.text
@@ -0,0 +1,154 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.services import tracing
+from tests.test_metrics import _asgi_get
+from tools.trace_report import find_order_traces, group_traces, render_tree
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = ListExporter()
+    tracer = tracing.Tracer(exporter, flush_interval=0.01)
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    monkeypatch.setattr(tracing, "_tracer_loaded", True)
+
+    def flush():
+        tracer.shutdown()
+        return {s.name: s for s in exporter.spans}
+
+    yield flush
+    tracer.shutdown()
+
+
+def test_disabled_tracing_is_noop(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.setattr(tracing, "_tracer_loaded", True)
+    with tracing.start_span("root") as span:
+        assert span is None
+        tracing.set_attribute("order.id", "1")
+    assert tracing.current_span() is None
+
+
+def test_context_propagates_across_await_tasks_and_executor(exported):
+    def in_thread():
+        with tracing.start_span("thread", only_in_trace=True):
+            pass
+
+    async def child():
+        with tracing.start_span("task"):
+            await asyncio.sleep(0)
+
+    async def main():
+        with ThreadPoolExecutor(1) as pool, tracing.start_span("root") as root:
+            await asyncio.create_task(child())
+            await tracing.run_in_executor(pool, in_thread)
+            tracing.set_attribute("order.id", "42")
+        return root
+
+    root = asyncio.run(main())
+    # Вне трассы only_in_trace-спан не создаётся
+    with tracing.start_span("orphan", only_in_trace=True) as orphan:
+        assert orphan is None
+
+    spans = exported()
+    assert set(spans) == {"root", "task", "thread"}
+    assert spans["task"].parent_id == root.span_id
+    assert spans["thread"].parent_id == root.span_id
+    assert {s.trace_id for s in spans.values()} == {root.trace_id}
+    assert root.attributes["order.id"] == "42"
+
+
+def test_error_is_recorded(exported):
+    with pytest.raises(ValueError):
+        with tracing.start_span("boom"):
+            raise ValueError("bad")
+    span = exported()["boom"]
+    assert span.status == "error"
+    assert span.error == "ValueError: bad"
+
+
+def test_parse_traceparent():
+    ctx = tracing.parse_traceparent("00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")
+    assert ctx == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7")
+    assert tracing.parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+    assert tracing.parse_traceparent(None) is None
+
+
+def test_sqlalchemy_spans_only_inside_trace(exported):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    tracing.instrument_sqlalchemy(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with tracing.start_span("root") as root:
+            conn.execute(text("SELECT 2"))
+
+    spans = exported()
+    assert set(spans) == {"root", "db.query"}
+    assert spans["db.query"].parent_id == root.span_id
+    assert spans["db.query"].attributes["db.statement"] == "SELECT 2"
+
+
+def test_middleware_uses_route_template_and_traceparent(exported):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    app.add_middleware(tracing.TracingMiddleware)
+
+    @app.get("/orders/{order_id}")
+    async def order(order_id: int):
+        tracing.set_attribute("order.id", str(order_id))
+        return {"ok": True}
+
+    status, _ = _asgi_get(app, "/orders/7", [("traceparent", "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01")])
+    assert status == 200
+    span = exported()["GET /orders/{order_id}"]
+    assert span.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert span.parent_id == "00f067aa0ba902b7"
+    assert span.attributes["http.status_code"] == 200
+    assert span.attributes["order.id"] == "7"
+
+
+def test_file_exporter_and_report(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    root = tracing.Span("POST /webhooks/shopify/orders", "a" * 32, None, {"order.id": "99"})
+    child = tracing.Span("db.query", root.trace_id, root.span_id, {"db.statement": "SELECT\n  1"})
+    other = tracing.Span("job crm_sync", "b" * 32, None)
+    for span in (child, root, other):
+        span.end()
+    tracing.FileExporter(str(path)).export([child, root, other])
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    traces = group_traces(spans)
+    assert find_order_traces(traces, "99") == ["a" * 32]
+    lines = render_tree(traces["a" * 32])
+    assert "POST /webhooks/shopify/orders" in lines[0]
+    assert "  db.query  SELECT 1" in lines[1]
+
+
+def test_otlp_payload_shape():
+    span = tracing.Span("GET /health", "c" * 32, "d" * 16, {"http.status_code": 200, "ok": True})
+    span.record_error(RuntimeError("x"))
+    span.end()
+    payload = tracing.OtlpHttpExporter("http://collector:4318", service_name="svc").payload([span])
+
+    resource = payload["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": "svc"}}
+    otlp = resource["scopeSpans"][0]["spans"][0]
+    assert otlp["traceId"] == "c" * 32 and otlp["parentSpanId"] == "d" * 16
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in otlp["attributes"]
+    assert otlp["status"]["code"] == 2
@@ -0,0 +1,134 @@
+# tests/test_webhook_capture.py
+import asyncio
+import json
+import threading
+
+from aiohttp import web
+
+from app.services.phone_utils import normalize_ua_phone
+from app.services.shopify_hmac import sign_webhook
+from app.services.webhook_capture import WebhookCapture, WebhookCaptureMiddleware, read_capture, redact
+from tools.replay_webhooks import build_requests, replay, summarize
+from tools.stub_server import serve_in_thread
+
+ORDER = {
+    "id": 5001,
+    "name": "#1001",
+    "email": "olena@example.com",
+    "phone": "+380671234567",
+    "browser_ip": "10.0.0.1",
+    "note": "Подзвоніть після 18:00",
+    "customer": {"first_name": "Олена", "last_name": "Коваль", "phone": "0671234567"},
+    "shipping_address": {"first_name": "Олена", "name": "Олена Коваль", "address1": "вул. Садова, 1",
+                         "city": "Київ", "phone": "+380671234567"},
+    "line_items": [{"name": "Чашка", "title": "Чашка", "properties": [{"name": "Ім'я", "value": "Оленка"}]}],
+}
+
+
+def test_redact_pseudonymizes_people_but_keeps_order_shape():
+    red = redact(ORDER, salt="s")
+    text = json.dumps(red, ensure_ascii=False)
+    for pii in ("Олена", "Коваль", "olena@", "Садова", "1234567", "10.0.0.1", "18:00", "Оленка"):
+        assert pii not in text
+
+    assert red["name"] == "#1001" and red["line_items"][0]["name"] == "Чашка"
+    assert red["shipping_address"]["city"] == "Київ"
+    assert normalize_ua_phone(red["shipping_address"]["phone"]) == red["shipping_address"]["phone"]
+    # Тот же покупатель - тот же псевдоним (повторные заказы узнаются)
+    assert red["customer"]["first_name"] == red["shipping_address"]["first_name"]
+    assert red["phone"] == red["shipping_address"]["phone"] == red["customer"]["phone"]
+    assert len(red["line_items"][0]["properties"][0]["value"]) == len("Оленка")
+    assert redact(ORDER, salt="other")["phone"] != red["phone"]
+
+
+def test_middleware_appends_redacted_records(tmp_path):
+    path = str(tmp_path / "capture.jsonl.gz")
+    capture = WebhookCapture(path, salt="s")
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = WebhookCaptureMiddleware(app, capture)
+    body = json.dumps(ORDER).encode()
+
+    async def call(path_, payload):
+        scope = {"type": "http", "method": "POST", "path": path_,
+                 "headers": [(b"x-shopify-topic", b"orders/create"), (b"x-shopify-hmac-sha256", b"sig")]}
+        messages = iter([{"type": "http.request", "body": payload[:10], "more_body": True},
+                         {"type": "http.request", "body": payload[10:], "more_body": False}])
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            pass
+
+        await middleware(scope, receive, send)
+
+    asyncio.run(call("/webhooks/shopify/orders", body))
+    asyncio.run(call("/telegram/webhook", b"{}"))
+    asyncio.run(call("/webhooks/shopify/orders", body))
+    capture.close()
+
+    records = list(read_capture(path))
+    assert len(records) == 2
+    assert records[0]["status"] == 200
+    assert records[0]["headers"] == {"x-shopify-topic": "orders/create"}
+    assert records[0]["body"] == redact(ORDER, salt="s")
+
+
+def test_record_does_not_write_in_caller_thread(tmp_path):
+    capture = WebhookCapture(str(tmp_path / "capture.jsonl"), max_queue=1)
+    release, writers = threading.Event(), []
+
+    def slow_write(*args):
+        writers.append(threading.current_thread().name)
+        release.wait(5)
+
+    capture._write = slow_write
+    for _ in range(4):
+        capture.record("/webhooks/shopify/orders", {}, b"{}", 200, 0.01)  # не ждёт записи
+    release.set()
+    capture.close()
+
+    assert writers and set(writers) == {"webhook-capture"}
+    assert capture.dropped >= 2
+
+
+def test_replay_resigns_and_shifts_ids():
+    seen = []
+
+    async def webhook(request):
+        body = await request.read()
+        if request.headers["X-Shopify-Hmac-Sha256"] != sign_webhook(body, "target-secret"):
+            return web.json_response({"detail": "Invalid HMAC signature"}, status=403)
+        seen.append((json.loads(body)["id"], request.headers.get("X-Shopify-Topic")))
+        return web.json_response({"status": "ok"})
+
+    app = web.Application()
+    app.router.add_post("/webhooks/shopify/orders", webhook)
+    server = serve_in_thread(app)
+
+    records = [
+        {"ts": 100.0, "path": "/webhooks/shopify/orders", "headers": {"x-shopify-topic": "orders/create"},
+         "status": 200, "body": {"id": 1, "admin_graphql_api_id": "gid://shopify/Order/1"}},
+        {"ts": 100.5, "path": "/webhooks/shopify/orders", "headers": {}, "status": 200, "body": None},
+        {"ts": 102.0, "path": "/webhooks/shopify/orders", "headers": {}, "status": 500, "body": {"id": 2}},
+    ]
+    requests = build_requests(records, "target-secret", speed=10.0, id_offset=1000)
+    assert [r.offset for r in requests] == [0.0, 0.2]
+    assert json.loads(requests[0].body)["admin_graphql_api_id"] == "gid://shopify/Order/1001"
+    assert [r.offset for r in build_requests(records, "x", speed=None)] == [0.0, 0.0]
+
+    try:
+        results = asyncio.run(replay(server.url, requests))
+    finally:
+        server.stop()
+
+    assert sorted(seen) == [(1001, "orders/create"), (1002, None)]
+    summary = summarize(results, elapsed=0.2)
+    assert summary["statuses"] == {"200": 2}
+    assert summary["status_mismatches"] == 1  # в проде второй заказ упал с 500
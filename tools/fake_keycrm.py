@@ -0,0 +1,406 @@
+# tools/fake_keycrm.py
+"""
+Локальная заглушка keyCRM OpenAPI для офлайн-тестов и бенчмарков.
+
+Маршруты /buyer и /order (список, создание, получение по id) повторяют
+контракт docs/open-api.yml: обязательные поля и типы тела запроса
+проверяются по схемам requestBody из спецификации (ошибка - 422 в формате
+keyCRM), ответы содержат поля схем Buyer / Order. Состояние - в памяти.
+
+Как и настоящий keyCRM, заглушка требует Bearer-токен и ограничивает
+частоту запросов: не больше rate_limit запросов за окно window секунд
+на ключ (фиксированное окно от первого запроса), сверх лимита - 429
+с Retry-After. Задержка ответа и доля ошибок задаются параметрами.
+
+    python -m tools.fake_keycrm --port 8900 --latency 0.2 --jitter 0.1 --error-rate 0.05
+    KEYCRM_BASE_URL=http://127.0.0.1:8900/v1 ...
+
+Служебные маршруты: GET /_fake/stats (счётчики), POST /_fake/reset.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+SPEC_PATH = Path(__file__).resolve().parents[1] / "docs" / "open-api.yml"
+API_PREFIX = "/v1"
+MAX_LIMIT = 50
+
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+class FakeKeyCrmConfig(NamedTuple):
+    rate_limit: int = 60
+    window: float = 60.0
+    latency: float = 0.0  # базовая задержка ответа, секунды
+    jitter: float = 0.0  # + равномерно распределённая добавка до jitter секунд
+    error_rate: float = 0.0  # доля запросов, отвечающих error_status
+    error_status: int = 500
+    api_key: Optional[str] = None  # None - принимается любой Bearer-токен
+    seed: Optional[int] = None
+
+
+class BodySchema(NamedTuple):
+    required: Tuple[str, ...]
+    properties: dict
+
+
+class FakeSpec(NamedTuple):
+    create_buyer: BodySchema
+    create_order: BodySchema
+    buyer_fields: Tuple[str, ...]  # поля ответа (схема Buyer)
+    order_fields: Tuple[str, ...]  # поля ответа (схема Order)
+
+
+def _body_schema(spec: dict, path: str) -> BodySchema:
+    schema = spec["paths"][path]["post"]["requestBody"]["content"]["application/json"]["schema"]
+    return BodySchema(tuple(schema.get("required") or ()), schema.get("properties") or {})
+
+
+def load_spec(path: Path = SPEC_PATH) -> FakeSpec:
+    with open(path, encoding="utf-8") as f:
+        spec = yaml.safe_load(f)
+    schemas = spec["components"]["schemas"]
+    return FakeSpec(
+        create_buyer=_body_schema(spec, "/buyer"),
+        create_order=_body_schema(spec, "/order"),
+        buyer_fields=tuple(schemas["Buyer"]["properties"]),
+        order_fields=tuple(schemas["Order"]["properties"]),
+    )
+
+
+def _type_ok(value, schema: dict) -> bool:
+    expected = _JSON_TYPES.get(schema.get("type"))
+    if expected is None:
+        return True
+    if isinstance(value, bool) and schema.get("type") in ("integer", "number"):
+        return False
+    return isinstance(value, expected)
+
+
+def validate_body(body, schema: BodySchema, prefix: str = "") -> Dict[str, List[str]]:
+    """Ошибки валидации в формате keyCRM: {"поле": ["сообщение", ...]}."""
+    if not isinstance(body, dict):
+        return {prefix.rstrip(".") or "body": ["The body must be an object."]}
+
+    errors: Dict[str, List[str]] = {}
+    for name in schema.required:
+        if body.get(name) in (None, ""):
+            errors.setdefault(prefix + name, []).append(f"The {name} field is required.")
+
+    for name, prop in schema.properties.items():
+        if name not in body or body[name] is None:
+            if name in body and prop.get("nullable") is False:
+                errors.setdefault(prefix + name, []).append(f"The {name} field must not be null.")
+            continue
+        value = body[name]
+        if not _type_ok(value, prop):
+            errors.setdefault(prefix + name, []).append(f"The {name} must be of type {prop['type']}.")
+            continue
+        if prop.get("type") == "object" and prop.get("properties"):
+            nested = BodySchema(tuple(prop.get("required") or ()), prop["properties"])
+            errors.update(validate_body(value, nested, f"{prefix}{name}."))
+        elif prop.get("type") == "array" and isinstance(prop.get("items"), dict):
+            for i, item in enumerate(value):
+                if not _type_ok(item, prop["items"]):
+                    errors.setdefault(f"{prefix}{name}.{i}", []).append(
+                        f"The {name}.{i} must be of type {prop['items'].get('type')}."
+                    )
+    return errors
+
+
+class FixedWindowLimiter:
+    """Не больше limit запросов за window секунд на ключ; окно стартует с первого запроса."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._windows: Dict[str, Tuple[float, int]] = {}
+
+    def hit(self, key: str, now: float) -> Optional[float]:
+        """None - запрос разрешён, иначе секунды до конца окна."""
+        start, count = self._windows.get(key, (now, 0))
+        if now - start >= self.window:
+            start, count = now, 0
+        if count >= self.limit:
+            return start + self.window - now
+        self._windows[key] = (start, count + 1)
+        return None
+
+
+def _digits(phone) -> str:
+    return re.sub(r"\D", "", str(phone or ""))
+
+
+def _now_str() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class FakeKeyCrmState:
+    """Покупатели, заказы и счётчики заглушки."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.buyers: Dict[int, dict] = {}
+        self.orders: Dict[int, dict] = {}
+        self.stats: Counter = Counter()
+        self._next_buyer_id = 1
+        self._next_order_id = 1
+
+    def add_buyer(self, body: dict, fields: Tuple[str, ...]) -> dict:
+        now = _now_str()
+        buyer = {field: body.get(field) for field in fields}
+        buyer.update(id=self._next_buyer_id, created_at=now, updated_at=now)
+        self._next_buyer_id += 1
+        self.buyers[buyer["id"]] = buyer
+        return buyer
+
+    def find_buyers(self, phones: List[str] = (), emails: List[str] = (), ids: List[int] = ()) -> List[dict]:
+        phones = {_digits(p) for p in phones if _digits(p)}
+        emails = {e.strip().lower() for e in emails if e.strip()}
+        result = []
+        for buyer in self.buyers.values():
+            if ids and buyer["id"] not in ids:
+                continue
+            if phones and not phones & {_digits(p) for p in buyer.get("phone") or []}:
+                continue
+            if emails and not emails & {e.lower() for e in buyer.get("email") or []}:
+                continue
+            result.append(buyer)
+        return result
+
+    def add_order(self, body: dict, spec: FakeSpec) -> dict:
+        buyer_body = body.get("buyer") or {}
+        phone = buyer_body.get("phone")
+        buyer = None
+        if phone:
+            found = self.find_buyers(phones=[phone])
+            buyer = found[0] if found else None
+        if buyer is None:
+            email = buyer_body.get("email")
+            buyer = self.add_buyer({
+                "full_name": buyer_body.get("full_name"),
+                "phone": [phone] if phone else None,
+                "email": [email] if email else None,
+            }, spec.buyer_fields)
+
+        products = body.get("products") or []
+        total = sum(float(p.get("price") or 0) * float(p.get("quantity") or 1) for p in products)
+        total += float(body.get("shipping_price") or 0)
+
+        now = _now_str()
+        order = {field: body.get(field) for field in spec.order_fields}
+        order.update(
+            id=self._next_order_id,
+            source_uuid=str(body["source_uuid"]) if body.get("source_uuid") is not None else None,
+            buyer_id=buyer["id"],
+            status_id=1,
+            status_group_id=1,
+            grand_total=round(total, 2),
+            ordered_at=body.get("ordered_at") or now,
+            created_at=now,
+            updated_at=now,
+            status_changed_at=now,
+        )
+        # Поля схемы Order + buyer_id (keyCRM отдаёт его, хоть в схеме его нет)
+        order = {key: value for key, value in order.items() if key in spec.order_fields or key == "buyer_id"}
+        self._next_order_id += 1
+        self.orders[order["id"]] = order
+        return order
+
+
+def _error(status: int, message: str, errors: Optional[dict] = None, headers: Optional[dict] = None) -> JSONResponse:
+    content = {"message": message}
+    if errors:
+        content["errors"] = errors
+    return JSONResponse(content, status_code=status, headers=headers)
+
+
+def _csv(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _paginate(request: Request, items: List[dict]):
+    """Пагинация в формате PaginatedResponse; ошибка 422 при limit вне 1..50."""
+    try:
+        limit = int(request.query_params.get("limit", 15))
+        page = max(1, int(request.query_params.get("page", 1)))
+    except ValueError:
+        return _error(422, "The given data was invalid.", {"limit": ["The limit must be an integer."]})
+    if not 1 <= limit <= MAX_LIMIT:
+        return _error(422, "The given data was invalid.", {"limit": [f"The limit must be between 1 and {MAX_LIMIT}."]})
+
+    if request.query_params.get("sort") == "-id":
+        items = sorted(items, key=lambda x: x["id"], reverse=True)
+    total = len(items)
+    last_page = max(1, math.ceil(total / limit))
+    base = str(request.url.remove_query_params("page"))
+    sep = "&" if "?" in base else "?"
+    return {
+        "total": total,
+        "current_page": page,
+        "per_page": limit,
+        "data": items[(page - 1) * limit:page * limit],
+        "first_page_url": f"{base}{sep}page=1",
+        "last_page_url": f"{base}{sep}page={last_page}",
+        "next_page_url": f"{base}{sep}page={page + 1}" if page < last_page else None,
+    }
+
+
+def create_app(config: FakeKeyCrmConfig = FakeKeyCrmConfig(), spec_path: Path = SPEC_PATH) -> FastAPI:
+    spec = load_spec(spec_path)
+    state = FakeKeyCrmState()
+    limiter = FixedWindowLimiter(config.rate_limit, config.window)
+    rnd = random.Random(config.seed)
+
+    app = FastAPI(title="fake keyCRM")
+    app.state.fake = state
+
+    @app.middleware("http")
+    async def emulate_api(request: Request, call_next):
+        if not request.url.path.startswith(API_PREFIX):
+            return await call_next(request)
+
+        state.stats["requests"] += 1
+        auth = request.headers.get("authorization", "")
+        token = auth[7:].strip() if auth.lower().startswith("bearer ") else ""
+        if not token or (config.api_key is not None and token != config.api_key):
+            state.stats["unauthorized"] += 1
+            return _error(401, "Unauthenticated.")
+
+        retry_after = limiter.hit(token, time.monotonic())
+        if retry_after is not None:
+            state.stats["rate_limited"] += 1
+            return _error(429, "Too Many Attempts.", headers={
+                "Retry-After": str(max(1, math.ceil(retry_after))),
+                "X-RateLimit-Limit": str(config.rate_limit),
+                "X-RateLimit-Remaining": "0",
+            })
+
+        delay = config.latency + (rnd.uniform(0, config.jitter) if config.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if config.error_rate and rnd.random() < config.error_rate:
+            state.stats["injected_errors"] += 1
+            return _error(config.error_status, "Server Error")
+
+        return await call_next(request)
+
+    # ---------- buyer ----------
+    @app.get(f"{API_PREFIX}/buyer")
+    async def list_buyers(request: Request):
+        q = request.query_params
+        ids = [int(i) for i in _csv(q.get("filter[buyer_id]")) if i.isdigit()]
+        buyers = state.find_buyers(_csv(q.get("filter[buyer_phone]")), _csv(q.get("filter[buyer_email]")), ids)
+        return _paginate(request, buyers)
+
+    @app.post(f"{API_PREFIX}/buyer", status_code=201)
+    async def create_buyer(request: Request):
+        body = await request.json()
+        errors = validate_body(body, spec.create_buyer)
+        if errors:
+            return _error(422, "The given data was invalid.", errors)
+        state.stats["buyers_created"] += 1
+        return state.add_buyer(body, spec.buyer_fields)
+
+    @app.get(f"{API_PREFIX}/buyer/{{buyer_id}}")
+    async def get_buyer(buyer_id: int):
+        buyer = state.buyers.get(buyer_id)
+        return buyer if buyer else _error(404, "Not Found")
+
+    # ---------- order ----------
+    @app.get(f"{API_PREFIX}/order")
+    async def list_orders(request: Request):
+        q = request.query_params
+        uuids = set(_csv(q.get("filter[source_uuid]")))
+        source_id = q.get("filter[source_id]")
+        status_id = q.get("filter[status_id]")
+        phones = _csv(q.get("filter[buyer_phone]"))
+        buyer_ids = {b["id"] for b in state.find_buyers(phones=phones)} if phones else None
+
+        orders = [
+            o for o in state.orders.values()
+            if (not uuids or o.get("source_uuid") in uuids)
+            and (source_id is None or str(o.get("source_id")) == source_id)
+            and (status_id is None or str(o.get("status_id")) == status_id)
+            and (buyer_ids is None or o.get("buyer_id") in buyer_ids)
+        ]
+        if "buyer" in _csv(q.get("include")):
+            orders = [{**o, "buyer": state.buyers.get(o.get("buyer_id"))} for o in orders]
+        return _paginate(request, orders)
+
+    @app.post(f"{API_PREFIX}/order", status_code=201)
+    async def create_order(request: Request):
+        body = await request.json()
+        errors = validate_body(body, spec.create_order)
+        if errors:
+            return _error(422, "The given data was invalid.", errors)
+        state.stats["orders_created"] += 1
+        return state.add_order(body, spec)
+
+    @app.get(f"{API_PREFIX}/order/{{order_id}}")
+    async def get_order(order_id: int):
+        order = state.orders.get(order_id)
+        return order if order else _error(404, "Not Found")
+
+    # ---------- служебные ----------
+    @app.get("/_fake/stats")
+    async def stats():
+        return {**state.stats, "buyers": len(state.buyers), "orders": len(state.orders)}
+
+    @app.post("/_fake/reset")
+    async def reset():
+        state.reset()
+        return {"ok": True}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local keyCRM OpenAPI stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--rate-limit", type=int, default=60, help="requests per window per API key")
+    parser.add_argument("--window", type=float, default=60.0, help="rate limit window, seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="base response delay, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay up to N seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--api-key", default=None, help="accept only this Bearer token")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeKeyCrmConfig(
+        rate_limit=args.rate_limit, window=args.window, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, error_status=args.error_status, api_key=args.api_key, seed=args.seed,
+    )
+    print(f"fake keyCRM: KEYCRM_BASE_URL=http://{args.host}:{args.port}{API_PREFIX}")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+# tools/fake_telegram.py
+"""
+Локальная заглушка Telegram Bot API для нагрузочных end-to-end прогонов.
+
+aiogram-бот и app.services.tg_service ходят в неё через
+TELEGRAM_API_BASE_URL (маршруты /bot<token>/<method>, как у настоящего API
+и локального telegram-bot-api). Заглушка:
+    - принимает form-data / urlencoded / JSON, как настоящий API;
+    - хранит отправленные сообщения: editMessage*/deleteMessage отвечают
+      400 на несуществующее сообщение и "message is not modified", как Telegram;
+    - ограничивает частоту отправки, как Telegram: token bucket на чат
+      (личный чат ~1 сообщение/с с небольшим всплеском, группа 20/мин) и
+      глобальный (30/с); сверх лимита - 429 с parameters.retry_after;
+    - добавляет задержку ответа и долю ошибок;
+    - записывает все вызовы: GET /_fake/calls, GET /_fake/stats, POST /_fake/reset;
+    - отдаёт апдейты в getUpdates: POST /_fake/updates (апдейт или список).
+
+    python -m tools.fake_telegram --port 8901 --latency 0.05
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8901 ...
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from aiohttp import web
+
+BOT_USER = {"id": 1000001, "is_bot": True, "first_name": "Fake Bot", "username": "fake_notifier_bot"}
+
+# Методы, на которые действуют лимиты отправки
+RATE_LIMITED_METHODS = frozenset({
+    "sendMessage", "sendDocument", "sendPhoto", "sendMediaGroup", "copyMessage", "forwardMessage",
+    "editMessageText", "editMessageReplyMarkup", "editMessageCaption",
+})
+_SEND_METHODS = ("sendMessage", "sendDocument", "sendPhoto", "copyMessage", "forwardMessage")
+_TRUE_METHODS = frozenset({
+    "answerCallbackQuery", "setMyCommands", "deleteMyCommands", "setChatMenuButton",
+    "deleteWebhook", "setWebhook", "sendChatAction", "close", "logOut",
+})
+MAX_RECORDED_CALLS = 100_000
+
+
+class FakeTelegramConfig(NamedTuple):
+    latency: float = 0.0  # базовая задержка ответа, секунды
+    jitter: float = 0.0  # + равномерно распределённая добавка до jitter секунд
+    chat_rate: float = 1.0  # сообщений в секунду в личный чат
+    chat_burst: int = 3
+    group_rate: float = 20 / 60  # группы/каналы (chat_id < 0)
+    group_burst: int = 20
+    global_rate: float = 30.0  # на бота в целом
+    global_burst: int = 30
+    error_rate: float = 0.0  # доля запросов с 500
+    max_poll_timeout: float = 25.0  # потолок long polling getUpdates
+    seed: Optional[int] = None
+
+
+class _Bucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """Сколько ждать до токена (0 - есть)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class TelegramLimiter:
+    """Лимиты отправки Telegram: bucket на чат + глобальный bucket бота."""
+
+    def __init__(self, config: FakeTelegramConfig):
+        self.config = config
+        self._global: Optional[_Bucket] = None
+        self._chats: Dict[str, _Bucket] = {}
+
+    def hit(self, chat_id: Optional[str], now: float) -> Optional[int]:
+        """None - разрешено, иначе retry_after в секундах."""
+        cfg = self.config
+        if self._global is None:
+            self._global = _Bucket(cfg.global_burst, cfg.global_rate, now)
+        buckets = [self._global]
+        if chat_id is not None:
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                group = str(chat_id).startswith("-")
+                bucket = self._chats[chat_id] = _Bucket(
+                    cfg.group_burst if group else cfg.chat_burst,
+                    cfg.group_rate if group else cfg.chat_rate,
+                    now,
+                )
+            buckets.append(bucket)
+
+        wait = max(b.wait(now) for b in buckets)
+        if wait > 0:
+            return max(1, math.ceil(wait))
+        for b in buckets:
+            b.tokens -= 1
+        return None
+
+
+class FakeTelegramState:
+    """Сообщения, вызовы и очередь апдейтов заглушки."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.messages: Dict[Tuple[str, int], dict] = {}
+        self.calls: Deque[dict] = deque(maxlen=MAX_RECORDED_CALLS)
+        self.stats: Counter = Counter()
+        self.updates: List[dict] = []
+        self._next_message_id: Dict[str, int] = {}
+        self._next_update_id = 1
+        self._next_file_id = 1
+        self.updates_event = asyncio.Event()
+
+    def add_updates(self, updates: List[dict]) -> None:
+        for update in updates:
+            update = dict(update)
+            update.setdefault("update_id", self._next_update_id)
+            self._next_update_id = max(self._next_update_id, update["update_id"]) + 1
+            self.updates.append(update)
+        self.updates_event.set()
+
+    def new_message(self, chat_id: str, **fields) -> dict:
+        message_id = self._next_message_id.get(chat_id, 1)
+        self._next_message_id[chat_id] = message_id + 1
+        chat_type = "group" if chat_id.startswith("-") else "private"
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id) if chat_id.lstrip("-").isdigit() else chat_id, "type": chat_type},
+            "from": BOT_USER,
+            **{k: v for k, v in fields.items() if v is not None},
+        }
+        self.messages[(chat_id, message_id)] = message
+        return message
+
+    def new_file_id(self) -> str:
+        file_id = f"FAKEFILE{self._next_file_id:08d}"
+        self._next_file_id += 1
+        return file_id
+
+
+def _ok(result) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _fail(code: int, description: str, **parameters) -> web.Response:
+    payload = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        payload["parameters"] = parameters
+    return web.json_response(payload, status=code)
+
+
+def _maybe_json(value):
+    if isinstance(value, str) and value[:1] in ("{", "["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+async def _read_params(request: web.Request) -> dict:
+    """Параметры метода из query, form-data/urlencoded или JSON. Файлы - {filename, size}."""
+    params = dict(request.query)
+    if request.method != "POST" or not request.can_read_body:
+        return params
+    if request.content_type == "application/json":
+        params.update(await request.json())
+        return params
+    files = {}
+    for key, value in (await request.post()).items():
+        if isinstance(value, web.FileField):
+            data = value.file.read()
+            files[key] = {"filename": value.filename, "size": len(data), "content_type": value.content_type}
+        else:
+            params[key] = _maybe_json(value)
+    # aiogram передаёт файл отдельной частью и ссылку на неё: document=attach://<part>
+    for key, value in list(params.items()):
+        if isinstance(value, str) and value.startswith("attach://"):
+            params[key] = files.pop(value[len("attach://"):], value)
+    params.update(files)
+    return params
+
+
+def _markup(params: dict):
+    return _maybe_json(params.get("reply_markup"))
+
+
+FAKE_STATE = web.AppKey("fake", FakeTelegramState)
+
+
+def create_app(config: FakeTelegramConfig = FakeTelegramConfig()) -> web.Application:
+    state = FakeTelegramState()
+    limiter = TelegramLimiter(config)
+    rnd = random.Random(config.seed)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app[FAKE_STATE] = state
+
+    def call_method(method: str, params: dict) -> web.Response:
+        chat_id = str(params["chat_id"]) if params.get("chat_id") is not None else None
+
+        if method == "getMe":
+            return _ok(BOT_USER)
+        if method == "getWebhookInfo":
+            return _ok({"url": "", "has_custom_certificate": False, "pending_update_count": len(state.updates)})
+        if method in _TRUE_METHODS:
+            return _ok(True)
+
+        if method in _SEND_METHODS:
+            if chat_id is None:
+                return _fail(400, "Bad Request: chat_id is empty")
+            fields = {"text": params.get("text"), "caption": params.get("caption"), "reply_markup": _markup(params)}
+            document = params.get("document")
+            if document is not None:
+                if isinstance(document, dict):  # загружен файл
+                    fields["document"] = {
+                        "file_id": state.new_file_id(),
+                        "file_unique_id": f"U{state._next_file_id}",
+                        "file_name": document["filename"],
+                        "mime_type": document["content_type"],
+                        "file_size": document["size"],
+                    }
+                else:  # повторная отправка по file_id
+                    fields["document"] = {"file_id": str(document), "file_unique_id": f"U{document}"}
+            if method == "sendMessage" and not fields["text"]:
+                return _fail(400, "Bad Request: message text is empty")
+            return _ok(state.new_message(chat_id, **fields))
+
+        if method.startswith("editMessage") or method == "deleteMessage":
+            try:
+                key = (chat_id, int(params.get("message_id")))
+            except (TypeError, ValueError):
+                return _fail(400, "Bad Request: message identifier is not specified")
+            message = state.messages.get(key)
+            if method == "deleteMessage":
+                if message is None:
+                    return _fail(400, "Bad Request: message to delete not found")
+                del state.messages[key]
+                return _ok(True)
+            if message is None:
+                return _fail(400, "Bad Request: message to edit not found")
+
+            updated = dict(message)
+            if method == "editMessageText":
+                updated["text"] = params.get("text")
+            elif method == "editMessageCaption":
+                updated["caption"] = params.get("caption")
+            markup = _markup(params)
+            if markup:
+                updated["reply_markup"] = markup
+            else:
+                updated.pop("reply_markup", None)
+            if updated == message:
+                return _fail(400, "Bad Request: message is not modified: specified new message content and "
+                                  "reply markup are exactly the same as a current content and reply markup "
+                                  "of the message")
+            updated["edit_date"] = int(time.time())
+            state.messages[key] = updated
+            return _ok(updated)
+
+        state.stats["unknown_methods"] += 1
+        return _ok(True)
+
+    async def get_updates(params: dict) -> web.Response:
+        offset = int(params.get("offset") or 0)
+        timeout = min(float(params.get("timeout") or 0), config.max_poll_timeout)
+        if offset:
+            state.updates = [u for u in state.updates if u["update_id"] >= offset]
+        if not state.updates and timeout > 0:
+            state.updates_event.clear()
+            try:
+                await asyncio.wait_for(state.updates_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return _ok(state.updates[:limit])
+
+    async def bot_method(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await _read_params(request)
+        if method == "getUpdates":
+            return await get_updates(params)
+
+        started = time.monotonic()
+        state.stats["requests"] += 1
+        state.stats[f"method.{method}"] += 1
+        chat_id = str(params["chat_id"]) if params.get("chat_id") is not None else None
+        record = {"method": method, "chat_id": chat_id, "ts": time.time(), "params": params}
+        state.calls.append(record)
+
+        if method in RATE_LIMITED_METHODS:
+            retry_after = limiter.hit(chat_id, started)
+            if retry_after is not None:
+                state.stats["rate_limited"] += 1
+                record["status"] = 429
+                return _fail(429, f"Too Many Requests: retry after {retry_after}", retry_after=retry_after)
+
+        delay = config.latency + (rnd.uniform(0, config.jitter) if config.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if config.error_rate and rnd.random() < config.error_rate:
+            state.stats["injected_errors"] += 1
+            record["status"] = 500
+            return _fail(500, "Internal Server Error")
+
+        response = call_method(method, params)
+        record["status"] = response.status
+        if response.status != 200:
+            state.stats["errors"] += 1
+        return response
+
+    async def file_download(request: web.Request) -> web.Response:
+        return _fail(404, "Not Found")
+
+    async def get_calls(request: web.Request) -> web.Response:
+        method = request.query.get("method")
+        calls = [c for c in state.calls if not method or c["method"] == method]
+        return web.json_response(calls)
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response({**state.stats, "messages": len(state.messages)})
+
+    async def reset(request: web.Request) -> web.Response:
+        state.reset()
+        limiter._chats.clear()
+        limiter._global = None
+        return web.json_response({"ok": True})
+
+    async def push_updates(request: web.Request) -> web.Response:
+        body = await request.json()
+        state.add_updates(body if isinstance(body, list) else [body])
+        return web.json_response({"ok": True, "queued": len(state.updates)})
+
+    app.router.add_route("*", "/bot{token}/{method}", bot_method)
+    app.router.add_get("/file/bot{token}/{path:.*}", file_download)
+    app.router.add_get("/_fake/calls", get_calls)
+    app.router.add_get("/_fake/stats", get_stats)
+    app.router.add_post("/_fake/reset", reset)
+    app.router.add_post("/_fake/updates", push_updates)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.0, help="base response delay, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay up to N seconds")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="messages/s per private chat")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="messages/s per bot")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeTelegramConfig(
+        latency=args.latency, jitter=args.jitter, chat_rate=args.chat_rate,
+        global_rate=args.global_rate, global_burst=max(1, int(args.global_rate)),
+        error_rate=args.error_rate, seed=args.seed,
+    )
+    print(f"fake Telegram: TELEGRAM_API_BASE_URL=http://{args.host}:{args.port}")
+    web.run_app(create_app(config), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# tools/replay_webhooks.py
+"""
+Воспроизведение записанных webhook Shopify (WEBHOOK_CAPTURE_PATH) против
+любого окружения: тело подписывается заново секретом целевого окружения,
+интервалы между запросами - как в записи, ускоренные в --speed раз.
+
+    python -m tools.replay_webhooks capture.jsonl.gz --target http://127.0.0.1:8003 --speed 1
+    python -m tools.replay_webhooks capture.jsonl.gz --target https://staging.example.com --speed 10
+    python -m tools.replay_webhooks capture.jsonl.gz --target ... --speed max --concurrency 50
+
+Заказы с уже обработанным id приложение отбросит как дубликаты: для
+повторных прогонов на той же БД - --id-offset (сдвиг id заказа).
+Секрет - --secret или SHOPIFY_WEBHOOK_SECRET.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+from app.services.shopify_hmac import sign_webhook
+from app.services.webhook_capture import read_capture
+
+# Заголовки записи, которые уходят при воспроизведении (HMAC - свой)
+REPLAYED_HEADERS = (
+    "x-shopify-topic",
+    "x-shopify-shop-domain",
+    "x-shopify-api-version",
+    "x-shopify-webhook-id",
+    "x-shopify-event-id",
+    "x-shopify-triggered-at",
+)
+
+
+class ReplayRequest(NamedTuple):
+    offset: float  # секунд от начала воспроизведения
+    path: str
+    body: bytes
+    headers: dict
+    captured_status: Optional[int]
+
+
+class ReplayResult(NamedTuple):
+    status: str
+    captured_status: Optional[int]
+    latency: float
+
+
+def shift_order_id(body: dict, offset: int) -> dict:
+    """Сдвигает id заказа (и GraphQL id) - заказ выглядит новым для идемпотентности."""
+    if not offset or "id" not in body:
+        return body
+    body = dict(body)
+    old_id = body["id"]
+    body["id"] = int(old_id) + offset
+    gid = body.get("admin_graphql_api_id")
+    if isinstance(gid, str) and gid.endswith(f"/{old_id}"):
+        body["admin_graphql_api_id"] = gid[: -len(str(old_id))] + str(body["id"])
+    return body
+
+
+def build_requests(records, secret: str, speed: Optional[float], id_offset: int = 0,
+                   limit: Optional[int] = None) -> List[ReplayRequest]:
+    """Подписанные запросы со смещениями по времени; speed=None - без пауз."""
+    requests = []
+    first_ts = None
+    for record in records:
+        if record.get("body") is None:
+            continue
+        if limit is not None and len(requests) >= limit:
+            break
+        first_ts = record["ts"] if first_ts is None else first_ts
+        body = json.dumps(shift_order_id(record["body"], id_offset), ensure_ascii=False).encode("utf-8")
+        headers = {k: v for k, v in record.get("headers", {}).items() if k in REPLAYED_HEADERS}
+        headers["Content-Type"] = "application/json"
+        headers["X-Shopify-Hmac-Sha256"] = sign_webhook(body, secret)
+        offset = 0.0 if speed is None else max(0.0, record["ts"] - first_ts) / speed
+        requests.append(ReplayRequest(offset, record.get("path") or "/webhooks/shopify/orders",
+                                      body, headers, record.get("status")))
+    return requests
+
+
+async def replay(target: str, requests: List[ReplayRequest], concurrency: int = 0,
+                 timeout: float = 60.0) -> List[ReplayResult]:
+    """Отправка по расписанию (open loop); concurrency > 0 - не больше N запросов одновременно."""
+    import aiohttp
+
+    results = []
+    limiter = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+    target = target.rstrip("/")
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0),
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as http:
+
+        async def send(req: ReplayRequest, at: float):
+            await asyncio.sleep(max(0.0, at - time.monotonic()))
+            if limiter:
+                await limiter.acquire()
+            started = time.monotonic()
+            try:
+                async with http.post(target + req.path, data=req.body, headers=req.headers) as resp:
+                    await resp.read()
+                    status = str(resp.status)
+            except asyncio.TimeoutError:
+                status = "timeout"
+            except aiohttp.ClientError as e:
+                status = type(e).__name__
+            finally:
+                if limiter:
+                    limiter.release()
+            results.append(ReplayResult(status, req.captured_status, time.monotonic() - started))
+
+        t0 = time.monotonic()
+        await asyncio.gather(*(send(req, t0 + req.offset) for req in requests))
+    return results
+
+
+def summarize(results: List[ReplayResult], elapsed: float) -> dict:
+    latencies = sorted(r.latency * 1000 for r in results)
+    summary = {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "rate_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "statuses": dict(Counter(r.status for r in results)),
+        # Ответ отличается от записанного в проде - кандидат в регрессию
+        "status_mismatches": sum(1 for r in results
+                                 if r.captured_status is not None and r.status != str(r.captured_status)),
+    }
+    if len(latencies) > 1:
+        qs = statistics.quantiles(latencies, n=100, method="inclusive")
+        summary["latency_ms"] = {"p50": round(qs[49], 1), "p95": round(qs[94], 1), "p99": round(qs[98], 1),
+                                 "max": round(latencies[-1], 1)}
+    return summary
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be > 0 or 'max'")
+    return speed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="файл записи (.jsonl или .jsonl.gz)")
+    parser.add_argument("--target", required=True, help="базовый URL приложения")
+    parser.add_argument("--speed", type=_parse_speed, default=1.0, help="1, 10, ... или max")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="максимум одновременных запросов (по умолчанию: 50 для max, без лимита иначе)")
+    parser.add_argument("--secret", default=os.getenv("SHOPIFY_WEBHOOK_SECRET"))
+    parser.add_argument("--id-offset", type=int, default=0, help="сдвиг id заказов")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="сохранить сводку в JSON")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("--secret or SHOPIFY_WEBHOOK_SECRET is required")
+    concurrency = args.concurrency or (50 if args.speed is None else 0)
+
+    requests = build_requests(read_capture(args.capture), args.secret, args.speed, args.id_offset, args.limit)
+    if not requests:
+        print("Nothing to replay")
+        return 1
+    span = requests[-1].offset
+    print(f"Replaying {len(requests)} webhooks to {args.target} "
+          f"({'max speed' if args.speed is None else f'{args.speed:g}x, {span:.1f}s'})")
+
+    started = time.perf_counter()
+    results = asyncio.run(replay(args.target, requests, concurrency, args.timeout))
+    summary = summarize(results, time.perf_counter() - started)
+    summary["params"] = {"capture": args.capture, "target": args.target, "speed": args.speed or "max",
+                         "concurrency": concurrency, "id_offset": args.id_offset}
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    return 0 if all(r.status == "200" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# tools/stub_server.py
+"""
+Запуск локальных заглушек внешних API в фоновом потоке.
+
+Поддерживаются ASGI-приложения (FastAPI - через uvicorn) и aiohttp.web.Application.
+
+    server = serve_in_thread(app)   # порт 0 - свободный порт
+    ... server.url ...
+    server.stop()
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Callable, NamedTuple
+
+from aiohttp import web
+
+
+class StubServer(NamedTuple):
+    url: str
+    stop_callback: Callable[[], None]
+
+    def stop(self) -> None:
+        self.stop_callback()
+
+
+def _serve_asgi(app, host: str, port: int, start_timeout: float, lifespan: bool) -> StubServer:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning",
+                                           lifespan="on" if lifespan else "off", ws="none"))
+    thread = threading.Thread(target=server.run, name="stub-server", daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + start_timeout
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"Stub server failed to start on {host}:{port}")
+        time.sleep(0.01)
+
+    def stop() -> None:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return StubServer(f"http://{host}:{bound_port}", stop)
+
+
+def _serve_aiohttp(app: web.Application, host: str, port: int, start_timeout: float) -> StubServer:
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app, access_log=None)
+    ready = threading.Event()
+    bound = {}
+
+    def run() -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, host, port)
+        loop.run_until_complete(site.start())
+        bound["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+    thread = threading.Thread(target=run, name="stub-server", daemon=True)
+    thread.start()
+    if not ready.wait(start_timeout):
+        raise RuntimeError(f"Stub server failed to start on {host}:{port}")
+
+    def stop() -> None:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+    return StubServer(f"http://{host}:{bound['port']}", stop)
+
+
+def serve_in_thread(app, host: str = "127.0.0.1", port: int = 0, start_timeout: float = 10.0,
+                    lifespan: bool = False) -> StubServer:
+    """Поднимает app в daemon-потоке и ждёт готовности. lifespan - только для ASGI."""
+    if isinstance(app, web.Application):
+        return _serve_aiohttp(app, host, port, start_timeout)
+    return _serve_asgi(app, host, port, start_timeout, lifespan)
@@ -0,0 +1,115 @@
+# tools/trace_report.py
+"""
+Разбор файла трасс (TRACING_EXPORTER=file): дерево спанов одного заказа
+или самые медленные трассы.
+
+    python -m tools.trace_report traces.jsonl --order 5712345678
+    python -m tools.trace_report traces.jsonl --slowest 10
+    python -m tools.trace_report traces.jsonl --trace 4bf92f3577b34da6a3ce929d0e0e4736
+
+Заказ ищется по атрибуту order.id корневого спана webhook; для каждого спана -
+длительность, смещение от начала трассы и доля времени родителя.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+def load_spans(path: str) -> List[dict]:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue  # недописанная строка при падении процесса
+    return spans
+
+
+def group_traces(spans: List[dict]) -> Dict[str, List[dict]]:
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    return traces
+
+
+def find_order_traces(traces: Dict[str, List[dict]], order_id: str) -> List[str]:
+    return [trace_id for trace_id, spans in traces.items()
+            if any(str(s.get("attributes", {}).get("order.id")) == order_id for s in spans)]
+
+
+def _roots(spans: List[dict]) -> List[dict]:
+    ids = {s["span_id"] for s in spans}
+    # Родитель из другого процесса (traceparent) в файле отсутствует - спан тоже корень
+    return sorted((s for s in spans if s.get("parent_id") not in ids), key=lambda s: s["start"])
+
+
+def trace_duration(spans: List[dict]) -> float:
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + s["duration_ms"] / 1000 for s in spans)
+    return (end - start) * 1000
+
+
+def render_tree(spans: List[dict]) -> List[str]:
+    children: Dict[Optional[str], List[dict]] = defaultdict(list)
+    for span in spans:
+        children[span.get("parent_id")].append(span)
+    t0 = min(s["start"] for s in spans)
+    lines = []
+
+    def walk(span: dict, depth: int, parent_ms: Optional[float]):
+        share = f" {span['duration_ms'] / parent_ms * 100:5.1f}%" if parent_ms else "       "
+        mark = " !" if span.get("status") == "error" else ""
+        attrs = span.get("attributes", {})
+        detail = attrs.get("db.statement") or attrs.get("http.target") or ""
+        detail = f"  {' '.join(str(detail).split())[:80]}" if detail else ""
+        lines.append(f"{(span['start'] - t0) * 1000:9.1f}ms {span['duration_ms']:9.1f}ms{share}  "
+                     f"{'  ' * depth}{span['name']}{mark}{detail}")
+        for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start"]):
+            walk(child, depth + 1, span["duration_ms"])
+
+    for root in _roots(spans):
+        walk(root, 0, None)
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="файл TRACING_FILE")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--order", help="id заказа Shopify")
+    group.add_argument("--trace", help="trace_id")
+    group.add_argument("--slowest", type=int, default=10, help="N самых медленных трасс (по умолчанию)")
+    args = parser.parse_args()
+
+    traces = group_traces(load_spans(args.path))
+    if args.order or args.trace:
+        trace_ids = find_order_traces(traces, args.order) if args.order else [args.trace]
+        trace_ids = [t for t in trace_ids if t in traces]
+        if not trace_ids:
+            print("No matching traces")
+            return 1
+        for trace_id in trace_ids:
+            print(f"trace {trace_id}  {trace_duration(traces[trace_id]):.1f}ms")
+            print("\n".join(render_tree(traces[trace_id])))
+            print()
+        return 0
+
+    ranked = sorted(traces.items(), key=lambda item: trace_duration(item[1]), reverse=True)
+    for trace_id, spans in ranked[:args.slowest]:
+        root = _roots(spans)[0]
+        order_id = next((s["attributes"]["order.id"] for s in spans if "order.id" in s.get("attributes", {})), "")
+        print(f"{trace_duration(spans):9.1f}ms  {trace_id}  {root['name']}  {len(spans)} spans"
+              f"{f'  order {order_id}' if order_id else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())